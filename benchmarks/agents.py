@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the three agent packages on the offline mock backends.
+
+Drives novel.agent.create_agents(), novel_fix.agent.create_root_agent() and
+deep_research.agent.create_deep_research_agent() through a Runner with the
+deterministic mock LLM and search backends, and reports per scenario:
+wall time, LLM round trips, prompt/completion tokens, estimated cost (from
+the model tier prices in common/model_tiers.json), agent transfers and
+peak memory. Results are written as JSON and compared to a stored baseline;
+an extra LLM round trip or a prompt that grew past the allowed ratio fails
+the run with a non-zero exit code. --compare-tiers runs every scenario with
+one model for everything and with the tiered models, and prints the cost
+and latency of both.
+
+Usage:
+    python -m benchmarks.agents [--scenario NAME ...] [--output PATH]
+                                [--baseline PATH] [--update-baseline] [--compare-tiers]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Add the parent directory to the path so we can import from adk modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+# The mock backends are picked at import time, so select them before the agents load
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["SEARCH_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "20")
+os.environ.setdefault("MOCK_TAVILY_LATENCY_MS", "20")
+# Paced generation, so the fast tier's higher speed shows in the wall time
+os.environ.setdefault("MOCK_LLM_TOKENS_PER_SECOND", "2000")
+# The measured run must not resume from the warm-up run's checkpoints
+os.environ["NOVEL_FIX_CHECKPOINT"] = "false"
+
+from google.adk.agents import BaseAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from common import llm as shared_llm
+from common.cache import set_llm_cache
+from common.mock_backends import MockLlm, mock_prose
+from common.models import estimate_cost, set_model_tiering, tier_of_model
+from common.telemetry import get_telemetry_summary, telemetry
+
+BENCHMARK_DIR = Path(__file__).parent
+DEFAULT_OUTPUT = BENCHMARK_DIR / "results" / "agents.json"
+DEFAULT_BASELINE = BENCHMARK_DIR / "baseline_agents.json"
+
+# Regression thresholds against the baseline
+MAX_PROMPT_TOKEN_RATIO = 1.5
+MAX_COMPLETION_TOKEN_RATIO = 1.5
+MAX_WALL_TIME_RATIO = 2.0
+WALL_TIME_SLACK_SECONDS = 0.5
+
+
+def novel_scenario():
+    from novel import agent as novel_agent
+    return (novel_agent.create_agents(), novel_agent.APP_NAME, novel_agent.initial_state, [
+        "Help me start writing a fantasy novel about friendship and loyalty, target length should be medium",
+        "Create character profiles for the main protagonist and antagonist",
+        "Write the first chapter introducing the main character",
+    ])
+
+
+def long_manuscript_state(chapters_written: int = 10) -> dict:
+    """A medium novel well under way: full outline, eight characters and ten written chapters."""
+    names = ["Mara", "Voss", "Idris", "Thea", "Corin", "Wren", "Sable", "Oren"]
+    roles = ["protagonist", "antagonist"] + ["supporting character"] * 6
+    return {
+        "novel_genre": "fantasy",
+        "novel_theme": "friendship and loyalty",
+        "novel_target_length": "medium",
+        "novel_outline": {
+            "title": "The Lantern Accord",
+            "structure": {"act1": "Setup", "act2": "Development", "act3": "Resolution"},
+            "generated_outline": "\n\n".join(
+                f"Act {act}\n{mock_prose(act, 300)}" for act in (1, 2, 3)),
+            "estimated_chapters": 18,
+        },
+        "character_profiles": {
+            name: {"name": name, "role": role, "generated_profile": mock_prose(100 + i, 350)}
+            for i, (name, role) in enumerate(zip(names, roles))
+        },
+        "chapters": {
+            str(number): {"type": "action", "content": mock_prose(200 + number, 1000)}
+            for number in range(1, chapters_written + 1)
+        },
+    }
+
+
+def novel_chapter_scenario():
+    from novel import agent as novel_agent
+    return (novel_agent.create_agents(), novel_agent.APP_NAME, long_manuscript_state(), [
+        "Write chapter 11, an action chapter where Mara confronts Voss at the harbor",
+    ])
+
+
+def novel_fix_scenario():
+    from novel_fix import agent as novel_fix_agent
+    return (novel_fix_agent.create_root_agent(), novel_fix_agent.APP_NAME, {}, [
+        "Start a fantasy novel about friendship and courage, medium length",
+    ])
+
+
+def deep_research_scenario():
+    from deep_research import agent as deep_research_agent
+    return (deep_research_agent.create_deep_research_agent(), "deep_research_benchmark", {}, [
+        "Research the topic: renewable energy trends",
+    ])
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "novel": novel_scenario,
+    "novel_chapter": novel_chapter_scenario,
+    "novel_fix": novel_fix_scenario,
+    "deep_research": deep_research_scenario,
+}
+
+
+def _mock_usage() -> dict:
+    """Sums the usage counters of every pooled mock LLM client, with their cost per model tier."""
+    usage = {"llm_round_trips": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+    for client in shared_llm._llm_clients.values():
+        if isinstance(client, MockLlm):
+            usage["llm_round_trips"] += client.calls
+            usage["prompt_tokens"] += client.prompt_tokens
+            usage["completion_tokens"] += client.completion_tokens
+            usage["cost_usd"] += estimate_cost(client.model, client.prompt_tokens, client.completion_tokens)
+            tier = f"tier_{tier_of_model(client.model)}_calls"
+            usage[tier] = usage.get(tier, 0) + client.calls
+    return usage
+
+
+async def _run_queries(agent: BaseAgent, app_name: str, state: dict, queries: List[str]) -> int:
+    """Runs every query to completion in a fresh session and returns the agent transfer count."""
+    session_service = InMemorySessionService()
+    runner = Runner(agent=agent, app_name=app_name, session_service=session_service)
+    await session_service.create_session(app_name=app_name, user_id="benchmark",
+                                         session_id="benchmark", state=dict(state))
+    transfers = 0
+    for query in queries:
+        message = types.Content(role="user", parts=[types.Part(text=query)])
+        # Drain the whole event stream - sequential pipelines emit one final response per stage
+        async for event in runner.run_async(user_id="benchmark", session_id="benchmark",
+                                            new_message=message):
+            if event.actions and event.actions.transfer_to_agent:
+                transfers += 1
+    return transfers
+
+
+async def run_scenario(agent: BaseAgent, app_name: str, state: dict, queries: List[str]) -> dict:
+    """Runs the scenario once to warm up lazy imports, then again to measure it."""
+    await _run_queries(agent, app_name, state, queries)
+
+    before = _mock_usage()
+    telemetry.reset()
+    tracemalloc.start()
+    started = time.perf_counter()
+    transfers = await _run_queries(agent, app_name, state, queries)
+    wall_time = time.perf_counter() - started
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    after = _mock_usage()
+    metrics = {key: after[key] - before.get(key, 0) for key in after}
+    metrics["cost_usd"] = round(metrics["cost_usd"], 6)
+    metrics.update({
+        "queries": len(queries),
+        "agent_transfers": transfers,
+        "wall_time_seconds": round(wall_time, 3),
+        "peak_traced_mb": round(peak_traced / 2**20, 2),
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (2**20 if sys.platform == "darwin" else 2**10), 1),
+        # Where the time went: per agent, tool, transfer and model
+        "spans": get_telemetry_summary(),
+    })
+    return metrics
+
+
+def compare_to_baseline(results: dict, baseline: dict) -> List[str]:
+    """Returns a description of every regression against the baseline."""
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if metrics["llm_round_trips"] > base["llm_round_trips"]:
+            regressions.append(f"{name}: LLM round trips {base['llm_round_trips']} -> {metrics['llm_round_trips']}")
+        if metrics["agent_transfers"] > base["agent_transfers"]:
+            regressions.append(f"{name}: agent transfers {base['agent_transfers']} -> {metrics['agent_transfers']}")
+        if metrics["prompt_tokens"] > base["prompt_tokens"] * MAX_PROMPT_TOKEN_RATIO:
+            regressions.append(f"{name}: prompt tokens {base['prompt_tokens']} -> {metrics['prompt_tokens']}")
+        if metrics["completion_tokens"] > base["completion_tokens"] * MAX_COMPLETION_TOKEN_RATIO:
+            regressions.append(
+                f"{name}: completion tokens {base['completion_tokens']} -> {metrics['completion_tokens']}")
+        allowed_wall_time = base["wall_time_seconds"] * MAX_WALL_TIME_RATIO + WALL_TIME_SLACK_SECONDS
+        if metrics["wall_time_seconds"] > allowed_wall_time:
+            regressions.append(
+                f"{name}: wall time {base['wall_time_seconds']}s -> {metrics['wall_time_seconds']}s")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the agents on the offline mock backends.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--compare-tiers", action="store_true",
+                        help="compare one model for everything with the tiered models")
+    return parser.parse_args()
+
+
+def compare_tiers(names: List[str]):
+    """Runs every scenario on a single model and on the tiered models, and prints cost and latency."""
+    print(f"{'scenario':<14} {'single model':>20} {'tiered':>20} {'cost':>7} {'time':>7}")
+    for name in names:
+        runs = {}
+        for tiered in (False, True):
+            set_model_tiering(tiered)
+            asyncio.run(shared_llm.aclose_llm_clients())  # fresh clients on the tier's models
+            runs[tiered] = asyncio.run(run_scenario(*SCENARIOS[name]()))
+        single, tiered = runs[False], runs[True]
+        cost_change = (tiered["cost_usd"] / single["cost_usd"] - 1) * 100 if single["cost_usd"] else 0.0
+        time_change = (tiered["wall_time_seconds"] / single["wall_time_seconds"] - 1) * 100
+        print(f"{name:<14} {'$%.4f / %.2fs' % (single['cost_usd'], single['wall_time_seconds']):>20} "
+              f"{'$%.4f / %.2fs' % (tiered['cost_usd'], tiered['wall_time_seconds']):>20} "
+              f"{cost_change:>+6.0f}% {time_change:>+6.0f}%")
+    set_model_tiering(True)
+    asyncio.run(shared_llm.aclose_llm_clients())
+
+
+def main():
+    args = parse_args()
+    # Every round trip has to reach the model to be counted
+    set_llm_cache(None)
+
+    print("Agent Benchmarks (offline mock backends)")
+    print("=" * 50)
+
+    if args.compare_tiers:
+        compare_tiers(args.scenario or list(SCENARIOS))
+        return
+
+    results = {}
+    for name in args.scenario or list(SCENARIOS):
+        agent, app_name, state, queries = SCENARIOS[name]()
+        results[name] = asyncio.run(run_scenario(agent, app_name, state, queries))
+        metrics = results[name]
+        print(f"{name:<14} {metrics['wall_time_seconds']:>7.2f}s  "
+              f"{metrics['llm_round_trips']:>3} LLM calls  "
+              f"{metrics['prompt_tokens']:>7} prompt / {metrics['completion_tokens']:>6} completion tokens  "
+              f"${metrics['cost_usd']:.4f}  "
+              f"{metrics['agent_transfers']:>2} transfers  "
+              f"peak {metrics['peak_traced_mb']:.1f} MB traced / {metrics['peak_rss_mb']:.0f} MB RSS")
+    asyncio.run(shared_llm.aclose_llm_clients())
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline} - run with --update-baseline to create one")
+        return
+
+    regressions = compare_to_baseline(results, json.loads(args.baseline.read_text()))
+    if regressions:
+        print("\n❌ PERFORMANCE REGRESSION against baseline:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        sys.exit(1)
+    print("✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
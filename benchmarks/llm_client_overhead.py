@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the per-call LLM client setup overhead.
+
+Compares the old per-call construction (new LiteLlm / genai.configure +
+GenerativeModel / fresh google.genai client on every tool call) against the
+pooled clients in common.llm. No requests are sent - only client setup is timed.
+
+Usage:
+    python -m benchmarks.llm_client_overhead [iterations]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from adk modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Client construction needs credentials to be present, not valid
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder-key")
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark-placeholder-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://benchmark.invalid")
+os.environ.setdefault("AZURE_API_VERSION", "2024-06-01")
+
+from google.adk.models.google_llm import Gemini
+from google.adk.models.lite_llm import LiteLlm
+
+from common import llm as shared_llm
+
+
+def legacy_azure_setup():
+    """Per-call setup done by the old Azure branch of the LLM helpers."""
+    llm = LiteLlm(
+        model=f"azure/{shared_llm.AZURE_MODEL_NAME}",
+        api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        api_version=os.getenv("AZURE_API_VERSION")
+    )
+    return shared_llm.build_llm_request(llm, "benchmark prompt")
+
+
+def legacy_google_setup():
+    """Per-call setup done by the old Google branch of the LLM helpers."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return genai.GenerativeModel(shared_llm.GOOGLE_MODEL_NAME)
+
+
+def legacy_gemini_client_setup():
+    """Per-turn setup when an agent model is a bare string resolved to a new Gemini."""
+    llm = Gemini(model=shared_llm.GOOGLE_MODEL_NAME)
+    return llm.api_client
+
+
+def pooled_gemini_setup():
+    """Per-call setup with the shared Gemini client pool."""
+    llm = shared_llm.get_llm_client(shared_llm.GOOGLE_MODEL_NAME)
+    llm.api_client
+    return shared_llm.build_llm_request(llm, "benchmark prompt")
+
+
+def time_per_call(fn, iterations: int) -> float:
+    """Returns the mean wall time of fn() in microseconds."""
+    fn()  # warm up imports and first-use caches
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print("LLM Client Setup Overhead")
+    print("=" * 50)
+    print(f"Iterations: {iterations}\n")
+
+    scenarios = [
+        ("legacy: LiteLlm per call", legacy_azure_setup),
+        ("legacy: genai.configure per call", legacy_google_setup),
+        ("legacy: Gemini client per turn", legacy_gemini_client_setup),
+        ("pooled: shared Gemini client", pooled_gemini_setup),
+    ]
+
+    for label, fn in scenarios:
+        try:
+            mean_us = time_per_call(fn, iterations)
+            print(f"{label:<36} {mean_us:>10.1f} µs/call")
+        except ImportError as e:
+            print(f"{label:<36} skipped ({e})")
+
+
+if __name__ == "__main__":
+    main()
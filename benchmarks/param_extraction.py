@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Corpus benchmark for the hybrid parameter_extractor stage of novel_fix.
+
+Runs a corpus of English and Chinese novel requests through the precompiled
+single-pass matcher (novel_fix.params) and reports:
+- hit rate: requests answered locally instead of with a model call
+- accuracy of the local answers against the expected parameters
+- matcher latency per request, next to the old per-pattern regex extraction
+- parameter_extractor stage latency on the mock LLM with and without the fast path
+
+Usage:
+    python -m benchmarks.param_extraction [iterations]
+"""
+
+import asyncio
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from adk modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "20")
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from common.llm import get_llm_client
+from novel_fix import params
+from novel_fix.agent import create_parameter_extraction_agent
+from novel_fix.params import match_params
+
+# Request -> expected (genre, theme, length), or None when the model should decide
+CORPUS = {
+    "Write a mystery novel about a detective in a small town": ("mystery", "a detective in a small town", "medium"),
+    "I want a short science fiction story about space exploration": ("science fiction", "space exploration", "short"),
+    "Write a short romance novel about finding love": ("romance", "finding love", "short"),
+    "I need a long fantasy adventure about dragons and magic": ("fantasy", "dragons and magic", "long"),
+    "Start a fantasy novel about friendship and courage, medium length": ("fantasy", "friendship and courage", "medium"),
+    "Create a sci-fi thriller? No - a sci-fi novel about AI ethics": None,
+    "Write a horror novel about a haunted lighthouse": ("horror", "a haunted lighthouse", "medium"),
+    "A long historical novel about the fall of Rome": ("historical", "the fall of Rome", "long"),
+    "Write a thriller about a stolen election, short length": ("thriller", "a stolen election", "short"),
+    "Write a historical drama about the fall of Constantinople": ("historical", "the fall of Constantinople", "medium"),
+    "Medium length mystery about a missing painting": ("mystery", "a missing painting", "medium"),
+    "Write an epic fantasy about the last dragon rider": ("fantasy", "the last dragon rider", "long"),
+    "Write a novella, romance, about two rival bakers": ("romance", "two rival bakers", "short"),
+    "Science fiction. Theme: first contact": ("science fiction", "first contact", "medium"),
+    "Write a detective story about a poisoned chess champion": ("mystery", "a poisoned chess champion", "medium"),
+    "Write an adventure novel about crossing the Sahara": ("adventure", "crossing the Sahara", "medium"),
+    "A short horror story about a cursed doll": ("horror", "a cursed doll", "short"),
+    "Long science fiction novel about generation ships": ("science fiction", "generation ships", "long"),
+    "Write a love story about letters lost in the war": ("romance", "letters lost in the war", "medium"),
+    "Write a drama about three sisters running a farm": ("drama", "three sisters running a farm", "medium"),
+    "写一部关于友谊的短篇奇幻小说": ("fantasy", "友谊", "short"),
+    "帮我写一个长篇科幻故事，主题是人工智能的伦理": ("science fiction", "人工智能的伦理", "long"),
+    "写一个关于失踪案的悬疑小说": ("mystery", "失踪案", "medium"),
+    "写一部中篇爱情小说，讲述两个音乐家的故事": ("romance", "两个音乐家", "medium"),
+    "讲述一个少年成长的冒险故事": ("adventure", "一个少年成长", "medium"),
+    "写一部关于长安城的历史小说，长篇": ("historical", "长安城", "long"),
+    "写一个恐怖故事，关于一座废弃医院": ("horror", "一座废弃医院", "medium"),
+    "写一部玄幻小说，主题是修仙与背叛": ("fantasy", "修仙与背叛", "medium"),
+    "写一部短篇惊悚小说，关于一场绑架": ("thriller", "一场绑架", "short"),
+    "Just write a novel": None,
+    "Surprise me": None,
+    "Write something about dragons": None,
+    "写一个悬疑小说": None,
+    "写一部小说": None,
+    "A thriller or maybe horror about a cabin in the woods": None,
+    "Write a fantasy or science fiction novel about time travel": None,
+    "I'd like a story for my daughter's birthday": None,
+    "Continue the novel from yesterday": None,
+    "写一个故事给我的朋友": None,
+    "A romance set in Paris": None,
+}
+
+
+def legacy_extract(user_input: str) -> dict:
+    """The old extract_novel_params_from_text: a re.search per pattern on a fresh lowercase copy."""
+    params = {"genre": "fantasy", "theme": "adventure and discovery", "target_length": "medium"}
+    genres = r"(fantasy|science fiction|sci-fi|mystery|romance|thriller|horror|historical|adventure|drama)"
+    for pattern in [genres, r"write.*?" + genres, genres + r".*?novel"]:
+        match = re.search(pattern, user_input.lower())
+        if match:
+            params["genre"] = "science fiction" if match.group(1) == "sci-fi" else match.group(1)
+            break
+    for pattern in [r"(short|medium|long).*?length", r"(short|medium|long).*?novel",
+                    r"length.*?(short|medium|long)", r"write.*?(short|medium|long)"]:
+        match = re.search(pattern, user_input.lower())
+        if match:
+            params["target_length"] = match.group(1)
+            break
+    for pattern in [r"about\s+([^,\.!?]+)", r"theme.*?[:\-]\s*([^,\.!?]+)", r"story.*?about\s+([^,\.!?]+)"]:
+        match = re.search(pattern, user_input.lower())
+        if match:
+            theme = match.group(1).strip()
+            if len(theme) > 5:
+                params["theme"] = theme
+            break
+    return params
+
+
+def time_per_call(fn, iterations: int) -> float:
+    """Returns the mean time of fn(request) over the corpus in microseconds."""
+    requests = list(CORPUS)
+    for request in requests:
+        fn(request)  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for request in requests:
+            fn(request)
+    return (time.perf_counter() - start) / (iterations * len(requests)) * 1e6
+
+
+async def stage_latency() -> float:
+    """Mean parameter_extractor stage wall time over the corpus, in milliseconds."""
+    session_service = InMemorySessionService()
+    runner = Runner(agent=create_parameter_extraction_agent(), app_name="param_bench",
+                    session_service=session_service)
+    elapsed = 0.0
+    # Warm-up: the first run pays for lazy imports
+    await session_service.create_session(app_name="param_bench", user_id="u", session_id="warm-up")
+    async for _ in runner.run_async(user_id="u", session_id="warm-up", new_message=types.Content(
+            role="user", parts=[types.Part(text="Just write a novel")])):
+        pass
+    for i, request in enumerate(CORPUS):
+        await session_service.create_session(app_name="param_bench", user_id="u", session_id=str(i))
+        message = types.Content(role="user", parts=[types.Part(text=request)])
+        start = time.perf_counter()
+        async for _ in runner.run_async(user_id="u", session_id=str(i), new_message=message):
+            pass
+        elapsed += time.perf_counter() - start
+    return elapsed / len(CORPUS) * 1000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print("Parameter Extraction Corpus Benchmark")
+    print("=" * 50)
+    print(f"Corpus: {len(CORPUS)} requests, iterations: {iterations}\n")
+
+    hits = correct = 0
+    for request, expected in CORPUS.items():
+        match = match_params(request)
+        if not match.confident:
+            continue
+        hits += 1
+        found = (match.params["genre"], match.params["theme"], match.params["target_length"])
+        if found == expected:
+            correct += 1
+        else:
+            print(f"  mismatch: {request!r} -> {found}, expected {expected}")
+    answerable = sum(1 for expected in CORPUS.values() if expected)
+    print(f"Hit rate:         {hits}/{len(CORPUS)} answered locally ({hits / len(CORPUS):.0%})")
+    print(f"Recall:           {correct}/{answerable} clear requests answered correctly")
+    print(f"Local accuracy:   {correct}/{hits} ({correct / max(hits, 1):.0%})")
+
+    legacy = time_per_call(legacy_extract, iterations)
+    matcher = time_per_call(match_params, iterations)
+    print(f"\nMatcher latency:  {matcher:8.1f} µs/request (legacy per-pattern regexes {legacy:.1f} µs)")
+
+    llm = get_llm_client()
+    calls_before = llm.calls
+    hybrid_ms = asyncio.run(stage_latency())
+    hybrid_calls = llm.calls - calls_before - 1  # minus the warm-up call
+    params.NOVEL_FIX_FAST_PARAMS = False
+    calls_before = llm.calls
+    llm_ms = asyncio.run(stage_latency())
+    llm_calls = llm.calls - calls_before - 1
+    params.NOVEL_FIX_FAST_PARAMS = True
+    print(f"Stage latency:    {hybrid_ms:8.1f} ms/request hybrid ({hybrid_calls} model calls), "
+          f"{llm_ms:.1f} ms LLM only ({llm_calls} model calls, "
+          f"mock latency {os.environ['MOCK_LLM_LATENCY_MS']} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the per-result summaries of deep_research web searches.
+
+Runs the same searches through deep_research.agent.search_query on the mock
+LLM and search backends in each summary mode and reports wall time per
+search, summary requests, prompt/completion tokens and estimated cost:
+- serial: one request per result, one at a time (the old for-loop)
+- parallel: one request per result, up to RESEARCH_SUMMARY_CONCURRENCY at a time
+- batched-N: N results per request, requests in parallel
+
+Usage:
+    python -m benchmarks.search_summaries [queries]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from adk modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["SEARCH_BACKEND"] = "mock"
+# A summary is 2-3 sentences; pace the mock like a hosted model
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "300")
+os.environ.setdefault("MOCK_LLM_TOKENS_PER_SECOND", "200")
+os.environ.setdefault("MOCK_LLM_OUTPUT_TOKENS", "60")
+os.environ.setdefault("MOCK_TAVILY_LATENCY_MS", "100")
+
+from common.llm import get_llm_client
+from common.models import estimate_cost, model_for
+from deep_research import agent as research_agent
+
+QUERIES = ["overview of grid-scale battery storage", "history of grid-scale battery storage",
+           "recent developments in grid-scale battery storage", "key challenges in grid-scale battery storage",
+           "future trends in grid-scale battery storage", "case studies of grid-scale battery storage"]
+
+# Mode -> (summary concurrency, results per request)
+MODES = {
+    "serial": (1, 1),
+    "parallel": (research_agent.RESEARCH_SUMMARY_CONCURRENCY, 1),
+    "batched-2": (research_agent.RESEARCH_SUMMARY_CONCURRENCY, 2),
+    "batched-5": (research_agent.RESEARCH_SUMMARY_CONCURRENCY, 5),
+}
+
+
+async def run_mode(concurrency: int, batch_size: int, queries: list) -> dict:
+    """Searches every query one after another in a summary mode and returns its usage."""
+    research_agent.RESEARCH_SUMMARY_CONCURRENCY = concurrency
+    research_agent.RESEARCH_SUMMARY_BATCH_SIZE = batch_size
+    llm = get_llm_client(model_for("tavily_web_search"))
+    before = llm.calls, llm.prompt_tokens, llm.completion_tokens
+    started = time.perf_counter()
+    for query in queries:
+        await research_agent.search_query(query)
+    elapsed = time.perf_counter() - started
+    calls, prompt_tokens, completion_tokens = (llm.calls - before[0], llm.prompt_tokens - before[1],
+                                               llm.completion_tokens - before[2])
+    return {
+        "seconds_per_search": elapsed / len(queries),
+        "requests": calls,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": estimate_cost(llm.model, prompt_tokens, completion_tokens),
+    }
+
+
+async def main(query_count: int):
+    queries = (QUERIES * (query_count // len(QUERIES) + 1))[:query_count]
+    print(f"Summarizing {research_agent.RESEARCH_MAX_RESULTS} results per search, {len(queries)} searches per mode")
+    print(f"{'mode':<11} {'s/search':>9} {'requests':>9} {'prompt tok':>11} {'compl tok':>10} {'cost $':>9}")
+    serial_time = None
+    for mode, (concurrency, batch_size) in MODES.items():
+        usage = await run_mode(concurrency, batch_size, queries)
+        serial_time = serial_time or usage["seconds_per_search"]
+        print(f"{mode:<11} {usage['seconds_per_search']:>9.3f} {usage['requests']:>9} "
+              f"{usage['prompt_tokens']:>11} {usage['completion_tokens']:>10} {usage['cost_usd']:>9.5f}"
+              f"   x{serial_time / usage['seconds_per_search']:.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else len(QUERIES)))
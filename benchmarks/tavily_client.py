@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Tavily client reuse against a local stand-in server.
+
+Runs the same searches through the live Tavily clients, pointed at
+common.mock_backends.MockTavilyServer, twice:
+- per-call: a new AsyncTavilyClient for every query (the old behaviour)
+- pooled: the process-wide client of deep_research.deep_research_types
+and reports the TCP connections the server accepted, the requests it
+served and the per-query latency seen by the caller. Against the real API
+every new connection also pays DNS, TCP and TLS handshakes.
+
+Usage:
+    python -m benchmarks.tavily_client [rounds]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from adk modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+os.environ.setdefault("TAVILY_API_KEY", "benchmark-placeholder-key")
+
+from tavily import AsyncTavilyClient
+
+from common.mock_backends import MockTavilyServer
+from deep_research import deep_research_types
+
+QUERIES = ["overview of tidal energy", "history of tidal energy", "recent developments in tidal energy",
+           "key challenges in tidal energy", "future trends in tidal energy", "case studies of tidal energy"]
+LATENCY_MS = 20
+
+
+async def per_call_search(query: str, server: MockTavilyServer):
+    """The old atavily_search_results: a new client, API key lookup and connection pool per query."""
+    client = AsyncTavilyClient(os.getenv("TAVILY_API_KEY"), api_base_url=server.url)
+    return await client.search(query=query, search_depth="basic", max_results=5, include_raw_content=True)
+
+
+async def pooled_search(query: str, server: MockTavilyServer):
+    return await deep_research_types.atavily_search_results(query, max_results=5, include_raw=True)
+
+
+async def run_mode(search, server: MockTavilyServer, rounds: int) -> dict:
+    """Runs `rounds` fan-outs of all queries and returns the connection and latency figures."""
+    connections, requests = server.connections, server.requests
+    latencies = []
+
+    async def timed_search(query: str):
+        started = time.perf_counter()
+        await search(query, server)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(timed_search(query) for query in QUERIES))
+    elapsed = time.perf_counter() - started
+    await deep_research_types.aclose_search_clients()
+    latencies.sort()
+    return {
+        "connections": server.connections - connections,
+        "requests": server.requests - requests,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "seconds": elapsed,
+    }
+
+
+async def main(rounds: int):
+    deep_research_types.SEARCH_BACKEND = "tavily"
+    with MockTavilyServer(latency_ms=LATENCY_MS) as server:
+        deep_research_types.TAVILY_API_BASE_URL = server.url
+        print(f"{rounds} rounds of {len(QUERIES)} concurrent searches, {LATENCY_MS} ms server latency, "
+              f"max {deep_research_types.TAVILY_MAX_CONNECTIONS} pooled connections")
+        print(f"{'mode':<9} {'connections':>12} {'requests':>9} {'mean ms':>8} {'p95 ms':>8} {'total s':>8}")
+        for mode, search in (("per-call", per_call_search), ("pooled", pooled_search)):
+            figures = await run_mode(search, server, rounds)
+            print(f"{mode:<9} {figures['connections']:>12} {figures['requests']:>9} {figures['mean_ms']:>8.1f} "
+                  f"{figures['p95_ms']:>8.1f} {figures['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
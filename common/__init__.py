@@ -0,0 +1 @@
+# Shared LLM Infrastructure Package
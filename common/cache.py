@@ -0,0 +1,198 @@
+"""
+Content-addressed on-disk cache for LLM responses.
+
+Entries are keyed on the model name, the full request contents and the
+generation config, stored one JSON file per key, and evicted least-recently-used
+once the cache grows past its size budget. Entries can optionally expire after
+a TTL. The async helpers and agent callbacks read and write it on worker
+threads, off the event loop. Enable with LLM_CACHE=true.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+# Load environment variables
+load_dotenv()
+
+# Cache configuration - 可以通过环境变量配置
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "false").lower() == "true"
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".llm_cache")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "0"))  # 0 = never expire
+
+# Config fields that do not change the generated content
+_KEY_EXCLUDED_CONFIG_FIELDS = {"http_options", "labels"}
+
+
+def request_cache_key(llm_request: LlmRequest) -> str:
+    """Returns the content address of a request: model + contents + generation config."""
+    config: Dict[str, Any] = {}
+    if llm_request.config:
+        config = llm_request.config.model_dump(
+            exclude_none=True, exclude=_KEY_EXCLUDED_CONFIG_FIELDS
+        )
+    payload = {
+        "model": llm_request.model,
+        "contents": [content.model_dump(exclude_none=True) for content in llm_request.contents],
+        "config": config,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class LlmResponseCache:
+    """Size-bounded LRU cache of LlmResponses persisted under a directory."""
+
+    def __init__(self, cache_dir: str, max_bytes: int, ttl_seconds: float = 0):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+        # key -> entry size in bytes, least recently used first
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total_bytes = 0
+        # The async helpers call get/put on worker threads
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        """Builds the LRU index from the files on disk, oldest access first."""
+        if self._index is None:
+            entries = []
+            if self.cache_dir.exists():
+                for path in self.cache_dir.glob("*/*.json"):
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, path.stem, stat.st_size))
+            entries.sort()
+            self._index = OrderedDict((key, size) for _, key, size in entries)
+            self._total_bytes = sum(self._index.values())
+        return self._index
+
+    def _discard(self, key: str):
+        index = self._load_index()
+        self._total_bytes -= index.pop(key, 0)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str) -> Optional[LlmResponse]:
+        """Returns the cached response for a key, or None on a miss."""
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[LlmResponse]:
+        index = self._load_index()
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            if key in index:
+                self._discard(key)
+            self.stats["misses"] += 1
+            return None
+
+        if self.ttl_seconds and time.time() - entry["created_at"] > self.ttl_seconds:
+            self._discard(key)
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+
+        # Mark as most recently used, both in memory and on disk
+        if key in index:
+            index.move_to_end(key)
+        os.utime(path)
+        self.stats["hits"] += 1
+        return LlmResponse.model_validate(entry["response"])
+
+    def put(self, key: str, response: LlmResponse):
+        """Stores a response and evicts least recently used entries over budget."""
+        with self._lock:
+            self._put(key, response)
+
+    def _put(self, key: str, response: LlmResponse):
+        index = self._load_index()
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({
+            "created_at": time.time(),
+            "response": response.model_dump(mode="json", exclude_none=True),
+        }, ensure_ascii=False).encode("utf-8")
+
+        # Write atomically so concurrent readers never see a partial entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        self._total_bytes += len(data) - index.pop(key, 0)
+        index[key] = len(data)
+        self.stats["stores"] += 1
+
+        while self._total_bytes > self.max_bytes and len(index) > 1:
+            oldest_key = next(iter(index))
+            self._discard(oldest_key)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        with self._lock:
+            for key in list(self._load_index()):
+                self._discard(key)
+
+    def get_stats(self) -> dict:
+        """Returns hit/miss counters plus current size."""
+        with self._lock:
+            entries, total_bytes = len(self._load_index()), self._total_bytes
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": entries,
+            "bytes": total_bytes,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+
+def is_cacheable(response: LlmResponse) -> bool:
+    """Only complete, successful responses with content are worth caching."""
+    return bool(response.content and response.content.parts
+                and not response.partial and not response.error_code)
+
+
+# Process-wide cache used by the LLM helpers and agent model callbacks
+llm_cache: Optional[LlmResponseCache] = (
+    LlmResponseCache(LLM_CACHE_DIR, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS)
+    if LLM_CACHE_ENABLED else None
+)
+
+
+def get_llm_cache() -> Optional[LlmResponseCache]:
+    """Returns the process-wide LLM cache, or None when caching is off."""
+    return llm_cache
+
+
+def set_llm_cache(cache: Optional[LlmResponseCache]):
+    """Replaces the process-wide LLM cache (None turns caching off)."""
+    global llm_cache
+    llm_cache = cache
+
+
+def get_llm_cache_stats() -> dict:
+    """Returns the LLM cache counters, or {"enabled": False} when caching is off."""
+    if llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_cache.get_stats()}
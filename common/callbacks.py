@@ -0,0 +1,198 @@
+"""
+Callbacks attached to every ADK agent so agent model calls go through the same
+shared LLM infrastructure as the tool helpers in common.llm, and agent runs,
+tool calls, transfers and model calls are recorded as telemetry spans.
+"""
+
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from .cache import get_llm_cache, is_cacheable, request_cache_key
+from .ratelimit import THROTTLE_ERROR_CODES, estimate_request_tokens, get_rate_limiter, is_throttle_error
+from .telemetry import Span, current_span, end_span, start_span, trace_id_for, usage_attributes
+
+# State of the model calls in flight, per (invocation, agent)
+_pending_calls: Dict[Tuple[str, str], dict] = {}
+# Spans of the agent runs and tool calls in flight
+_agent_spans: Dict[Tuple[str, str], Span] = {}
+_tool_spans: Dict[Tuple[str, str, str], Span] = {}
+# Transfer target -> agent that transferred to it; the source's run ends with its target's
+_transfers: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+
+def _call_id(callback_context: CallbackContext) -> Tuple[str, str]:
+    """Identifies the model call in flight - an agent makes one model call at a time."""
+    return (callback_context.invocation_id, callback_context.agent_name)
+
+
+def _agent_span(callback_context: CallbackContext) -> Optional[Span]:
+    return _agent_spans.get(_call_id(callback_context))
+
+
+def _finish_call(callback_context: CallbackContext, usage=None, throttled: bool = False,
+                 error: Optional[str] = None) -> Optional[dict]:
+    """Forgets a pending model call, gives its rate limiter slot back and ends its span."""
+    call = _pending_calls.pop(_call_id(callback_context), None)
+    if call is not None:
+        call["limiter"].release(call["estimated_tokens"],
+                                usage.total_token_count if usage else None, throttled)
+        end_span(call["span"], error, **usage_attributes(usage))
+    return call
+
+
+async def before_agent_run(callback_context: CallbackContext) -> None:
+    """Starts the span of an agent run, nested under the agent that transferred to it."""
+    call_id = _call_id(callback_context)
+    end_span(_agent_spans.pop(call_id, None))  # re-entered after transferring back
+    parent = _agent_spans.get(_transfers.get(call_id))
+    span = start_span("agent", callback_context.agent_name, parent,
+                      trace_id=trace_id_for(callback_context.invocation_id),
+                      agent=callback_context.agent_name)
+    if span is not None:
+        _agent_spans[call_id] = span
+    return None
+
+
+async def after_agent_run(callback_context: CallbackContext) -> None:
+    """Ends the span of an agent run and of the agents that transferred to it."""
+    call_id = _call_id(callback_context)
+    while call_id is not None:
+        end_span(_agent_spans.pop(call_id, None))
+        call_id = _transfers.pop(call_id, None)
+    return None
+
+
+async def before_llm_call(callback_context: CallbackContext,
+                          llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """Serves agent model calls from the LLM cache, otherwise waits for rate limiter quota."""
+    cache_key = None
+    cache = get_llm_cache()
+    if cache is not None:
+        cache_key = request_cache_key(llm_request)
+        # Cache entries are files; read and write them off the event loop
+        cached_response = await asyncio.to_thread(cache.get, cache_key)
+        if cached_response is not None:
+            print(f"--- LLM cache hit for {callback_context.agent_name} ---")
+            end_span(start_span("llm", llm_request.model, _agent_span(callback_context), cache="hit"))
+            return cached_response
+
+    # A previous call that errored without an error callback still holds a slot
+    _finish_call(callback_context, error="model call did not complete")
+
+    span = start_span("llm", llm_request.model, _agent_span(callback_context),
+                      cache="miss" if cache is not None else "disabled")
+    limiter = get_rate_limiter(llm_request.model)
+    estimated_tokens = estimate_request_tokens(llm_request)
+    await limiter.acquire(estimated_tokens)
+    _pending_calls[_call_id(callback_context)] = {
+        "cache_key": cache_key,
+        "limiter": limiter,
+        "estimated_tokens": estimated_tokens,
+        "span": span,
+    }
+    return None
+
+
+async def after_llm_call(callback_context: CallbackContext,
+                         llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """Releases the rate limiter slot and stores completed responses in the LLM cache."""
+    if llm_response.partial:
+        return None
+
+    call = _finish_call(
+        callback_context,
+        usage=llm_response.usage_metadata,
+        throttled=llm_response.error_code in THROTTLE_ERROR_CODES,
+        error=llm_response.error_code,
+    )
+
+    cache = get_llm_cache()
+    if cache is not None and call and call["cache_key"] and is_cacheable(llm_response):
+        await asyncio.to_thread(cache.put, call["cache_key"], llm_response)
+    return None
+
+
+async def on_llm_error(callback_context: CallbackContext, llm_request: LlmRequest,
+                       error: Exception) -> Optional[LlmResponse]:
+    """Releases the rate limiter slot of a failed model call, backing off on throttling."""
+    if is_throttle_error(error):
+        print(f"--- LLM throttled for {callback_context.agent_name}, backing off ---")
+    _finish_call(callback_context, throttled=is_throttle_error(error), error=f"{type(error).__name__}: {error}")
+    return None
+
+
+def _tool_call_id(tool: BaseTool, tool_context: ToolContext) -> Tuple[str, str, str]:
+    return (tool_context.invocation_id, tool_context.agent_name, tool_context.function_call_id or tool.name)
+
+
+async def before_tool_call(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> None:
+    """Starts the span of a tool call; LLM helper calls made by the tool become its children."""
+    parent = _agent_spans.get((tool_context.invocation_id, tool_context.agent_name))
+    if tool.name == "transfer_to_agent":
+        target = str(args.get("agent_name", ""))
+        _transfers[(tool_context.invocation_id, target)] = (tool_context.invocation_id, tool_context.agent_name)
+        span = start_span("transfer", tool.name, parent, target=target)
+    else:
+        span = start_span("tool", tool.name, parent)
+    if span is not None:
+        _tool_spans[_tool_call_id(tool, tool_context)] = span
+        current_span.set(span)
+    return None
+
+
+def _end_tool_span(tool: BaseTool, tool_context: ToolContext, error: Optional[str]):
+    span = _tool_spans.pop(_tool_call_id(tool, tool_context), None)
+    end_span(span, error)
+    if span is not None and current_span.get() is span:
+        current_span.set(None)
+
+
+async def after_tool_call(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext,
+                          tool_response: Any) -> None:
+    """Ends the span of a tool call; tools report failures as {"status": "error"}."""
+    error = None
+    if isinstance(tool_response, dict) and tool_response.get("status") == "error":
+        error = str(tool_response.get("message") or tool_response.get("error") or "error")
+    _end_tool_span(tool, tool_context, error)
+    return None
+
+
+async def on_tool_error(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext,
+                        error: Exception) -> None:
+    """Ends the span of a tool call that raised."""
+    _end_tool_span(tool, tool_context, f"{type(error).__name__}: {error}")
+    return None
+
+
+def agent_callbacks(**extra_callbacks) -> dict:
+    """Returns the callback keyword arguments every agent is created with.
+
+    Agent specific callbacks, e.g. before_agent_callback=..., run after the shared ones -
+    except before_model_callback ones, which run first so they can answer a model call
+    before it takes a cache lookup and a rate limiter slot.
+    """
+    callbacks = {
+        "before_agent_callback": before_agent_run,
+        "after_agent_callback": after_agent_run,
+        "before_model_callback": before_llm_call,
+        "after_model_callback": after_llm_call,
+        "before_tool_callback": before_tool_call,
+        "after_tool_callback": after_tool_call,
+    }
+    # Model and tool error callbacks are only available in newer ADK releases
+    if "on_model_error_callback" in LlmAgent.model_fields:
+        callbacks["on_model_error_callback"] = on_llm_error
+    if "on_tool_error_callback" in LlmAgent.model_fields:
+        callbacks["on_tool_error_callback"] = on_tool_error
+    for name, extra in extra_callbacks.items():
+        shared = [callbacks[name]] if name in callbacks else []
+        extra = extra if isinstance(extra, list) else [extra]
+        callbacks[name] = extra + shared if name == "before_model_callback" else shared + extra
+    return callbacks
@@ -0,0 +1,417 @@
+"""
+Shared, pooled LLM client layer used by the novel, novel_fix and deep_research agents.
+
+Every model name maps to one long-lived client that is created on first use and
+reused afterwards, so tool helpers and ADK agents share the same HTTP connection
+pools instead of rebuilding a client (and its TLS session) on every call.
+"""
+
+import asyncio
+import inspect
+import os
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, AsyncIterable, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.google_llm import Gemini
+from google.adk.models.lite_llm import LiteLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from .cache import get_llm_cache, request_cache_key
+from .mock_backends import LLM_BACKEND, MOCK_LLM_LATENCY_MS, MOCK_LLM_TOKENS_PER_SECOND, MockLlm
+from .ratelimit import (
+    LLM_THROTTLE_RETRIES,
+    THROTTLE_ERROR_CODES,
+    LlmThrottledError,
+    estimate_request_tokens,
+    get_rate_limiter,
+    is_throttle_error,
+)
+from .singleflight import SingleFlight
+from .telemetry import end_span, start_span, usage_attributes
+
+# Load environment variables
+load_dotenv()
+
+# Configure ADK to use API keys directly
+os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "False"
+
+# Model constants - 可以通过环境变量配置
+USE_AZURE = os.getenv("USE_AZURE", "false").lower() == "true"
+AZURE_MODEL_NAME = os.getenv("AZURE_MODEL_NAME", "gpt-4.1")  # Azure deployment name
+GOOGLE_MODEL_NAME = os.getenv("GOOGLE_MODEL_NAME", "gemini-2.0-flash-exp")  # Google model name
+
+# Long-lived clients, one per model name
+_llm_clients: Dict[str, BaseLlm] = {}
+
+# Base latency of the mock model, before each tier's scale (see set_mock_llm_latency)
+_mock_latency_ms = MOCK_LLM_LATENCY_MS
+
+# Coalesces identical helper requests that are in flight at the same time
+llm_single_flight = SingleFlight()
+
+
+def default_model_name() -> str:
+    """Returns the model name selected by the environment."""
+    return AZURE_MODEL_NAME if USE_AZURE else GOOGLE_MODEL_NAME
+
+
+def _new_llm_client(model_name: str) -> BaseLlm:
+    """Builds a new client for a model - Azure LiteLLM, Google Gemini or the local mock."""
+    if LLM_BACKEND == "mock":
+        # Each tier's mock model is as much faster or slower as the tier's profile says
+        from .models import mock_profile
+        profile = mock_profile(model_name)
+        return MockLlm(model=f"mock/{model_name}",
+                       latency_ms=_mock_latency_ms * profile["latency_scale"],
+                       tokens_per_second=MOCK_LLM_TOKENS_PER_SECOND * profile["speed_scale"])
+    if USE_AZURE:
+        return LiteLlm(
+            model=f"azure/{model_name}",
+            api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("AZURE_API_VERSION")
+        )
+    # Gemini keeps its google.genai client (and httpx pool) for the life of the instance
+    return Gemini(model=model_name)
+
+
+def get_llm_client(model_name: Optional[str] = None) -> BaseLlm:
+    """Returns the pooled client for a model, creating it on first use."""
+    model_name = model_name or default_model_name()
+    client = _llm_clients.get(model_name)
+    if client is None:
+        client = _new_llm_client(model_name)
+        _llm_clients[model_name] = client
+    return client
+
+
+def set_mock_llm_latency(latency_ms: float) -> float:
+    """Sets the mock model's base latency for pooled and future clients; returns the previous one.
+
+    The clients are pooled for the life of the process, so a test that needs a
+    slower or faster mock sets it here rather than through MOCK_LLM_LATENCY_MS.
+    """
+    global _mock_latency_ms
+    from .models import mock_profile
+    previous, _mock_latency_ms = _mock_latency_ms, latency_ms
+    for model_name, client in _llm_clients.items():
+        if isinstance(client, MockLlm):
+            client.latency_ms = latency_ms * mock_profile(model_name)["latency_scale"]
+    return previous
+
+
+def create_llm(model_name: Optional[str] = None) -> BaseLlm:
+    """Creates a LLM instance for an agent - shares the pooled client for the model."""
+    return get_llm_client(model_name)
+
+
+def build_llm_request(llm: BaseLlm, prompt: str,
+                      config: Optional[types.GenerateContentConfig] = None) -> LlmRequest:
+    """Builds a single-turn LlmRequest for a plain text prompt."""
+    content = types.Content(role='user', parts=[types.Part(text=prompt)])
+    return LlmRequest(
+        model=llm.model,
+        contents=[content],
+        config=config or types.GenerateContentConfig(tools=[])
+    )
+
+
+def response_text(response: LlmResponse) -> str:
+    """Joins the text of every part of a response (thought parts are skipped)."""
+    if not response.content or not response.content.parts:
+        return ""
+    return "".join(part.text for part in response.content.parts if part.text and not part.thought)
+
+
+def finish_reason_name(response: LlmResponse) -> Optional[str]:
+    """Returns the finish reason of a response as a name such as "STOP" or "MAX_TOKENS"."""
+    reason = response.finish_reason
+    return getattr(reason, "name", None) or (str(reason) if reason else None)
+
+
+async def collect_text(chunks: AsyncIterable[str]) -> str:
+    """Joins streamed text chunks once, instead of concatenating string by string."""
+    parts: List[str] = []
+    async for chunk in chunks:
+        parts.append(chunk)
+    return "".join(parts)
+
+
+async def _stream_once(llm: BaseLlm, llm_request: LlmRequest, stream: bool,
+                       outcome: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+    """Runs one upstream model call through the model's rate limiter, yielding text as it arrives.
+
+    The finish reason of the call is recorded in outcome["finish_reason"] when outcome is given.
+    """
+    span = start_span("llm", llm_request.model, cache="miss" if get_llm_cache() else "disabled")
+    limiter = get_rate_limiter(llm_request.model)
+    estimated_tokens = estimate_request_tokens(llm_request)
+    await limiter.acquire(estimated_tokens)
+
+    usage = None
+    error = None
+    throttled = False
+    streamed_partials = False
+    try:
+        async for response in llm.generate_content_async(llm_request, stream=stream):
+            if response.error_code in THROTTLE_ERROR_CODES:
+                raise LlmThrottledError(f"{response.error_code}: {response.error_message}")
+            if response.usage_metadata and response.usage_metadata.total_token_count:
+                usage = response.usage_metadata
+            if outcome is not None and response.finish_reason:
+                outcome["finish_reason"] = finish_reason_name(response)
+            if response.partial:
+                streamed_partials = True
+            elif streamed_partials:
+                continue  # the final response repeats the text already streamed
+            text = response_text(response)
+            if text:
+                yield text
+    except Exception as e:
+        throttled = is_throttle_error(e)
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        limiter.release(estimated_tokens, usage.total_token_count if usage else None, throttled)
+        end_span(span, error, **usage_attributes(usage))
+
+
+async def _store_text(cache_key: str, text: str, finish_reason: Optional[str] = None):
+    cache = get_llm_cache()
+    if cache and text:
+        # The cache writes a JSON file; keep it off the event loop the fan-outs run on
+        await asyncio.to_thread(cache.put, cache_key, LlmResponse(
+            content=types.Content(role='model', parts=[types.Part(text=text)]),
+            finish_reason=finish_reason
+        ))
+
+
+async def _generate_text(llm: BaseLlm, llm_request: LlmRequest, cache_key: str) -> Tuple[str, Optional[str]]:
+    """Calls the model, retrying throttled calls, and stores the result in the LLM cache.
+
+    Returns the text and the finish reason of the call.
+    """
+    for attempt in range(LLM_THROTTLE_RETRIES + 1):
+        outcome: Dict[str, Any] = {}
+        try:
+            full_response = await collect_text(_stream_once(llm, llm_request, stream=False, outcome=outcome))
+            break
+        except Exception as e:
+            if not is_throttle_error(e) or attempt == LLM_THROTTLE_RETRIES:
+                raise
+            print(f"--- LLM throttled by provider, retrying ({attempt + 1}/{LLM_THROTTLE_RETRIES}) ---")
+
+    finish_reason = outcome.get("finish_reason")
+    await _store_text(cache_key, full_response, finish_reason)
+    return full_response, finish_reason
+
+
+async def stream_llm_async(prompt: str, model_name: Optional[str] = None,
+                           config: Optional[types.GenerateContentConfig] = None,
+                           outcome: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+    """Streams the model's answer to a prompt - yields text chunks as they are generated.
+
+    Errors are raised to the consumer; use call_llm_async for the error-string behaviour.
+    The finish reason is recorded in outcome["finish_reason"] when outcome is given.
+    """
+    outcome = outcome if outcome is not None else {}
+    llm = get_llm_client(model_name)
+    llm_request = build_llm_request(llm, prompt, config)
+    cache_key = request_cache_key(llm_request)
+
+    cache = get_llm_cache()
+    if cache:
+        cached_response = await asyncio.to_thread(cache.get, cache_key)
+        if cached_response is not None:
+            end_span(start_span("llm", llm.model, cache="hit"))
+            outcome["finish_reason"] = finish_reason_name(cached_response)
+            yield response_text(cached_response)
+            return
+
+    async for chunk in _stream_text(llm, llm_request, cache_key, outcome):
+        yield chunk
+
+
+async def _stream_text(llm: BaseLlm, llm_request: LlmRequest, cache_key: str,
+                       outcome: Dict[str, Any]) -> AsyncGenerator[str, None]:
+    """Streams the model's answer, retrying throttled calls, and stores the result in the LLM cache."""
+    chunks: List[str] = []
+    for attempt in range(LLM_THROTTLE_RETRIES + 1):
+        try:
+            async for chunk in _stream_once(llm, llm_request, stream=True, outcome=outcome):
+                chunks.append(chunk)
+                yield chunk
+            break
+        except Exception as e:
+            # Only retry while nothing has been handed to the consumer yet
+            if chunks or not is_throttle_error(e) or attempt == LLM_THROTTLE_RETRIES:
+                raise
+            print(f"--- LLM throttled by provider, retrying ({attempt + 1}/{LLM_THROTTLE_RETRIES}) ---")
+
+    await _store_text(cache_key, "".join(chunks), outcome.get("finish_reason"))
+
+
+class _ChunkFanOut:
+    """The chunks of one streamed call, handed to every caller sharing it - late joiners get the earlier ones first."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.queues: List[asyncio.Queue] = []
+        self.closed = False
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in self.chunks:
+            queue.put_nowait(chunk)
+        if self.closed:
+            queue.put_nowait(None)
+        self.queues.append(queue)
+        return queue
+
+    def publish(self, chunk: str):
+        self.chunks.append(chunk)
+        for queue in self.queues:
+            queue.put_nowait(chunk)
+
+    def close(self):
+        self.closed = True
+        for queue in self.queues:
+            queue.put_nowait(None)
+
+
+# Fan-out of every streamed helper call in flight, by request cache key
+_chunk_fan_outs: Dict[str, _ChunkFanOut] = {}
+
+
+async def _generate_streamed(llm: BaseLlm, llm_request: LlmRequest, cache_key: str,
+                             fan_out: _ChunkFanOut) -> Tuple[str, Optional[str]]:
+    """Streams one upstream call into a fan-out and returns its text and finish reason."""
+    outcome: Dict[str, Any] = {}
+    try:
+        async for chunk in _stream_text(llm, llm_request, cache_key, outcome):
+            fan_out.publish(chunk)
+    finally:
+        fan_out.close()
+        if _chunk_fan_outs.get(cache_key) is fan_out:
+            del _chunk_fan_outs[cache_key]
+    return "".join(fan_out.chunks), outcome.get("finish_reason")
+
+
+async def _call_streamed(llm: BaseLlm, llm_request: LlmRequest, cache_key: str,
+                         on_chunk: Callable[[str], Any]) -> Tuple[str, Optional[str]]:
+    """Streams a call to on_chunk through the single-flight group.
+
+    Identical calls in flight share one upstream call, streamed or not, and every
+    streaming caller receives the whole text through its own on_chunk, in its own
+    context - a caller that joined a call that was not streamed gets it in one piece.
+    """
+    fan_out = _chunk_fan_outs.setdefault(cache_key, _ChunkFanOut())
+    queue = fan_out.subscribe()
+    call = asyncio.ensure_future(llm_single_flight.do(
+        cache_key, lambda: _generate_streamed(llm, llm_request, cache_key, fan_out)))
+    delivered: List[str] = []
+    try:
+        while True:
+            next_chunk = asyncio.ensure_future(queue.get())
+            await asyncio.wait({next_chunk, call}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_chunk.done():
+                next_chunk.cancel()
+                break
+            chunk = next_chunk.result()
+            if chunk is None:
+                break
+            delivered.append(chunk)
+            result = on_chunk(chunk)
+            if inspect.isawaitable(result):
+                await result
+        text, finish_reason = await call
+        rest = text[len("".join(delivered)):]
+        if rest:
+            result = on_chunk(rest)
+            if inspect.isawaitable(result):
+                await result
+        return text, finish_reason
+    finally:
+        if not call.done():
+            call.cancel()  # the shared call itself is shielded and keeps running for the others
+        fan_out.queues.remove(queue)
+        if not fan_out.queues and _chunk_fan_outs.get(cache_key) is fan_out:
+            del _chunk_fan_outs[cache_key]
+
+
+# Receives partial text from tool LLM calls; set by the client driving an agent
+partial_text_listener: ContextVar[Optional[Callable[[str], Any]]] = ContextVar(
+    "partial_text_listener", default=None
+)
+
+
+@contextmanager
+def listen_for_partial_text(on_chunk: Optional[Callable[[str], Any]]):
+    """Streams the text of every tool LLM call made inside the block to on_chunk (None = no streaming)."""
+    token = partial_text_listener.set(on_chunk)
+    try:
+        yield
+    finally:
+        partial_text_listener.reset(token)
+
+
+async def call_llm_async(prompt: str, model_name: Optional[str] = None,
+                         config: Optional[types.GenerateContentConfig] = None,
+                         on_chunk: Optional[Callable[[str], Any]] = None) -> str:
+    """Helper function to call LLM for content generation in tools - supports both Azure and Google.
+
+    When on_chunk is given (or a partial text listener is active) the answer is
+    streamed and every chunk is handed to it before the full text is returned.
+    """
+    text, _ = await call_llm_with_finish_reason(prompt, model_name, config, on_chunk)
+    return text
+
+
+async def call_llm_with_finish_reason(prompt: str, model_name: Optional[str] = None,
+                                      config: Optional[types.GenerateContentConfig] = None,
+                                      on_chunk: Optional[Callable[[str], Any]] = None) -> Tuple[str, Optional[str]]:
+    """Like call_llm_async, but also returns the finish reason ("STOP", "MAX_TOKENS", ... or None)."""
+    try:
+        on_chunk = on_chunk or partial_text_listener.get()
+        llm = get_llm_client(model_name)
+        llm_request = build_llm_request(llm, prompt, config)
+        cache_key = request_cache_key(llm_request)
+
+        cache = get_llm_cache()
+        if cache:
+            cached_response = await asyncio.to_thread(cache.get, cache_key)
+            if cached_response is not None:
+                end_span(start_span("llm", llm.model, cache="hit"))
+                text = response_text(cached_response)
+                if on_chunk is not None and text:
+                    result = on_chunk(text)
+                    if inspect.isawaitable(result):
+                        await result
+                return text, finish_reason_name(cached_response)
+
+        # Identical requests already in flight share one upstream call
+        if on_chunk is not None:
+            return await _call_streamed(llm, llm_request, cache_key, on_chunk)
+        return await llm_single_flight.do(
+            cache_key, lambda: _generate_text(llm, llm_request, cache_key)
+        )
+    except Exception as e:
+        print(f"Error calling LLM: {e}")
+        print(f"Full error details:\n{traceback.format_exc()}")
+        return f"[LLM Error: Could not generate content. {str(e)}]", None
+
+
+async def aclose_llm_clients():
+    """Closes every pooled client and empties the pool."""
+    clients = list(_llm_clients.values())
+    _llm_clients.clear()
+    for client in clients:
+        # Only close the google.genai client if it was ever created
+        if isinstance(client, Gemini) and "api_client" in client.__dict__:
+            await client.api_client.aio.aclose()
@@ -0,0 +1,444 @@
+"""
+Deterministic offline stand-ins for the LLM and Tavily backends.
+
+Select them with environment variables:
+    LLM_BACKEND=mock      create_llm() / call_llm_async() use MockLlm
+    SEARCH_BACKEND=mock   atavily_search_results() / tavily_search() use MockTavilyClient
+
+Both produce the same output for the same input, with configurable latency,
+token rate and error injection, so every agent can be run and benchmarked
+without API keys or network access. MockTavilyServer serves the same search
+responses over local HTTP, for measuring the live Tavily client's connection
+handling offline.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+# Load environment variables
+load_dotenv()
+
+# Backend selection and mock behaviour - 可以通过环境变量配置
+LLM_BACKEND = os.getenv("LLM_BACKEND", "live").lower()
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "tavily").lower()
+MOCK_SEED = int(os.getenv("MOCK_SEED", "0"))
+MOCK_LLM_LATENCY_MS = float(os.getenv("MOCK_LLM_LATENCY_MS", "50"))
+MOCK_LLM_TOKENS_PER_SECOND = float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "0"))  # 0 = no pacing
+MOCK_LLM_OUTPUT_TOKENS = int(os.getenv("MOCK_LLM_OUTPUT_TOKENS", "200"))
+MOCK_LLM_MAX_OUTPUT_TOKENS = int(os.getenv("MOCK_LLM_MAX_OUTPUT_TOKENS", "0"))  # 0 = no output cap
+MOCK_LLM_ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+MOCK_LLM_ERROR_KIND = os.getenv("MOCK_LLM_ERROR_KIND", "throttle")  # throttle | server
+MOCK_TAVILY_LATENCY_MS = float(os.getenv("MOCK_TAVILY_LATENCY_MS", "100"))
+MOCK_TAVILY_ERROR_RATE = float(os.getenv("MOCK_TAVILY_ERROR_RATE", "0"))
+
+_WORDS = (
+    "ancient river lantern storm harbor signal memory forest engine silver quiet border "
+    "promise shadow archive garden winter bridge voice letter mountain market tide ember "
+    "compass orbit ledger thread mirror canyon meadow beacon circuit harvest citadel "
+    "whisper journey courage secret crystal frontier"
+).split()
+
+_STOP_WORDS = {"about", "with", "that", "this", "from", "what", "write", "novel", "story",
+               "research", "topic", "please", "their", "there", "which", "would", "should"}
+
+# Tools the scripted policy only calls when the user asks for them
+_ON_DEMAND_TOOL_PREFIXES = ("get_",)
+# "Prefer <tool> over <tool>" in an agent's instruction: the second is only a fallback
+_PREFERENCE = re.compile(r"\bprefer (\w+) over (\w+)", re.IGNORECASE)
+
+
+def _stable_hash(*parts: Any) -> int:
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return int(hashlib.sha256(data.encode("utf-8")).hexdigest()[:16], 16)
+
+
+def _significant_words(text: str) -> List[str]:
+    words = re.findall(r"[a-z][a-z\-]+", text.lower())
+    return [w for w in words if len(w) > 3 and w not in _STOP_WORDS]
+
+
+def mock_prose(seed: int, tokens: int) -> str:
+    """Deterministic filler prose of roughly `tokens` words."""
+    rng = random.Random(seed)
+    sentences = []
+    remaining = tokens
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 16))
+        words = [rng.choice(_WORDS) for _ in range(length)]
+        sentences.append(" ".join(words).capitalize() + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def _is_relayed_context(text: str) -> bool:
+    """ADK relays other agents' turns to the current agent as user-role context text."""
+    return text.startswith("For context") or "<<<BEGIN_QUOTED_AGENT_CONTENT>>>" in text
+
+
+def _request_text(llm_request: LlmRequest) -> Tuple[str, str]:
+    """Returns (system instruction, text of the latest user message)."""
+    config = llm_request.config
+    system = config.system_instruction if config and isinstance(config.system_instruction, str) else ""
+    user_text = ""
+    for content in llm_request.contents:
+        if content.role == "user":
+            texts = [p.text for p in content.parts or [] if p.text and not _is_relayed_context(p.text)]
+            if texts:
+                user_text = "\n".join(texts)
+    return system, user_text
+
+
+def _current_turn_calls(llm_request: LlmRequest) -> Tuple[List[str], str]:
+    """Names of the tools this agent already called since the latest user message, and the
+    context relayed from the other agents that handled the message before it."""
+    called: List[str] = []
+    relayed: List[str] = []
+    for content in llm_request.contents:
+        for part in content.parts or []:
+            if part.function_response:
+                called.append(part.function_response.name)
+            elif content.role == "user" and part.text:
+                if not _is_relayed_context(part.text):
+                    called, relayed = [], []
+                else:
+                    relayed.append(part.text)
+    return called, "\n".join(relayed)
+
+
+def _declaration_schema(declaration: types.FunctionDeclaration) -> Dict[str, Any]:
+    if declaration.parameters_json_schema:
+        return declaration.parameters_json_schema
+    if declaration.parameters:
+        return declaration.parameters.model_dump(exclude_none=True)
+    return {}
+
+
+def _declared_functions(llm_request: LlmRequest) -> List[types.FunctionDeclaration]:
+    config = llm_request.config
+    declarations = []
+    for tool in (config.tools if config and config.tools else []):
+        declarations.extend(getattr(tool, "function_declarations", None) or [])
+    return declarations
+
+
+class MockLlm(BaseLlm):
+    """Deterministic local model with configurable latency, token rate and error injection.
+
+    Agents with tools follow a scripted policy: each declared tool is called once
+    per user turn, in declaration order, then a final text answer is returned.
+    A tool the instruction says to prefer another declared tool over is skipped.
+    transfer_to_agent targets the sub-agent whose name and description best match
+    the user's request.
+    """
+
+    latency_ms: float = MOCK_LLM_LATENCY_MS
+    tokens_per_second: float = MOCK_LLM_TOKENS_PER_SECOND
+    output_tokens: int = MOCK_LLM_OUTPUT_TOKENS
+    # Output cap, like a provider's; longer answers are cut and finish with MAX_TOKENS
+    max_output_tokens: int = MOCK_LLM_MAX_OUTPUT_TOKENS
+    error_rate: float = MOCK_LLM_ERROR_RATE
+    error_kind: str = MOCK_LLM_ERROR_KIND
+    seed: int = MOCK_SEED
+    # Usage counters, read by the benchmarks
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"mock/.*"]
+
+    def _maybe_fail(self):
+        if self.error_rate and random.Random(_stable_hash(self.seed, self.calls)).random() < self.error_rate:
+            if self.error_kind == "throttle":
+                raise RuntimeError("429 RESOURCE_EXHAUSTED: mock rate limit exceeded")
+            raise RuntimeError("500 INTERNAL: mock server error")
+
+    def _transfer_target(self, system: str, user_text: str, agent_names: List[str]) -> Optional[str]:
+        descriptions = dict(re.findall(r"Agent name: (\S+)\s*\nAgent description: ([^\n]*)", system))
+        user_words = set(_significant_words(user_text))
+        best, best_score = None, 0
+        for name in agent_names:
+            name_words = set(_significant_words(name.replace("_", " "))) - {"agent"}
+            score = 3 * len(name_words & user_words)
+            score += len(set(_significant_words(descriptions.get(name, ""))) & user_words)
+            if score > best_score:
+                best, best_score = name, score
+        return best
+
+    def _mock_args(self, declaration: types.FunctionDeclaration, user_text: str) -> Dict[str, Any]:
+        schema = _declaration_schema(declaration)
+        args: Dict[str, Any] = {}
+        for name, prop in (schema.get("properties") or {}).items():
+            prop_type = str(prop.get("type", "string")).lower()
+            if prop.get("enum"):
+                args[name] = prop["enum"][0]
+            elif prop_type in ("integer", "number"):
+                args[name] = 1
+            elif prop_type == "boolean":
+                args[name] = True
+            elif "length" in name:
+                args[name] = "medium"
+            elif "role" in name:
+                args[name] = "protagonist"
+            elif name.endswith("name"):
+                args[name] = random.Random(_stable_hash(self.seed, user_text)).choice(
+                    ["Avery", "Lyra", "Finn", "Mara", "Theo", "Iris"])
+            else:
+                args[name] = user_text.strip()[:200] or "general topic"
+        return args
+
+    def _next_function_call(self, llm_request: LlmRequest, system: str,
+                            user_text: str) -> Optional[types.FunctionCall]:
+        called, relayed = _current_turn_calls(llm_request)
+        declarations = _declared_functions(llm_request)
+        declared = {declaration.name for declaration in declarations}
+        fallbacks = {fallback for preferred, fallback in _PREFERENCE.findall(system) if preferred in declared}
+        for declaration in declarations:
+            if declaration.name in called or declaration.name in fallbacks:
+                continue
+            if declaration.name == "transfer_to_agent":
+                if called:
+                    continue  # finish this agent's own tool work before handing off
+                schema = _declaration_schema(declaration)
+                agent_names = schema.get("properties", {}).get("agent_name", {}).get("enum", [])
+                if relayed:
+                    # Handed this message by another agent: only delegate further down, to the
+                    # sub-agents - ADK lists them before the parent agent
+                    parent = re.search(r"transfer to your parent agent (\w+)", system)
+                    if parent and parent.group(1) in agent_names:
+                        agent_names = agent_names[:agent_names.index(parent.group(1))]
+                    agent_names = [name for name in agent_names if name not in relayed]
+                target = self._transfer_target(system, user_text, agent_names)
+                if target:
+                    return types.FunctionCall(name="transfer_to_agent", args={"agent_name": target})
+                continue
+            if declaration.name.startswith(_ON_DEMAND_TOOL_PREFIXES) and not re.search(
+                    r"progress|status", user_text, re.IGNORECASE):
+                continue
+            return types.FunctionCall(name=declaration.name, args=self._mock_args(declaration, user_text))
+        return None
+
+    def _mock_text(self, llm_request: LlmRequest, system: str, user_text: str) -> str:
+        seed = _stable_hash(self.seed, system, [c.model_dump(exclude_none=True) for c in llm_request.contents])
+        prompt = user_text
+
+        if "JSON list" in prompt:
+            words = _significant_words(prompt.split("Topic:")[-1]) or ["topic"]
+            topic = " ".join(words[:4])
+            angles = ["overview of", "history of", "recent developments in",
+                      "key challenges in", "future trends in", "case studies of"]
+            return json.dumps([f"{angle} {topic}" for angle in angles])
+        if '"selected_results"' in prompt:
+            count = len(re.findall(r"^Result \d+:", prompt, re.MULTILINE))
+            selected = [{"result_index": i + 1, "relevance_score": round(9.5 - i * 0.5, 1),
+                         "reason": "Directly relevant to the topic."} for i in range(min(6, count))]
+            return json.dumps({"selected_results": selected, "filtering_summary": "Kept the most relevant sources."})
+        if '"summaries"' in prompt:
+            count = len(re.findall(r"^Content \[\d+\]:", prompt, re.MULTILINE))
+            summaries = [mock_prose(seed + i, self.output_tokens) for i in range(count)]
+            return json.dumps({"summaries": summaries})
+        if "Genre: [extracted_genre]" in system:
+            genres = ["science fiction", "fantasy", "mystery", "romance", "thriller", "horror",
+                      "historical", "adventure", "drama"]
+            genre = next((g for g in genres if g in prompt.lower()), "fantasy")
+            length = next((l for l in ("short", "long") if l in prompt.lower()), "medium")
+            theme_match = re.search(r"about\s+([^,\.!?]+)", prompt, re.IGNORECASE)
+            theme = theme_match.group(1).strip() if theme_match else "adventure and discovery"
+            return f"Genre: {genre}\nTheme: {theme}\nLength: {length}"
+        return mock_prose(seed, self.output_tokens)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        self._maybe_fail()
+
+        system, user_text = _request_text(llm_request)
+        prompt_tokens = (len(system) + sum(
+            len(p.text or "") for c in llm_request.contents for p in c.parts or [])) // 4
+
+        self.prompt_tokens += prompt_tokens
+
+        function_call = self._next_function_call(llm_request, system, user_text)
+        if function_call is not None:
+            self.completion_tokens += 10
+            yield LlmResponse(
+                content=types.Content(role="model", parts=[types.Part(function_call=function_call)]),
+                usage_metadata=types.GenerateContentResponseUsageMetadata(
+                    prompt_token_count=prompt_tokens, candidates_token_count=10,
+                    total_token_count=prompt_tokens + 10),
+            )
+            return
+
+        text = self._mock_text(llm_request, system, user_text)
+        words = text.split(" ")
+        finish_reason = types.FinishReason.STOP
+        cap = min(filter(None, [self.max_output_tokens, llm_request.config and llm_request.config.max_output_tokens]),
+                  default=0)
+        if cap and len(words) > cap:
+            words = words[:cap]
+            text = " ".join(words)
+            finish_reason = types.FinishReason.MAX_TOKENS
+        self.completion_tokens += len(words)
+        chunk_size = 16
+        if stream or self.tokens_per_second:
+            for i in range(0, len(words), chunk_size):
+                chunk = " ".join(words[i:i + chunk_size]) + (" " if i + chunk_size < len(words) else "")
+                if self.tokens_per_second:
+                    await asyncio.sleep(len(words[i:i + chunk_size]) / self.tokens_per_second)
+                if stream:
+                    yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=chunk)]),
+                                      partial=True)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            finish_reason=finish_reason,
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens, candidates_token_count=len(words),
+                total_token_count=prompt_tokens + len(words)),
+        )
+
+
+def mock_search_response(query: str, max_results: int = 5, include_raw_content: bool = False,
+                         seed: int = MOCK_SEED) -> dict:
+    """Deterministic Tavily-shaped search response; related queries share some result URLs."""
+    words = _significant_words(query) or ["general"]
+    offset = _stable_hash(seed, query) % len(words)
+    results = []
+    for i in range(max_results):
+        word = words[(offset + i) % len(words)]
+        slug = f"{word}-{i // len(words)}" if i >= len(words) else word
+        result_seed = _stable_hash(seed, slug)
+        item = {
+            "title": f"{slug.replace('-', ' ').title()}: an overview",
+            "url": f"https://mock-search.local/articles/{slug}",
+            "content": mock_prose(result_seed, 40),
+        }
+        if include_raw_content:
+            item["raw_content"] = mock_prose(result_seed + 1, 300)
+        results.append(item)
+    return {"query": query, "results": results}
+
+
+class MockTavilyClient:
+    """Async stand-in for tavily.AsyncTavilyClient."""
+
+    def __init__(self, api_key: Optional[str] = None, latency_ms: float = MOCK_TAVILY_LATENCY_MS,
+                 error_rate: float = MOCK_TAVILY_ERROR_RATE, seed: int = MOCK_SEED):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.seed = seed
+        self.calls = 0
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if self.error_rate and random.Random(_stable_hash(self.seed, "search", self.calls)).random() < self.error_rate:
+            raise RuntimeError("503 Service Unavailable: mock search error")
+
+    async def search(self, query: str, search_depth: str = "basic", max_results: int = 5,
+                     include_raw_content: bool = False, **kwargs) -> dict:
+        await asyncio.sleep(self.latency_ms / 1000)
+        self._maybe_fail()
+        return mock_search_response(query, max_results, include_raw_content, self.seed)
+
+
+class MockTavilySyncClient(MockTavilyClient):
+    """Blocking stand-in for tavily.TavilyClient."""
+
+    def search(self, query: str, search_depth: str = "basic", max_results: int = 5,
+               include_raw_content: bool = False, **kwargs) -> dict:
+        time.sleep(self.latency_ms / 1000)
+        self._maybe_fail()
+        return mock_search_response(query, max_results, include_raw_content, self.seed)
+
+
+class MockTavilyServer:
+    """Local HTTP/1.1 stand-in for the Tavily API with keep-alive.
+
+    Serves POST /search with mock_search_response() after latency_ms and counts
+    the TCP connections it accepts and the requests it answers, so connection
+    reuse and per-query latency of the live clients can be measured offline:
+        with MockTavilyServer() as server:   # TAVILY_API_BASE_URL=server.url
+            ...
+    """
+
+    def __init__(self, latency_ms: float = MOCK_TAVILY_LATENCY_MS, seed: int = MOCK_SEED,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.latency_ms = latency_ms
+        self.seed = seed
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency_ms / 1000)
+                if self.path.rstrip("/") != "/search":
+                    payload, status = {"detail": {"error": f"Unknown endpoint {self.path}"}}, 404
+                else:
+                    payload, status = mock_search_response(
+                        body.get("query", ""), int(body.get("max_results", 5)),
+                        bool(body.get("include_raw_content")), server.seed), 200
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockTavilyServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockTavilyServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
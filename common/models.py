@@ -0,0 +1,117 @@
+"""
+Model tiering for the agents and tools of all three packages.
+
+A config file (common/model_tiers.json, or the file named by
+LLM_MODEL_TIERS_FILE) assigns every agent and tool to a tier - a fast, cheap
+model for extraction, routing, beats and summaries, a premium model for prose
+and final reports - and names each tier's model per provider. Agents are
+created with create_llm(model_for(agent_name)) and tool helpers call
+call_llm_async(prompt, model_for(tool_name)). Tier prices give cost
+estimates, and with LLM_BACKEND=mock each tier's mock model gets the tier's
+relative latency and speed, so benchmarks show the difference offline.
+"""
+
+import fnmatch
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from .llm import USE_AZURE, default_model_name
+
+# Load environment variables
+load_dotenv()
+
+# Tier configuration - 可以通过环境变量配置
+LLM_MODEL_TIERING = os.getenv("LLM_MODEL_TIERING", "true").lower() == "true"
+LLM_MODEL_TIERS_FILE = os.getenv("LLM_MODEL_TIERS_FILE", str(Path(__file__).parent / "model_tiers.json"))
+
+_EMPTY_CONFIG = {"default_tier": None, "tiers": {}, "assignments": {}}
+_config: Optional[Dict[str, Any]] = None
+
+
+def load_tier_config(path: Optional[str] = None) -> Dict[str, Any]:
+    """Reads a tier config file; a missing file means one model for everything."""
+    try:
+        config = json.loads(Path(path or LLM_MODEL_TIERS_FILE).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return dict(_EMPTY_CONFIG)
+    return {**_EMPTY_CONFIG, **config}
+
+
+def get_tier_config() -> Dict[str, Any]:
+    """Returns the tier config in use, loading it on first use."""
+    global _config
+    if _config is None:
+        _config = load_tier_config()
+    return _config
+
+
+def set_tier_config(config: Optional[Dict[str, Any]]):
+    """Replaces the tier config (None reloads the file on next use)."""
+    global _config
+    _config = config
+
+
+def set_model_tiering(enabled: bool):
+    """Turns tiering on or off; off, every agent and tool uses the default model."""
+    global LLM_MODEL_TIERING
+    LLM_MODEL_TIERING = enabled
+
+
+def tier_for(name: str) -> Optional[str]:
+    """Returns the tier assigned to an agent or tool: an exact name first, then the first matching pattern."""
+    config = get_tier_config()
+    assignments = config["assignments"]
+    if name in assignments:
+        return assignments[name]
+    for pattern, tier in assignments.items():
+        if fnmatch.fnmatchcase(name, pattern):
+            return tier
+    return config["default_tier"]
+
+
+def tier_model(tier: Optional[str]) -> str:
+    """Returns the model name of a tier for the configured provider."""
+    settings = get_tier_config()["tiers"].get(tier) or {}
+    return settings.get("azure" if USE_AZURE else "google") or default_model_name()
+
+
+def model_for(name: str) -> Optional[str]:
+    """Returns the model an agent or tool runs on, or None for the default model."""
+    if not LLM_MODEL_TIERING:
+        return None
+    tier = tier_for(name)
+    return tier_model(tier) if tier else None
+
+
+def tier_of_model(model_name: str) -> Optional[str]:
+    """Returns the tier a model belongs to ("mock/" and "azure/" prefixes ignored), else the default tier."""
+    config = get_tier_config()
+    bare = model_name.split("/", 1)[1] if model_name.startswith(("mock/", "azure/")) else model_name
+    tiers = [tier for tier in config["tiers"] if tier_model(tier) == bare]
+    # The default model may serve several tiers; it then counts as the default tier
+    if config["default_tier"] in tiers or not tiers:
+        return config["default_tier"]
+    return tiers[0]
+
+
+def estimate_cost(model_name: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimates the USD cost of token usage on a model from its tier's prices."""
+    tier = get_tier_config()["tiers"].get(tier_of_model(model_name)) or {}
+    prices = tier.get("price_per_million_tokens") or {}
+    return (prompt_tokens * prices.get("prompt", 0) + completion_tokens * prices.get("completion", 0)) / 1e6
+
+
+def mock_profile(model_name: str) -> Dict[str, float]:
+    """Returns the latency and speed scale of a model's tier for the mock backend."""
+    tier = get_tier_config()["tiers"].get(tier_of_model(model_name)) or {}
+    profile = tier.get("mock") or {}
+    return {"latency_scale": profile.get("latency_scale", 1.0), "speed_scale": profile.get("speed_scale", 1.0)}
+
+
+def get_model_assignments(*names: str) -> Dict[str, str]:
+    """Returns the model each named agent or tool runs on."""
+    return {name: model_for(name) or default_model_name() for name in names}
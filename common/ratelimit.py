@@ -0,0 +1,283 @@
+"""
+Provider-aware rate limiting and adaptive concurrency for LLM calls.
+
+Each model gets a limiter with two token buckets - requests per minute and
+tokens per minute - plus an AIMD concurrency window: every successful call
+grows the window additively, every throttled call (HTTP 429 /
+RESOURCE_EXHAUSTED) halves it and pauses the model for a backoff period, so
+throughput settles just under the provider's quota instead of producing a
+storm of errors. An optional process-wide budget caps the calls of all
+models together, on top of each model's own limits.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from dotenv import load_dotenv
+from google.adk.models.llm_request import LlmRequest
+
+# Load environment variables
+load_dotenv()
+
+# Rate limit configuration - 可以通过环境变量配置
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_THROTTLE_RETRIES = int(os.getenv("LLM_THROTTLE_RETRIES", "3"))
+# Per-model overrides, e.g. {"azure/gpt-4.1": {"rpm": 100, "tpm": 60000, "max_concurrency": 4}}
+LLM_RATE_LIMITS = json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))
+
+# Default quotas per provider (0 = unlimited)
+PROVIDER_RATE_LIMITS = {
+    "azure": {"rpm": 300, "tpm": 50_000},
+    "gemini": {"rpm": 2_000, "tpm": 4_000_000},
+    "default": {"rpm": 0, "tpm": 0},
+}
+
+THROTTLE_ERROR_CODES = {"429", "RESOURCE_EXHAUSTED", "RATE_LIMIT_EXCEEDED"}
+_THROTTLE_MARKERS = ("429", "rate limit", "ratelimit", "resource_exhausted", "too many requests", "quota")
+
+MIN_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class LlmThrottledError(Exception):
+    """Raised when the provider answers a model call with a throttling error."""
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """Returns True when an exception is the provider telling us to slow down."""
+    if isinstance(error, LlmThrottledError):
+        return True
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in _THROTTLE_MARKERS)
+
+
+def estimate_request_tokens(llm_request: LlmRequest) -> int:
+    """Roughly estimates the tokens a request will use (~4 characters per token)."""
+    chars = 0
+    for content in llm_request.contents:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+    config = llm_request.config
+    if config and isinstance(config.system_instruction, str):
+        chars += len(config.system_instruction)
+    max_output = (config.max_output_tokens if config else None) or 0
+    return chars // 4 + max_output
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to one minute of quota."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, amount: float):
+        """Takes tokens without waiting - the balance may go negative."""
+        self._refill()
+        self.tokens -= amount
+
+    async def acquire(self, amount: float):
+        """Waits until the bucket holds enough tokens, then takes them."""
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class AimdConcurrencyLimiter:
+    """Concurrency window with additive increase and multiplicative decrease."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease_factor: float = 0.5):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_factor = decrease_factor
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self):
+        """Waits for a free slot in the current window."""
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()  # pass the wakeup on to the next waiter
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self, throttled: Optional[bool] = False):
+        """Frees a slot and adapts the window (None leaves the window unchanged)."""
+        self.in_flight -= 1
+        if throttled:
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        elif throttled is not None:
+            # +1 per full window of successful calls
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class ModelRateLimiter:
+    """Requests-per-minute, tokens-per-minute and AIMD concurrency limits for one model."""
+
+    def __init__(self, model: str, rpm: float = 0, tpm: float = 0,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.model = model
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AimdConcurrencyLimiter(max_concurrency)
+        self.backoff_seconds = MIN_BACKOFF_SECONDS
+        self.paused_until = 0.0
+        # Process-wide budget the model's calls also count against, and the budgets calls in flight hold
+        self.shared: Optional["ModelRateLimiter"] = None
+        self._shared_held: List[Optional["ModelRateLimiter"]] = []
+        self.stats = {"requests": 0, "throttled": 0, "tokens": 0, "wait_seconds": 0.0}
+
+    async def acquire(self, estimated_tokens: int):
+        """Waits until the model, and the process-wide budget if any, has quota and a free concurrency slot."""
+        shared = self.shared
+        if shared is not None:
+            await shared.acquire(estimated_tokens)
+        try:
+            await self._acquire(estimated_tokens)
+        except BaseException:
+            if shared is not None:
+                shared.concurrency.release(throttled=None)
+            raise
+        self._shared_held.append(shared)
+
+    async def _acquire(self, estimated_tokens: int):
+        started = time.monotonic()
+        pause = self.paused_until - started
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+        await self.concurrency.acquire()
+        try:
+            if self.requests:
+                await self.requests.acquire(1)
+            if self.tokens:
+                await self.tokens.acquire(estimated_tokens)
+        except BaseException:
+            self.concurrency.release(throttled=None)
+            raise
+
+        self.stats["requests"] += 1
+        self.stats["wait_seconds"] += time.monotonic() - started
+
+    def release(self, estimated_tokens: int, used_tokens: Optional[int] = None,
+                throttled: bool = False):
+        """Returns the slot, settles the token estimate and adapts to throttling."""
+        if used_tokens is not None:
+            self.stats["tokens"] += used_tokens
+            if self.tokens:
+                self.tokens.consume(used_tokens - estimated_tokens)
+
+        if throttled:
+            self.stats["throttled"] += 1
+            # Pause the whole model so queued callers do not hit the quota again
+            self.paused_until = time.monotonic() + self.backoff_seconds
+            self.backoff_seconds = min(MAX_BACKOFF_SECONDS, self.backoff_seconds * 2)
+        else:
+            self.backoff_seconds = MIN_BACKOFF_SECONDS
+        self.concurrency.release(throttled)
+
+        shared = self._shared_held.pop(0) if self._shared_held else None
+        if shared is not None:
+            # Throttling is the model's; the budget only counts the call
+            shared.release(estimated_tokens, used_tokens)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+        }
+
+
+def _provider(model: str) -> str:
+    if model.startswith("azure/"):
+        return "azure"
+    if "gemini" in model:
+        return "gemini"
+    return "default"
+
+
+# One limiter per model name
+_rate_limiters: Dict[str, ModelRateLimiter] = {}
+# Budget shared by the calls of every model, if one is set
+_process_budget: Optional[ModelRateLimiter] = None
+
+PROCESS_BUDGET_NAME = "*"
+
+
+def get_rate_limiter(model: str) -> ModelRateLimiter:
+    """Returns the limiter for a model, configured from provider defaults and overrides."""
+    limiter = _rate_limiters.get(model)
+    if limiter is None:
+        limits = {**PROVIDER_RATE_LIMITS[_provider(model)],
+                  "max_concurrency": LLM_MAX_CONCURRENCY,
+                  **LLM_RATE_LIMITS.get(model, {})}
+        limiter = ModelRateLimiter(model, **limits)
+        limiter.shared = _process_budget
+        _rate_limiters[model] = limiter
+    return limiter
+
+
+def set_process_rate_budget(rpm: float = 0, tpm: float = 0,
+                            max_concurrency: int = 0) -> Optional[ModelRateLimiter]:
+    """Caps the model calls of the whole process together, whatever model they go to (all 0 removes the cap).
+
+    Every model's own limits still apply; a call waits for both.
+    """
+    global _process_budget
+    _process_budget = None
+    if rpm or tpm or max_concurrency:
+        # No concurrency cap given: the models' own windows decide
+        _process_budget = ModelRateLimiter(PROCESS_BUDGET_NAME, rpm, tpm, max_concurrency or 2**31)
+    for limiter in _rate_limiters.values():
+        limiter.shared = _process_budget
+    return _process_budget
+
+
+def get_process_rate_budget() -> Optional[ModelRateLimiter]:
+    """Returns the process-wide budget, or None when only per-model limits apply."""
+    return _process_budget
+
+
+def get_rate_limiter_stats() -> dict:
+    """Returns request, throttle and concurrency counters per model, and of the process-wide budget as "*"."""
+    stats = {model: limiter.get_stats() for model, limiter in _rate_limiters.items()}
+    if _process_budget is not None:
+        stats[PROCESS_BUDGET_NAME] = _process_budget.get_stats()
+    return stats
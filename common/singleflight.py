@@ -0,0 +1,43 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+Concurrent callers that share a request key await one upstream call and all
+receive its result (or its exception). The upstream call runs in its own task,
+so a caller being cancelled does not cancel the call for everyone else.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into a single upstream call."""
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Runs fn() once per key at a time; concurrent callers share its result."""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+            self.stats["calls"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        """Returns the number of distinct upstream calls currently running."""
+        return len(self._in_flight)
@@ -0,0 +1,225 @@
+"""
+Progressive event stream of an agent run, shared by the novel, novel_fix and
+deep_research clients.
+
+runner.run_async only yields ADK events, and a client that stops at the first
+final response sees the first stage of a pipeline and nothing else.
+stream_agent_events() drives the whole run and yields one StreamEvent at a
+time, as things happen:
+
+    run_start     the run began
+    stage_start   an agent (pipeline stage) began
+    partial_text  text of a model call in progress, attributed to its stage
+    progress      a finished piece of a stage's output (e.g. one chapter of an act)
+    output        a stage's output event (its text and the state keys it wrote)
+    stage_end     an agent finished, with its duration and status
+    run_end       the run finished, with the final response and total duration
+
+Stage boundaries come from a runner plugin's agent callbacks, so they are
+exact for every agent type - LlmAgents, custom BaseAgents and workflow agents.
+"""
+
+import asyncio
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Callable, Dict, NamedTuple, Optional, Tuple
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.run_config import RunConfig
+from google.adk.events import Event
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.runners import Runner
+from google.genai import types
+
+from .llm import listen_for_partial_text
+
+PLUGIN_NAME = "stage_event_stream"
+
+# The stage the current code runs in, for attributing partial text
+_current_stage: ContextVar[str] = ContextVar("current_stage", default="")
+
+_DONE = object()
+
+
+class StreamEvent(NamedTuple):
+    """One step of an agent run, as yielded by stream_agent_events."""
+
+    kind: str
+    stage: str = ""
+    elapsed: float = 0.0  # seconds since the run started
+    text: str = ""
+    duration: Optional[float] = None  # stage_end and run_end
+    status: str = ""  # stage_end and run_end: "ok", "error" or "ended" (no after callback)
+    state_keys: Tuple[str, ...] = ()
+    metadata: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> dict:
+        """Returns the event as a JSON-serialisable dict, e.g. for a server-sent event."""
+        return {key: value for key, value in self._asdict().items() if value not in (None, "", ())}
+
+
+def format_stream_event(event: StreamEvent) -> str:
+    """Renders a stage or run event as one line of progress output."""
+    if event.kind == "stage_start":
+        return f"--- [{event.elapsed:7.2f}s] ▶ {event.stage} ---"
+    if event.kind == "stage_end":
+        return f"--- [{event.elapsed:7.2f}s] ■ {event.stage} {event.status} in {event.duration:.2f}s ---"
+    if event.kind == "run_end":
+        return f"--- [{event.elapsed:7.2f}s] run {event.status} in {event.duration:.2f}s ---"
+    if event.kind == "progress":
+        details = ", ".join(f"{key} {value}" for key, value in (event.metadata or {}).items() if value)
+        return f"--- [{event.elapsed:7.2f}s] {event.stage}: {details} ready ---"
+    return f"--- [{event.elapsed:7.2f}s] {event.kind} {event.stage} ---"
+
+
+class _RunListener:
+    """Turns the callbacks and events of one run into StreamEvents."""
+
+    def __init__(self, root: str, emit: Callable[[StreamEvent], None]):
+        self.root = root
+        self.emit = emit
+        self.started = time.perf_counter()
+        self.stage_starts: Dict[str, float] = {}
+        self.final_text = ""
+
+    def _elapsed(self) -> float:
+        return round(time.perf_counter() - self.started, 4)
+
+    def start(self):
+        self.emit(StreamEvent("run_start", self.root))
+
+    def stage_started(self, name: str):
+        if name == self.root:
+            return
+        self.stage_starts[name] = time.perf_counter()
+        self.emit(StreamEvent("stage_start", name, self._elapsed()))
+
+    def stage_finished(self, name: str, status: str = "ok", error: str = ""):
+        started = self.stage_starts.pop(name, None)
+        if started is None:
+            return
+        self.emit(StreamEvent("stage_end", name, self._elapsed(), error,
+                              round(time.perf_counter() - started, 4), status))
+
+    def on_chunk(self, chunk: str):
+        self.emit(StreamEvent("partial_text", _current_stage.get(), self._elapsed(), chunk))
+
+    def on_event(self, event: Event):
+        if event.author == "user":
+            return
+        text = "".join(part.text for part in (event.content.parts if event.content else None) or []
+                       if part.text and not part.thought)
+        if event.partial:
+            kind = "progress" if event.custom_metadata else "partial_text"
+            self.emit(StreamEvent(kind, event.author, self._elapsed(), text, metadata=event.custom_metadata))
+            return
+        state_keys = tuple(event.actions.state_delta) if event.actions and event.actions.state_delta else ()
+        if text or state_keys:
+            self.emit(StreamEvent("output", event.author, self._elapsed(), text, state_keys=state_keys))
+        if text and event.is_final_response():
+            self.final_text = text
+
+    def finish(self, error: str = ""):
+        # Stages skipped by a before-agent callback (e.g. restored from a checkpoint) or that
+        # handed the run to another agent get no after callback
+        for name in list(self.stage_starts):
+            self.stage_finished(name, "error" if error else "ended")
+        duration = self._elapsed()
+        self.emit(StreamEvent("run_end", self.root, duration, error or self.final_text, duration,
+                              "error" if error else "ok"))
+
+
+class StageEventPlugin(BasePlugin):
+    """Reports the start and end of every agent to the stream of the session it runs in."""
+
+    def __init__(self):
+        super().__init__(name=PLUGIN_NAME)
+        self.listeners: Dict[Tuple[str, str], _RunListener] = {}
+
+    def _listener(self, callback_context: CallbackContext) -> Optional[_RunListener]:
+        return self.listeners.get((callback_context.user_id, callback_context.session.id))
+
+    async def before_agent_callback(self, *, agent: BaseAgent,
+                                    callback_context: CallbackContext) -> Optional[types.Content]:
+        listener = self._listener(callback_context)
+        if listener is not None:
+            _current_stage.set(agent.name)
+            listener.stage_started(agent.name)
+        return None
+
+    async def after_agent_callback(self, *, agent: BaseAgent,
+                                   callback_context: CallbackContext) -> Optional[types.Content]:
+        listener = self._listener(callback_context)
+        if listener is not None:
+            listener.stage_finished(agent.name)
+        return None
+
+    async def on_agent_error_callback(self, *, agent: BaseAgent, callback_context: CallbackContext,
+                                      error: Exception) -> None:
+        listener = self._listener(callback_context)
+        if listener is not None:
+            listener.stage_finished(agent.name, "error", f"{type(error).__name__}: {error}")
+
+
+def stage_event_plugin(runner: Runner) -> StageEventPlugin:
+    """Returns the runner's stage event plugin, registering it on first use."""
+    plugin = runner.plugin_manager.get_plugin(PLUGIN_NAME)
+    if plugin is None:
+        plugin = StageEventPlugin()
+        runner.plugin_manager.register_plugin(plugin)
+    return plugin
+
+
+async def stream_agent_events(runner: Runner, user_id: str, session_id: str, query: str,
+                              run_config: Optional[RunConfig] = None) -> AsyncGenerator[StreamEvent, None]:
+    """Runs a query to completion and yields the stage events, partial text and timings as they happen.
+
+    Errors of the run are raised after its stage_end/run_end events have been yielded.
+    """
+    plugin = stage_event_plugin(runner)
+    key = (user_id, session_id)
+    if key in plugin.listeners:
+        raise RuntimeError(f"session {session_id} already has a run in progress")
+    queue: asyncio.Queue = asyncio.Queue()
+    listener = _RunListener(runner.agent.name, queue.put_nowait)
+    plugin.listeners[key] = listener
+    message = types.Content(role="user", parts=[types.Part(text=query)])
+
+    async def drive():
+        listener.start()
+        try:
+            with listen_for_partial_text(listener.on_chunk):
+                async for event in runner.run_async(user_id=user_id, session_id=session_id,
+                                                    new_message=message, run_config=run_config):
+                    listener.on_event(event)
+        except Exception as e:
+            listener.finish(f"{type(e).__name__}: {e}")
+            raise
+        else:
+            listener.finish()
+        finally:
+            queue.put_nowait(_DONE)
+
+    task = asyncio.create_task(drive())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            yield item
+        await task
+    finally:
+        plugin.listeners.pop(key, None)
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+async def notify(callback: Optional[Callable[[Any], Any]], value: Any):
+    """Calls a sync or async callback, if one is given."""
+    if callback is not None:
+        result = callback(value)
+        if inspect.isawaitable(result):
+            await result
@@ -0,0 +1,320 @@
+"""
+Structured latency and token instrumentation for agents, tools and LLM calls.
+
+Every agent run, tool function, sub-agent transfer, LLM call and web search is
+recorded as a span with its duration, prompt/completion tokens, cache status
+(and bytes saved by a search cache hit) and error status. Finished spans are
+
+- mirrored to the OpenTelemetry API, so they join the ADK traces whenever a
+  tracer provider is configured (e.g. ``adk web --otel_to_cloud``),
+- available as OTLP/JSON records (``export_otlp_json``) and optionally appended
+  to a JSON lines file (TELEMETRY_EXPORT_PATH),
+- aggregated into Prometheus metrics served as text on ``/metrics``
+  (TELEMETRY_METRICS_PORT), next to ``adk web``.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from opentelemetry import trace
+
+# Load environment variables
+load_dotenv()
+
+# Telemetry configuration - 可以通过环境变量配置
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+TELEMETRY_MAX_SPANS = int(os.getenv("TELEMETRY_MAX_SPANS", "10000"))
+TELEMETRY_EXPORT_PATH = os.getenv("TELEMETRY_EXPORT_PATH", "")  # JSON lines of OTLP spans
+TELEMETRY_METRICS_PORT = int(os.getenv("TELEMETRY_METRICS_PORT", "0"))  # 0 = no /metrics endpoint
+TELEMETRY_SERVICE_NAME = os.getenv("TELEMETRY_SERVICE_NAME", "minion-novel")
+
+SPAN_KINDS = ("agent", "tool", "transfer", "llm", "search")
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_tracer = trace.get_tracer(__name__)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def trace_id_for(invocation_id: str) -> str:
+    """Maps an ADK invocation id to a stable 128-bit trace id."""
+    return hashlib.md5(invocation_id.encode("utf-8")).hexdigest()
+
+
+class Span:
+    """One timed operation - an agent run, a tool call, a transfer or an LLM call."""
+
+    def __init__(self, kind: str, name: str, parent: Optional["Span"] = None,
+                 trace_id: Optional[str] = None, **attributes):
+        self.kind = kind
+        self.name = name
+        self.trace_id = parent.trace_id if parent else (trace_id or _new_id(128))
+        self.span_id = _new_id(64)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = {"agent": parent.attributes.get("agent", "") if parent else "", **attributes}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+        self.duration = 0.0
+
+        otel_context = trace.set_span_in_context(parent.otel_span) if parent else None
+        self.otel_span = _tracer.start_span(f"{kind} {name}", context=otel_context,
+                                            start_time=self.start_ns)
+
+    def finish(self, error: Optional[str] = None, **attributes):
+        self.duration = time.perf_counter() - self._started
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+        self.error = error
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+        self.otel_span.set_attributes({f"minion.{k}": v for k, v in self.attributes.items()})
+        if error:
+            self.otel_span.set_status(trace.Status(trace.StatusCode.ERROR, error))
+        self.otel_span.end(end_time=self.end_ns)
+
+    def to_otlp(self) -> dict:
+        """Returns the span in the OTLP/JSON span encoding."""
+        attributes = [{"key": "minion.kind", "value": {"stringValue": self.kind}}]
+        for key, value in self.attributes.items():
+            if isinstance(value, bool):
+                encoded = {"boolValue": value}
+            elif isinstance(value, int):
+                encoded = {"intValue": str(value)}
+            elif isinstance(value, float):
+                encoded = {"doubleValue": value}
+            else:
+                encoded = {"stringValue": str(value)}
+            attributes.append({"key": f"minion.{key}", "value": encoded})
+        record = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": f"{self.kind} {self.name}",
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": attributes,
+            "status": ({"code": "STATUS_CODE_ERROR", "message": self.error} if self.error
+                       else {"code": "STATUS_CODE_OK"}),
+        }
+        if self.parent_id:
+            record["parentSpanId"] = self.parent_id
+        return record
+
+
+class Telemetry:
+    """Keeps recent finished spans and aggregates them into Prometheus metrics."""
+
+    def __init__(self, max_spans: int = TELEMETRY_MAX_SPANS, export_path: str = ""):
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        self.export_path = export_path
+        # (kind, name, agent) -> aggregated counters
+        self.metrics: Dict[Tuple[str, str, str], dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, span: Span):
+        """Stores a finished span and adds it to the metrics."""
+        key = (span.kind, span.name, span.attributes.get("agent", ""))
+        with self._lock:
+            self.spans.append(span)
+            metric = self.metrics.get(key)
+            if metric is None:
+                metric = {"count": 0, "errors": 0, "seconds": 0.0,
+                          "buckets": [0] * len(DURATION_BUCKETS),
+                          "prompt_tokens": 0, "completion_tokens": 0, "cache": {}, "bytes_saved": 0}
+                self.metrics[key] = metric
+            metric["count"] += 1
+            metric["seconds"] += span.duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    metric["buckets"][i] += 1
+            if span.error:
+                metric["errors"] += 1
+            metric["prompt_tokens"] += span.attributes.get("prompt_tokens", 0)
+            metric["completion_tokens"] += span.attributes.get("completion_tokens", 0)
+            metric["bytes_saved"] += span.attributes.get("bytes_saved", 0)
+            cache_status = span.attributes.get("cache")
+            if cache_status:
+                metric["cache"][cache_status] = metric["cache"].get(cache_status, 0) + 1
+
+        if self.export_path:
+            with self._lock, open(self.export_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(span.to_otlp()) + "\n")
+
+    def export_otlp_json(self) -> dict:
+        """Returns the recent spans as an OTLP/JSON ExportTraceServiceRequest."""
+        with self._lock:
+            spans = [span.to_otlp() for span in self.spans]
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": TELEMETRY_SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]}
+
+    def prometheus_text(self) -> str:
+        """Renders the aggregated metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP minion_span_duration_seconds Duration of agent runs, tool calls, transfers and LLM calls.",
+            "# TYPE minion_span_duration_seconds histogram",
+        ]
+        errors = ["# HELP minion_span_errors_total Spans that finished with an error.",
+                  "# TYPE minion_span_errors_total counter"]
+        tokens = ["# HELP minion_llm_tokens_total Prompt and completion tokens used by LLM calls.",
+                  "# TYPE minion_llm_tokens_total counter"]
+        cache = ["# HELP minion_llm_cache_requests_total LLM calls by response cache status.",
+                 "# TYPE minion_llm_cache_requests_total counter"]
+        search_cache = ["# HELP minion_search_cache_requests_total Web searches by result cache status.",
+                        "# TYPE minion_search_cache_requests_total counter",
+                        "# HELP minion_search_cache_bytes_saved_total Response bytes served from the search cache.",
+                        "# TYPE minion_search_cache_bytes_saved_total counter"]
+
+        with self._lock:
+            metrics = sorted(self.metrics.items())
+            for (kind, name, agent), metric in metrics:
+                labels = f'kind="{_escape(kind)}",name="{_escape(name)}",agent="{_escape(agent)}"'
+                for bound, count in zip(DURATION_BUCKETS, metric["buckets"]):
+                    lines.append(f'minion_span_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'minion_span_duration_seconds_bucket{{{labels},le="+Inf"}} {metric["count"]}')
+                lines.append(f'minion_span_duration_seconds_sum{{{labels}}} {metric["seconds"]:.6f}')
+                lines.append(f'minion_span_duration_seconds_count{{{labels}}} {metric["count"]}')
+                errors.append(f'minion_span_errors_total{{{labels}}} {metric["errors"]}')
+                if kind == "llm":
+                    for token_type in ("prompt", "completion"):
+                        tokens.append(f'minion_llm_tokens_total{{{labels},type="{token_type}"}} '
+                                      f'{metric[token_type + "_tokens"]}')
+                    for status, count in sorted(metric["cache"].items()):
+                        cache.append(f'minion_llm_cache_requests_total{{{labels},cache="{status}"}} {count}')
+                elif kind == "search":
+                    for status, count in sorted(metric["cache"].items()):
+                        search_cache.append(
+                            f'minion_search_cache_requests_total{{{labels},cache="{status}"}} {count}')
+                    search_cache.append(f'minion_search_cache_bytes_saved_total{{{labels}}} {metric["bytes_saved"]}')
+        return "\n".join(lines + errors + tokens + cache + search_cache) + "\n"
+
+    def get_summary(self) -> Dict[str, dict]:
+        """Returns count, latency, errors, tokens and cache use per span kind and name."""
+        summary: Dict[str, dict] = {}
+        with self._lock:
+            for (kind, name, _agent), metric in self.metrics.items():
+                entry = summary.setdefault(f"{kind}:{name}", {
+                    "count": 0, "errors": 0, "total_seconds": 0.0,
+                    "prompt_tokens": 0, "completion_tokens": 0})
+                entry["count"] += metric["count"]
+                entry["errors"] += metric["errors"]
+                entry["total_seconds"] += metric["seconds"]
+                entry["prompt_tokens"] += metric["prompt_tokens"]
+                entry["completion_tokens"] += metric["completion_tokens"]
+                for status, count in metric["cache"].items():
+                    entry.setdefault("cache", {})
+                    entry["cache"][status] = entry["cache"].get(status, 0) + count
+                if metric["bytes_saved"]:
+                    entry["bytes_saved"] = entry.get("bytes_saved", 0) + metric["bytes_saved"]
+        for entry in summary.values():
+            entry["mean_ms"] = round(entry["total_seconds"] / entry["count"] * 1000, 2)
+            entry["total_seconds"] = round(entry["total_seconds"], 4)
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.metrics.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+telemetry = Telemetry(export_path=TELEMETRY_EXPORT_PATH)
+
+# The span the current code runs inside (a tool call), parent of LLM helper spans
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def start_span(kind: str, name: str, parent: Optional[Span] = None,
+               trace_id: Optional[str] = None, **attributes) -> Optional[Span]:
+    """Starts a span (None when telemetry is disabled); the current span is the default parent."""
+    if not TELEMETRY_ENABLED:
+        return None
+    return Span(kind, name, parent or current_span.get(), trace_id, **attributes)
+
+
+def end_span(span: Optional[Span], error: Optional[str] = None, **attributes):
+    """Finishes a span and records it."""
+    if span is None or span.end_ns is not None:
+        return
+    span.finish(error, **attributes)
+    telemetry.record(span)
+
+
+def usage_attributes(usage) -> dict:
+    """Prompt and completion token attributes from response usage metadata."""
+    if usage is None:
+        return {}
+    return {"prompt_tokens": usage.prompt_token_count or 0,
+            "completion_tokens": usage.candidates_token_count or 0}
+
+
+def get_telemetry_summary() -> Dict[str, dict]:
+    return telemetry.get_summary()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body = telemetry.prometheus_text().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?")[0] == "/traces":
+            body = json.dumps(telemetry.export_otlp_json()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes are too frequent to log
+
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int = TELEMETRY_METRICS_PORT, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serves /metrics (Prometheus text) and /traces (OTLP/JSON) from a background thread."""
+    global _metrics_server
+    if _metrics_server is None:
+        _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=_metrics_server.serve_forever, name="telemetry-metrics",
+                         daemon=True).start()
+        print(f"--- Telemetry: serving metrics on http://{host}:{_metrics_server.server_port}/metrics ---")
+    return _metrics_server
+
+
+def stop_metrics_server():
+    global _metrics_server
+    if _metrics_server is not None:
+        _metrics_server.shutdown()
+        _metrics_server.server_close()
+        _metrics_server = None
+
+
+# `adk web` imports the agents, which import this module - start the endpoint next to it
+if TELEMETRY_ENABLED and TELEMETRY_METRICS_PORT:
+    try:
+        start_metrics_server()
+    except OSError as e:
+        print(f"--- Telemetry: could not serve metrics on port {TELEMETRY_METRICS_PORT}: {e} ---")
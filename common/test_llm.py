@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared LLM infrastructure (runs offline, no API keys needed).
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-placeholder-key")
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from common import llm as shared_llm
+from common.cache import LlmResponseCache, request_cache_key, set_llm_cache
+from common.ratelimit import AimdConcurrencyLimiter, TokenBucket, get_rate_limiter, is_throttle_error
+from common.singleflight import SingleFlight
+
+
+def make_response(text: str) -> LlmResponse:
+    return LlmResponse(content=types.Content(role='model', parts=[types.Part(text=text)]))
+
+
+class CountingLlm(BaseLlm):
+    """Slow stand-in model that counts how often it is actually called."""
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        yield make_response(f"reply to: {llm_request.contents[-1].parts[0].text}")
+
+
+class FlakyLlm(BaseLlm):
+    """Stand-in model that is throttled on its first call."""
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("429 Too Many Requests")
+        yield make_response("recovered")
+
+
+class StreamingLlm(BaseLlm):
+    """Stand-in model that streams partial chunks, then a final multi-part response."""
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.calls += 1
+        chunks = ["Act 1: ", "the storm. ", "Act 2: ", "the calm."]
+        if stream:
+            for chunk in chunks:
+                await asyncio.sleep(0.01)
+                yield LlmResponse(content=types.Content(role='model', parts=[types.Part(text=chunk)]),
+                                  partial=True)
+        yield LlmResponse(content=types.Content(
+            role='model', parts=[types.Part(text="".join(chunks[:2])), types.Part(text="".join(chunks[2:]))]
+        ))
+
+
+def test_client_pooling():
+    """The same model name always maps to the same long-lived client."""
+    print("=== Testing LLM Client Pooling ===")
+
+    first = shared_llm.get_llm_client()
+    second = shared_llm.create_llm()
+    other = shared_llm.get_llm_client("pool-test-model")
+
+    assert first is second, "pooled client should be reused"
+    assert other is not first, "different models should get different clients"
+    assert other.model.endswith("pool-test-model")
+    print(f"Pooled clients: {sorted(shared_llm._llm_clients)}")
+
+
+def test_build_llm_request():
+    """Plain prompts become single-turn requests addressed to the pooled model."""
+    print("\n=== Testing LLM Request Construction ===")
+
+    llm = shared_llm.get_llm_client()
+    request = shared_llm.build_llm_request(llm, "Hello")
+
+    assert request.model == llm.model
+    assert request.contents[0].parts[0].text == "Hello"
+    print(f"Request model: {request.model}")
+
+
+def test_cache_key():
+    """Keys depend on model, contents and config but not on labels."""
+    print("\n=== Testing LLM Cache Keys ===")
+
+    llm = shared_llm.get_llm_client()
+    base = shared_llm.build_llm_request(llm, "Outline a fantasy novel")
+    same = shared_llm.build_llm_request(llm, "Outline a fantasy novel")
+    same.config.labels = {"adk_agent_name": "outline_agent"}
+    other_prompt = shared_llm.build_llm_request(llm, "Outline a mystery novel")
+    other_config = shared_llm.build_llm_request(
+        llm, "Outline a fantasy novel", types.GenerateContentConfig(temperature=0.2)
+    )
+
+    assert request_cache_key(base) == request_cache_key(same)
+    assert request_cache_key(base) != request_cache_key(other_prompt)
+    assert request_cache_key(base) != request_cache_key(other_config)
+    print(f"Key: {request_cache_key(base)[:16]}...")
+
+
+def test_cache_lru_and_ttl():
+    """Entries persist on disk, evict least recently used first and expire."""
+    print("\n=== Testing LLM Cache LRU and TTL ===")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = LlmResponseCache(cache_dir, max_bytes=10_000)
+        cache.put("a" * 64, make_response("first"))
+        entry_size = cache.get_stats()["bytes"]
+        cache.max_bytes = entry_size * 2 + 16  # room for exactly two entries
+
+        cache.put("b" * 64, make_response("second"))
+        assert cache.get("a" * 64).content.parts[0].text == "first"  # a is now most recent
+        cache.put("c" * 64, make_response("third"))
+
+        assert cache.get("b" * 64) is None, "least recently used entry should be evicted"
+        assert cache.get("a" * 64) is not None
+        stats = cache.get_stats()
+        assert stats["evictions"] == 1 and stats["hits"] == 2 and stats["misses"] == 1
+
+        # A fresh instance rebuilds its index from disk
+        reopened = LlmResponseCache(cache_dir, max_bytes=10_000, ttl_seconds=60)
+        assert reopened.get("c" * 64).content.parts[0].text == "third"
+        reopened.ttl_seconds = 0.01
+        time.sleep(0.02)
+        assert reopened.get("c" * 64) is None
+        assert reopened.get_stats()["expired"] == 1
+        print(f"Stats: {stats}")
+
+
+def test_helper_cache_hit():
+    """call_llm_async answers from the cache without touching the model, reading it off the event loop."""
+    print("\n=== Testing LLM Helper Cache Hit ===")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = LlmResponseCache(cache_dir, max_bytes=10_000)
+        set_llm_cache(cache)
+        try:
+            llm = shared_llm.get_llm_client()
+            prompt = "Generate research queries for: tide pools"
+            cache.put(request_cache_key(shared_llm.build_llm_request(llm, prompt)),
+                      make_response('["query one", "query two"]'))
+
+            # Cache files are read and written on worker threads, never on the event loop's
+            threads = []
+            get, put = cache.get, cache.put
+
+            def tracking_get(key):
+                threads.append(threading.current_thread())
+                return get(key)
+
+            def tracking_put(key, response):
+                threads.append(threading.current_thread())
+                put(key, response)
+
+            cache.get, cache.put = tracking_get, tracking_put
+            text = asyncio.run(shared_llm.call_llm_async(prompt))
+            asyncio.run(shared_llm._store_text("d" * 64, "stored"))
+            assert text == '["query one", "query two"]'
+            assert cache.get_stats()["hits"] == 1 and get("d" * 64) is not None
+            assert len(threads) == 2 and threading.main_thread() not in threads, threads
+            print(f"Cached text: {text}")
+        finally:
+            set_llm_cache(None)
+
+
+def test_single_flight():
+    """Concurrent identical requests share one upstream call; errors reach every caller."""
+    print("\n=== Testing Single-Flight Coalescing ===")
+
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def upstream(value):
+            calls.append(value)
+            await asyncio.sleep(0.02)
+            return value
+
+        results = await asyncio.gather(*[flight.do("same", lambda: upstream(1)) for _ in range(5)])
+        assert results == [1] * 5 and len(calls) == 1
+        assert flight.stats == {"calls": 1, "coalesced": 4} and flight.in_flight() == 0
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failed")
+
+        errors = await asyncio.gather(*[flight.do("bad", failing) for _ in range(3)],
+                                      return_exceptions=True)
+        assert all(isinstance(e, RuntimeError) for e in errors)
+
+        # A cancelled caller does not cancel the shared call
+        shared = asyncio.ensure_future(flight.do("slow", lambda: upstream(2)))
+        waiter = asyncio.ensure_future(flight.do("slow", lambda: upstream(2)))
+        await asyncio.sleep(0)
+        shared.cancel()
+        assert await waiter == 2
+
+    asyncio.run(run())
+
+
+def test_helper_single_flight():
+    """call_llm_async bursts with the same prompt make a single model call."""
+    print("\n=== Testing LLM Helper Coalescing ===")
+
+    fake = CountingLlm(model="counting-model")
+    shared_llm._llm_clients["counting-model"] = fake
+
+    async def burst():
+        prompts = ["Create an outline about tides"] * 4 + ["Create an outline about moons"]
+        return await asyncio.gather(
+            *[shared_llm.call_llm_async(p, model_name="counting-model") for p in prompts]
+        )
+
+    results = asyncio.run(burst())
+    assert fake.calls == 2, f"expected 2 upstream calls, got {fake.calls}"
+    assert len(set(results[:4])) == 1 and results[4] != results[0]
+    print(f"Upstream calls for 5 requests: {fake.calls}")
+
+
+def test_token_bucket_and_aimd():
+    """Buckets make callers wait for quota; the window halves on throttling and regrows."""
+    print("\n=== Testing Rate Limiter Primitives ===")
+
+    async def drain_bucket():
+        bucket = TokenBucket(per_minute=6000)  # 100 tokens per second
+        await bucket.acquire(6000)
+        started = time.monotonic()
+        await bucket.acquire(5)
+        return time.monotonic() - started
+
+    waited = asyncio.run(drain_bucket())
+    assert 0.03 < waited < 0.5, f"unexpected wait {waited:.3f}s"
+
+    window = AimdConcurrencyLimiter(max_limit=8)
+    window.in_flight = 1
+    window.release(throttled=True)
+    assert window.limit == 4
+    for _ in range(4):
+        window.in_flight = 1
+        window.release(throttled=False)
+    assert 4.9 < window.limit < 5, f"window should grow by ~1 per window, got {window.limit}"
+
+    assert is_throttle_error(RuntimeError("RESOURCE_EXHAUSTED: quota exceeded"))
+    assert not is_throttle_error(ValueError("invalid prompt"))
+    print(f"Bucket wait: {waited * 1000:.0f} ms, window after recovery: {window.limit:.2f}")
+
+
+def test_concurrency_window():
+    """No more than the window's worth of calls run at once."""
+    print("\n=== Testing Concurrency Window ===")
+
+    async def run():
+        window = AimdConcurrencyLimiter(max_limit=2)
+        running, peak = 0, 0
+
+        async def call():
+            nonlocal running, peak
+            await window.acquire()
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            window.release(throttled=False)
+
+        await asyncio.gather(*[call() for _ in range(6)])
+        return peak
+
+    assert asyncio.run(run()) == 2
+
+
+def test_helper_throttle_retry():
+    """Throttled helper calls back off and retry instead of returning an error string."""
+    print("\n=== Testing LLM Helper Throttle Retry ===")
+
+    flaky = FlakyLlm(model="flaky-model")
+    shared_llm._llm_clients["flaky-model"] = flaky
+    limiter = get_rate_limiter("flaky-model")
+    limiter.backoff_seconds = 0.01
+
+    text = asyncio.run(shared_llm.call_llm_async("Summarize the tides", model_name="flaky-model"))
+    assert text == "recovered" and flaky.calls == 2
+    assert limiter.stats["throttled"] == 1
+    assert limiter.concurrency.limit < limiter.concurrency.max_limit
+    print(f"Limiter stats: {limiter.get_stats()}")
+
+
+def test_streaming_helpers():
+    """Streaming yields each chunk once; non-streaming joins every part of the response."""
+    print("\n=== Testing Streaming LLM Helpers ===")
+
+    shared_llm._llm_clients["streaming-model"] = StreamingLlm(model="streaming-model")
+
+    async def run():
+        streamed = [chunk async for chunk in shared_llm.stream_llm_async("Outline", "streaming-model")]
+        collected = await shared_llm.collect_text(shared_llm.stream_llm_async("Outline", "streaming-model"))
+        whole = await shared_llm.call_llm_async("Outline again", model_name="streaming-model")
+
+        received = []
+        with shared_llm.listen_for_partial_text(received.append):
+            listened = await shared_llm.call_llm_async("Outline", model_name="streaming-model")
+        return streamed, collected, whole, received, listened
+
+    streamed, collected, whole, received, listened = asyncio.run(run())
+    assert streamed == ["Act 1: ", "the storm. ", "Act 2: ", "the calm."]
+    assert collected == whole == listened == "Act 1: the storm. Act 2: the calm."
+    assert received == streamed
+    print(f"Streamed {len(streamed)} chunks: {collected}")
+
+
+def test_streamed_helper_single_flight():
+    """Streamed helper calls are coalesced too, and every caller receives every chunk of the shared call."""
+    print("\n=== Testing Streamed Helper Coalescing ===")
+
+    model = StreamingLlm(model="streaming-flight-model")
+    shared_llm._llm_clients["streaming-flight-model"] = model
+    whole = "Act 1: the storm. Act 2: the calm."
+
+    async def run():
+        received = [[] for _ in range(5)]
+
+        async def listened_call(i: int) -> str:
+            if i == 4:
+                await asyncio.sleep(0.025)  # joins after the first chunks went out
+            with shared_llm.listen_for_partial_text(received[i].append):
+                return await shared_llm.call_llm_async("Outline the tides", model_name="streaming-flight-model")
+
+        results = await asyncio.gather(*(listened_call(i) for i in range(5)))
+        streamed_calls = model.calls
+
+        # A streaming caller that joins a call that is not streamed gets its text in one piece
+        joined = []
+        plain = asyncio.ensure_future(shared_llm.call_llm_async("Outline the moons",
+                                                                model_name="streaming-flight-model"))
+        await asyncio.sleep(0)
+        with shared_llm.listen_for_partial_text(joined.append):
+            listened = await shared_llm.call_llm_async("Outline the moons", model_name="streaming-flight-model")
+        return results, received, streamed_calls, await plain, listened, joined
+
+    results, received, streamed_calls, plain, listened, joined = asyncio.run(run())
+    assert streamed_calls == 1, f"5 identical streamed calls should make 1 upstream call, made {streamed_calls}"
+    assert results == [whole] * 5
+    assert all("".join(chunks) == whole for chunks in received), received
+    assert received[0] == ["Act 1: ", "the storm. ", "Act 2: ", "the calm."]
+    assert model.calls == 2 and plain == listened == whole and joined == [whole]
+    assert not shared_llm._chunk_fan_outs and shared_llm.llm_single_flight.in_flight() == 0
+    print(f"Upstream calls for 5 streamed requests: {streamed_calls}")
+
+
+def main():
+    """Run all tests"""
+    print("Shared LLM Test Suite")
+    print("=====================")
+
+    test_client_pooling()
+    test_build_llm_request()
+    test_cache_key()
+    test_cache_lru_and_ttl()
+    test_helper_cache_hit()
+    test_single_flight()
+    test_helper_single_flight()
+    test_token_bucket_and_aimd()
+    test_concurrency_window()
+    test_helper_throttle_retry()
+    test_streaming_helpers()
+    test_streamed_helper_single_flight()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test script for the offline mock LLM and Tavily backends.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+
+from common import llm as shared_llm
+from common.mock_backends import MockLlm, MockTavilyClient, mock_search_response
+
+
+def test_mock_llm_is_deterministic():
+    """Same prompt, same text; helper-shaped prompts get parseable answers."""
+    print("=== Testing Mock LLM Determinism ===")
+
+    shared_llm._llm_clients["mock-test"] = MockLlm(model="mock/test", latency_ms=0)
+
+    async def run():
+        first = await shared_llm.call_llm_async("Write about lighthouses", model_name="mock-test")
+        second = await shared_llm.call_llm_async("Write about lighthouses", model_name="mock-test")
+        other = await shared_llm.call_llm_async("Write about harbors", model_name="mock-test")
+        queries = await shared_llm.call_llm_async(
+            "Format your response as a JSON list of query strings:\nTopic: coral reefs", model_name="mock-test")
+        return first, second, other, queries
+
+    first, second, other, queries = asyncio.run(run())
+    assert first == second and first != other
+    assert queries.startswith("[") and "coral reefs" in queries
+    print(f"Prose: {first[:60]}...")
+    print(f"Queries: {queries[:60]}...")
+
+
+def test_mock_llm_latency_and_errors():
+    """Latency and token rate are applied; error injection raises throttling errors."""
+    print("\n=== Testing Mock LLM Latency and Error Injection ===")
+
+    paced = MockLlm(model="mock/paced", latency_ms=20, tokens_per_second=2000, output_tokens=100)
+    shared_llm._llm_clients["mock-paced"] = paced
+    started = time.monotonic()
+    chunks = asyncio.run(shared_llm.collect_text(shared_llm.stream_llm_async("Go", "mock-paced")))
+    elapsed = time.monotonic() - started
+    assert len(chunks.split()) == 100
+    assert 0.06 < elapsed < 1.0, f"expected ~70 ms, got {elapsed * 1000:.0f} ms"
+
+    failing = MockLlm(model="mock/failing", latency_ms=0, error_rate=1.0)
+
+    async def call_failing():
+        request = shared_llm.build_llm_request(failing, "Go")
+        async for _ in failing.generate_content_async(request):
+            pass
+
+    try:
+        asyncio.run(call_failing())
+        raise AssertionError("error injection did not raise")
+    except RuntimeError as e:
+        assert "429" in str(e)
+    print(f"Paced stream took {elapsed * 1000:.0f} ms")
+
+
+def test_mock_llm_output_cap():
+    """Answers longer than the output cap are cut and report MAX_TOKENS, through both helper paths."""
+    print("\n=== Testing Mock LLM Output Cap ===")
+
+    shared_llm._llm_clients["mock-capped"] = MockLlm(model="mock/capped", latency_ms=0, output_tokens=100,
+                                                     max_output_tokens=40)
+    shared_llm._llm_clients["mock-uncapped"] = MockLlm(model="mock/uncapped", latency_ms=0, output_tokens=100)
+
+    async def run():
+        capped = await shared_llm.call_llm_with_finish_reason("Write a chapter", model_name="mock-capped")
+        streamed = await shared_llm.call_llm_with_finish_reason("Write a chapter", model_name="mock-capped",
+                                                                on_chunk=lambda chunk: None)
+        uncapped = await shared_llm.call_llm_with_finish_reason("Write a chapter", model_name="mock-uncapped")
+        config = types.GenerateContentConfig(max_output_tokens=10)
+        by_config = await shared_llm.call_llm_with_finish_reason("Write a chapter", model_name="mock-uncapped",
+                                                                 config=config)
+        return capped, streamed, uncapped, by_config
+
+    capped, streamed, uncapped, by_config = asyncio.run(run())
+    assert len(capped[0].split()) == 40 and capped[1] == "MAX_TOKENS", capped
+    assert streamed == capped
+    assert len(uncapped[0].split()) == 100 and uncapped[1] == "STOP"
+    assert len(by_config[0].split()) == 10 and by_config[1] == "MAX_TOKENS"
+    print(f"Capped answer: {len(capped[0].split())} words, finish reason {capped[1]}")
+
+
+def test_mock_llm_tool_policy():
+    """Agents with tools call each tool once per turn, skipping the ones the instruction prefers others over."""
+    print("\n=== Testing Mock LLM Tool Policy ===")
+
+    calls = []
+
+    def gather_facts(topic: str, tool_context: ToolContext) -> dict:
+        calls.append(("gather_facts", topic))
+        return {"status": "success"}
+
+    def write_summary(topic: str, tool_context: ToolContext) -> dict:
+        calls.append(("write_summary", topic))
+        return {"status": "success"}
+
+    def look_up_fact(topic: str, tool_context: ToolContext) -> dict:
+        calls.append(("look_up_fact", topic))
+        return {"status": "success"}
+
+    agent = Agent(model=MockLlm(model="mock/agent", latency_ms=0), name="mock_policy_agent",
+                  instruction="Research and summarize. Prefer gather_facts over look_up_fact.",
+                  tools=[look_up_fact, gather_facts, write_summary])
+
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=agent, app_name="mock_test", session_service=session_service)
+        await session_service.create_session(app_name="mock_test", user_id="u", session_id="s")
+        message = types.Content(role="user", parts=[types.Part(text="tide pools")])
+        final = None
+        async for event in runner.run_async(user_id="u", session_id="s", new_message=message):
+            if event.is_final_response() and event.content and event.content.parts:
+                final = event.content.parts[0].text
+        return final
+
+    final = asyncio.run(run())
+    assert calls == [("gather_facts", "tide pools"), ("write_summary", "tide pools")]
+    assert final
+    print(f"Tool calls: {calls}")
+
+
+def test_mock_search():
+    """Search results are deterministic and Tavily-shaped; related queries overlap."""
+    print("\n=== Testing Mock Tavily Search ===")
+
+    client = MockTavilyClient(latency_ms=0)
+    response = asyncio.run(client.search("coral reef bleaching", max_results=5, include_raw_content=True))
+    assert response == mock_search_response("coral reef bleaching", 5, True)
+    assert len(response["results"]) == 5
+    assert all(r["raw_content"] and r["url"].startswith("https://") for r in response["results"])
+
+    related = mock_search_response("causes of coral reef bleaching", 5)
+    urls = {r["url"] for r in response["results"]}
+    assert urls & {r["url"] for r in related["results"]}, "related queries should share sources"
+    print(f"Result URLs: {sorted(urls)[:3]}...")
+
+
+def main():
+    """Run all tests"""
+    print("Mock Backends Test Suite")
+    print("========================")
+
+    test_mock_llm_is_deterministic()
+    test_mock_llm_latency_and_errors()
+    test_mock_llm_output_cap()
+    test_mock_llm_tool_policy()
+    test_mock_search()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
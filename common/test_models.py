@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-agent and per-tool model tiers.
+"""
+
+import asyncio
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the pipeline on the offline mock model
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "0")
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from common import llm as shared_llm
+from common import models
+from common.models import (
+    estimate_cost,
+    load_tier_config,
+    model_for,
+    set_model_tiering,
+    tier_for,
+    tier_of_model,
+)
+
+CONFIG = {
+    "default_tier": "premium",
+    "tiers": {
+        "fast": {"google": "small-model", "azure": "small-deployment",
+                 "price_per_million_tokens": {"prompt": 0.1, "completion": 0.4}},
+        "premium": {"google": None, "azure": None,
+                    "price_per_million_tokens": {"prompt": 2.0, "completion": 8.0}},
+    },
+    "assignments": {"parameter_extractor": "fast", "continuity_*": "fast", "act_3_writer": "premium"},
+}
+
+
+def test_assignments():
+    """Exact names win over patterns, unassigned names get the default tier, and tiering can be turned off."""
+    print("=== Testing Tier Assignments ===")
+
+    models.set_tier_config(CONFIG)
+    try:
+        assert tier_for("parameter_extractor") == "fast"
+        assert tier_for("continuity_act_1_keeper") == "fast"
+        assert tier_for("act_3_writer") == tier_for("unknown_agent") == "premium"
+        assert model_for("parameter_extractor") == "small-model"
+        assert model_for("act_3_writer") == shared_llm.default_model_name()
+
+        assert tier_of_model("mock/small-model") == "fast"
+        assert tier_of_model(shared_llm.default_model_name()) == "premium"
+        assert abs(estimate_cost("small-model", 1_000_000, 1_000_000) - 0.5) < 1e-9
+        assert abs(estimate_cost("mock/other-model", 1_000_000, 0) - 2.0) < 1e-9
+
+        set_model_tiering(False)
+        assert model_for("parameter_extractor") is None
+    finally:
+        set_model_tiering(True)
+        models.set_tier_config(None)
+
+    shipped = load_tier_config()
+    assert set(shipped["tiers"]) == {"fast", "premium"}
+    for name in ("parameter_extractor", "progress_agent", "novel_write_agent", "generate_research_queries"):
+        assert tier_for(name) == "fast", name
+    for name in ("act_2_writer", "opening_chapter_agent", "generate_research_report"):
+        assert tier_for(name) == "premium", name
+    assert load_tier_config("/nonexistent/tiers.json")["assignments"] == {}
+    print("Assignments OK")
+
+
+def test_pipeline_tiers():
+    """The novel_fix pipeline writes chapters on the premium model and its digests on the fast one."""
+    print("\n=== Testing Pipeline Tiers ===")
+
+    async def run():
+        from novel_fix import agent as novel_fix_agent
+        # With the (opt-in) continuity digests, which run on the fast tier
+        continuity, novel_fix_agent.NOVEL_FIX_CONTINUITY = novel_fix_agent.NOVEL_FIX_CONTINUITY, True
+        try:
+            root_agent = novel_fix_agent.create_root_agent()
+        finally:
+            novel_fix_agent.NOVEL_FIX_CONTINUITY = continuity
+        session_service = InMemorySessionService()
+        runner = Runner(agent=root_agent, app_name="tiers_test", session_service=session_service)
+        await session_service.create_session(app_name="tiers_test", user_id="u", session_id="s")
+        message = types.Content(role="user", parts=[types.Part(text="Write a short mystery novel about trust")])
+        async for _ in runner.run_async(user_id="u", session_id="s", new_message=message):
+            pass
+
+    fast, premium = shared_llm.get_llm_client(model_for("parameter_extractor")), shared_llm.get_llm_client()
+    assert fast is not premium
+    calls = fast.calls, premium.calls
+    asyncio.run(run())
+    fast_calls, premium_calls = fast.calls - calls[0], premium.calls - calls[1]
+    # Characters and 14 chapters on premium; the outline and 2 digests on fast (parameters are matched locally)
+    assert premium_calls == 15 and fast_calls == 3, (fast_calls, premium_calls)
+    print(f"fast tier: {fast_calls} calls on {fast.model}, premium tier: {premium_calls} calls on {premium.model}")
+
+
+def main():
+    """Run all tests"""
+    print("Model Tier Test Suite")
+    print("=====================")
+
+    test_assignments()
+    test_pipeline_tiers()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
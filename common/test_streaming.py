@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for the progressive stage event stream of agent runs.
+"""
+
+import asyncio
+import os
+import sys
+from typing import AsyncGenerator
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.agents import Agent, BaseAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from common import llm as shared_llm
+from common.mock_backends import MockLlm
+from common.streaming import format_stream_event, stream_agent_events
+
+
+class DraftAgent(BaseAgent):
+    """Drafts text with an LLM helper call, optionally failing afterwards."""
+
+    fail: bool = False
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        draft = await shared_llm.call_llm_async("Draft a scene about a storm", model_name="mock-streaming")
+        if self.fail:
+            raise RuntimeError("draft rejected")
+        yield Event(invocation_id=ctx.invocation_id, author=self.name, branch=ctx.branch,
+                    content=types.Content(role="model", parts=[types.Part(text=draft)]),
+                    actions=EventActions(state_delta={"draft": draft}))
+
+
+def build_pipeline(fail: bool = False) -> SequentialAgent:
+    llm = MockLlm(model="mock/streaming-agent", latency_ms=10)
+    return SequentialAgent(name="pipeline", sub_agents=[
+        DraftAgent(name="drafter", fail=fail),
+        Agent(model=llm, name="editor", instruction="Edit the draft.", output_key="edited"),
+    ])
+
+
+def collect(agent: BaseAgent) -> tuple:
+    """Streams one run; returns (events, error)."""
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=agent, app_name="streaming_test", session_service=session_service)
+        await session_service.create_session(app_name="streaming_test", user_id="u", session_id="s")
+        events = []
+        try:
+            async for event in stream_agent_events(runner, "u", "s", "Write a storm scene"):
+                events.append(event)
+        except RuntimeError as e:
+            return events, e
+        return events, None
+
+    return asyncio.run(run())
+
+
+def test_whole_run_is_streamed():
+    """Every stage of a sequential pipeline is streamed, not just the first final response."""
+    print("=== Testing Stage Event Stream ===")
+
+    shared_llm._llm_clients["mock-streaming"] = MockLlm(model="mock/streaming", latency_ms=10)
+    events, error = collect(build_pipeline())
+    assert error is None
+    for event in events:
+        if event.kind != "partial_text":
+            print(format_stream_event(event))
+
+    kinds = [(event.kind, event.stage) for event in events if event.kind != "partial_text"]
+    assert kinds[0] == ("run_start", "pipeline") and kinds[-1][0] == "run_end"
+    for stage in ("drafter", "editor"):
+        assert kinds.index(("stage_start", stage)) < kinds.index(("output", stage)) < kinds.index(("stage_end", stage))
+    assert kinds.index(("stage_end", "drafter")) < kinds.index(("stage_start", "editor"))
+
+    partial = [event for event in events if event.kind == "partial_text"]
+    assert partial and all(event.stage == "drafter" for event in partial), "helper text belongs to its stage"
+    draft = next(event for event in events if event.kind == "output" and event.stage == "drafter")
+    assert "".join(event.text for event in partial) == draft.text and draft.state_keys == ("draft",)
+
+    stage_ends = {event.stage: event for event in events if event.kind == "stage_end"}
+    assert all(event.status == "ok" and event.duration >= 0.01 for event in stage_ends.values())
+    run_end = events[-1]
+    editor_output = next(event for event in events if event.kind == "output" and event.stage == "editor")
+    assert run_end.status == "ok" and run_end.text == editor_output.text, "the final response is the last stage's"
+    assert run_end.duration >= sum(event.duration for event in stage_ends.values())
+    assert run_end.to_dict()["kind"] == "run_end"
+    print(f"{len(events)} events, {len(partial)} partial text chunks")
+
+
+def test_failed_stage():
+    """A failing stage ends with an error event, the run ends with an error, and the error is raised."""
+    print("\n=== Testing Failed Stage ===")
+
+    events, error = collect(build_pipeline(fail=True))
+    assert error is not None and "draft rejected" in str(error)
+    drafter_end = next(event for event in events if event.kind == "stage_end" and event.stage == "drafter")
+    assert drafter_end.status == "error" and "draft rejected" in drafter_end.text
+    assert events[-1].kind == "run_end" and events[-1].status == "error"
+    assert not any(event.stage == "editor" for event in events)
+    print(f"Failed stage: {format_stream_event(drafter_end)}")
+
+
+def main():
+    """Run all tests"""
+    print("Stage Event Stream Test Suite")
+    print("=============================")
+
+    test_whole_run_is_streamed()
+    test_failed_stage()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
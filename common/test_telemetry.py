@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for the agent, tool and LLM call telemetry.
+"""
+
+import asyncio
+import os
+import sys
+import urllib.request
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+
+from common import llm as shared_llm
+from common.callbacks import agent_callbacks
+from common.mock_backends import MockLlm
+from common.telemetry import start_metrics_server, stop_metrics_server, telemetry
+
+
+async def draft_scene_async(topic: str, tool_context: ToolContext) -> dict:
+    """Drafts a scene with an LLM helper call."""
+    scene = await shared_llm.call_llm_async(f"Draft a scene about {topic}", model_name="mock-telemetry")
+    return {"status": "success", "scene": scene}
+
+
+def review_scene(topic: str, tool_context: ToolContext) -> dict:
+    """Always fails, like a tool with nothing to review."""
+    return {"status": "error", "message": "Nothing to review"}
+
+
+def run_agent(agent: Agent, text: str):
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=agent, app_name="telemetry_test", session_service=session_service)
+        await session_service.create_session(app_name="telemetry_test", user_id="u", session_id="s")
+        message = types.Content(role="user", parts=[types.Part(text=text)])
+        async for _ in runner.run_async(user_id="u", session_id="s", new_message=message):
+            pass
+
+    asyncio.run(run())
+
+
+def test_spans_for_agent_tools_and_llm_calls():
+    """Agent runs, tool calls and LLM calls are recorded with tokens, cache and error status."""
+    print("=== Testing Telemetry Spans ===")
+
+    telemetry.reset()
+    shared_llm._llm_clients["mock-telemetry"] = MockLlm(model="mock/telemetry", latency_ms=0)
+    agent = Agent(model=MockLlm(model="mock/telemetry-agent", latency_ms=0), **agent_callbacks(),
+                  name="telemetry_agent", instruction="Draft and review a scene.",
+                  tools=[draft_scene_async, review_scene])
+    run_agent(agent, "a storm at sea")
+
+    spans = {(span.kind, span.name): span for span in telemetry.spans}
+    agent_span = spans[("agent", "telemetry_agent")]
+    tool_span = spans[("tool", "draft_scene_async")]
+    helper_span = spans[("llm", "mock/telemetry")]
+    model_span = spans[("llm", "mock/telemetry-agent")]
+
+    assert tool_span.parent_id == agent_span.span_id
+    assert helper_span.parent_id == tool_span.span_id, "helper LLM calls nest under their tool"
+    assert model_span.parent_id == agent_span.span_id
+    assert {span.trace_id for span in telemetry.spans} == {agent_span.trace_id}
+    assert model_span.attributes["prompt_tokens"] > 0 and model_span.attributes["completion_tokens"] > 0
+    assert model_span.attributes["agent"] == "telemetry_agent"
+    assert spans[("tool", "review_scene")].error == "Nothing to review"
+    assert agent_span.duration >= tool_span.duration > 0
+
+    summary = telemetry.get_summary()
+    assert summary["llm:mock/telemetry-agent"]["count"] == 3  # two tool calls, then the answer
+    print(f"Summary: {summary}")
+
+
+def test_transfer_spans():
+    """Sub-agent transfers are recorded as transfer spans with their target."""
+    print("\n=== Testing Transfer Spans ===")
+
+    telemetry.reset()
+    llm = MockLlm(model="mock/telemetry-transfer", latency_ms=0)
+    writer = Agent(model=llm, **agent_callbacks(), name="scene_writer",
+                   description="Writes scenes", instruction="Write the scene.")
+    coordinator = Agent(model=llm, **agent_callbacks(), name="coordinator",
+                        instruction="Delegate scene writing.", sub_agents=[writer])
+    run_agent(coordinator, "Ask the scene writer for a scene")
+
+    transfers = [span for span in telemetry.spans if span.kind == "transfer"]
+    assert len(transfers) == 1 and transfers[0].attributes["target"] == "scene_writer"
+    agents = {span.name: span for span in telemetry.spans if span.kind == "agent"}
+    assert agents["scene_writer"].parent_id == agents["coordinator"].span_id
+    assert agents["coordinator"].duration >= agents["scene_writer"].duration
+    print(f"Transfer: {transfers[0].attributes}")
+
+
+def test_exports():
+    """Spans export as OTLP/JSON and metrics are served in the Prometheus text format."""
+    print("\n=== Testing OTLP and Prometheus Exports ===")
+
+    otlp = telemetry.export_otlp_json()
+    spans = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert spans and all(len(span["traceId"]) == 32 and len(span["spanId"]) == 16 for span in spans)
+    assert all(span["status"]["code"] == "STATUS_CODE_OK" for span in spans)
+
+    server = start_metrics_server(port=0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode("utf-8")
+    finally:
+        stop_metrics_server()
+    assert "# TYPE minion_span_duration_seconds histogram" in body
+    assert 'minion_span_duration_seconds_count{kind="transfer",name="transfer_to_agent",agent="coordinator"} 1' in body
+    assert 'minion_llm_tokens_total{kind="llm",name="mock/telemetry-transfer",agent="coordinator",type="prompt"}' in body
+    assert 'cache="disabled"' in body
+    print(body.splitlines()[-1])
+
+
+def main():
+    """Run all tests"""
+    print("Telemetry Test Suite")
+    print("====================")
+
+    test_spans_for_agent_tools_and_llm_calls()
+    test_transfer_spans()
+    test_exports()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
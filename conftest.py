@@ -0,0 +1,32 @@
+"""
+pytest configuration shared by every test directory.
+
+The LLM and search clients are pooled, and common.mock_backends reads its
+settings once, on import - so the backends are chosen here, before pytest
+imports the first test module, rather than by whichever test file happens to
+be collected first. Running a test file as a script still works the same way:
+each file sets the same variables before its imports.
+"""
+
+import asyncio
+import inspect
+import os
+import sys
+
+# Make the agent packages importable from every test directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Run the whole suite on the offline mock model and search backend
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["SEARCH_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "0")
+os.environ.setdefault("MOCK_TAVILY_LATENCY_MS", "100")
+
+
+def pytest_pyfunc_call(pyfuncitem):
+    """Runs async test functions on a fresh event loop, as the test scripts' main() does."""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    asyncio.run(pyfuncitem.obj(**arguments))
+    return True
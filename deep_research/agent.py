@@ -1,73 +1,47 @@
 import os
-import traceback
 
 import asyncio
+import contextlib
 import json
-import hashlib
-from typing import Optional, Dict, Any, List
+import time
+import weakref
+from typing import Optional, Dict, Any, List, Callable
 from dotenv import load_dotenv
 from google.adk.agents import Agent, LlmAgent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
 from google.adk.tools.tool_context import ToolContext
-from google.genai import types
-import google.generativeai as genai
 
-from .deep_research_types import tavily_search, atavily_search_results, DeepResearchResult, DeepResearchResults
+from common.cache import get_llm_cache_stats
+from common.telemetry import get_telemetry_summary
+from common.callbacks import agent_callbacks
+from common.llm import create_llm, call_llm_async
+from common.models import model_for
+from common.streaming import StreamEvent, format_stream_event, notify, stream_agent_events
+from .deep_research_types import (tavily_search, atavily_search_results, aclose_search_clients,
+                                  get_search_client_stats, DeepResearchResult, DeepResearchResults, SearchResults)
+from .dedup import RESEARCH_DEDUP, ResultDeduplicator
+from .search_cache import get_search_cache_stats
 
 # Load environment variables
 load_dotenv()
 
-# Configure ADK to use API keys directly
-os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "False"
-
-# Model constants
-USE_AZURE = os.getenv("USE_AZURE", "false").lower() == "true"
-AZURE_MODEL_NAME = os.getenv("AZURE_MODEL_NAME", "gpt-4.1")
-GOOGLE_MODEL_NAME = os.getenv("GOOGLE_MODEL_NAME", "gemini-2.0-flash-exp")
-
-def create_llm():
-    """Creates a LLM instance based on environment configuration."""
-    if USE_AZURE:
-        return LiteLlm(
-            model=f"azure/{AZURE_MODEL_NAME}",
-            api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_API_VERSION")
-        )
-    else:
-        return GOOGLE_MODEL_NAME
+# Search fan-out configuration - 可以通过环境变量配置
+RESEARCH_SEARCH_CONCURRENCY = int(os.getenv("RESEARCH_SEARCH_CONCURRENCY", "4"))
+RESEARCH_SEARCH_TIMEOUT_SECONDS = float(os.getenv("RESEARCH_SEARCH_TIMEOUT_SECONDS", "20"))
+RESEARCH_MAX_RESULTS = int(os.getenv("RESEARCH_MAX_RESULTS", "5"))
+RESEARCH_SUMMARY_CONCURRENCY = int(os.getenv("RESEARCH_SUMMARY_CONCURRENCY", "5"))
+RESEARCH_SUMMARY_BATCH_SIZE = int(os.getenv("RESEARCH_SUMMARY_BATCH_SIZE", "1"))  # results per summary request
 
-async def call_llm_async(prompt: str) -> str:
-    """Helper function to call LLM for content generation."""
-    try:
-        if USE_AZURE:
-            llm = create_llm()
-            from google.adk.models.llm_request import LlmRequest
-            
-            content = types.Content(role='user', parts=[types.Part(text=prompt)])
-            config = types.GenerateContentConfig(tools=[])  # Create empty config
-            llm_request = LlmRequest(contents=[content], config=config)
-            
-            full_response = ""
-            async for response in llm.generate_content_async(llm_request):
-                if response.content and response.content.parts:
-                    full_response += response.content.parts[0].text
-            return full_response
-        else:
-            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-            model = genai.GenerativeModel(GOOGLE_MODEL_NAME)
-            response = await model.generate_content_async(prompt)
-            return response.text
-    except Exception as e:
-        print(f"Error calling LLM: {e}")
-        print(f"Full error details:\n{traceback.format_exc()}")
-        return f"[LLM Error: Could not generate content. {str(e)}]"
+# One summary semaphore per event loop (asyncio semaphores belong to the loop they first wait on)
+_summary_semaphores = weakref.WeakKeyDictionary()  # loop -> (limit, semaphore)
+
+# Search counters
+search_stats = {"queries": 0, "timeouts": 0, "failures": 0, "fan_outs": 0, "duplicates": 0,
+                "summary_requests": 0, "summaries": 0, "batch_fallbacks": 0}
 
 # Research Data Models
 from pydantic import BaseModel
-from typing import List
 
 class ResearchQuery(BaseModel):
     query: str
@@ -86,6 +60,11 @@ class ResearchSession(BaseModel):
     all_results: List[ResearchResult] = []
     filtered_results: List[ResearchResult] = []
     final_report: str = ""
+    # Canonical URLs and content fingerprints of the results found so far, for dedup
+    seen_sources: List[str] = []
+    content_fingerprints: List[int] = []
+    results_found: int = 0
+    duplicates_removed: int = 0
 
 # Deep Research Tools
 async def generate_research_queries(topic: str, tool_context: ToolContext) -> dict:
@@ -107,7 +86,7 @@ Format your response as a JSON list of query strings:
 
 Topic: {topic}"""
 
-    response = await call_llm_async(prompt)
+    response = await call_llm_async(prompt, model_for("generate_research_queries"))
     
     try:
         # Try to extract JSON from response
@@ -139,49 +118,154 @@ Topic: {topic}"""
     print(f"--- Tool: Generated {len(queries)} research queries ---")
     return {"status": "success", "queries": queries, "count": len(queries)}
 
-async def tavily_web_search(query: str, tool_context: ToolContext) -> dict:
-    """Perform real web search using Tavily API."""
-    print(f"--- Tool: tavily_web_search for query: {query} ---")
-    
-    try:
-        # Use Tavily API for real web search
-        search_results_data = await atavily_search_results(query, max_results=5, include_raw=True)
-        
-        search_results = []
-        for result in search_results_data.results:
-            # Filter and summarize content using LLM for better relevance
-            if result.raw_content:
-                summarize_prompt = f"""Summarize the following content in relation to the search query: "{query}"
+def get_search_stats() -> dict:
+    """Returns the web search counters."""
+    return dict(search_stats)
+
+def _fallback_results(query: str) -> List[dict]:
+    return [{
+        "title": f"Research Result for {query}",
+        "content": f"Fallback: Information related to {query}. Unable to fetch real search results.",
+        "source": "fallback.com",
+        "relevance_score": 0.6
+    }]
+
+async def _summarize_one(query: str, result) -> str:
+    summarize_prompt = f"""Summarize the following content in relation to the search query: "{query}"
 
 Content: {result.raw_content[:2000]}...
 
 Provide a concise summary (2-3 sentences) that highlights the most relevant information for the search query."""
 
-                summary = await call_llm_async(summarize_prompt)
-                filtered_content = summary
-            else:
-                filtered_content = result.content
-
-            search_results.append({
-                "title": result.title,
-                "content": filtered_content,
-                "source": result.link,
-                "relevance_score": 0.9  # Default high relevance for Tavily results
-            })
-        
-        print(f"--- Tool: Tavily found {len(search_results)} search results ---")
-        
+    return await call_llm_async(summarize_prompt, model_for("tavily_web_search"))
+
+async def _summarize_batch(query: str, results: list) -> List[str]:
+    """Summarizes several results in one request; results missing from the answer keep their search snippet."""
+    contents = "\n\n".join(f"Content [{i + 1}]: {result.raw_content[:2000]}..." for i, result in enumerate(results))
+    summarize_prompt = f"""Summarize each of the following contents in relation to the search query: "{query}"
+
+{contents}
+
+For each content, provide a concise summary (2-3 sentences) that highlights the most relevant information for the search query.
+
+Format your response as JSON, one summary per content in the same order:
+{{"summaries": ["summary of content 1", "summary of content 2", ...]}}"""
+
+    response = await call_llm_async(summarize_prompt, model_for("tavily_web_search"))
+    
+    try:
+        import re
+        json_match = re.search(r'\{.*\}', response, re.DOTALL)
+        summaries = [str(summary) for summary in json.loads(json_match.group())["summaries"]]
+    except Exception:
+        summaries = []
+    if len(summaries) != len(results):
+        search_stats["batch_fallbacks"] += 1
+    return [summaries[i] if i < len(summaries) else result.content for i, result in enumerate(results)]
+
+def _summary_semaphore() -> asyncio.Semaphore:
+    """Returns the summary request semaphore of the running event loop, sized RESEARCH_SUMMARY_CONCURRENCY."""
+    loop = asyncio.get_running_loop()
+    limit = max(1, RESEARCH_SUMMARY_CONCURRENCY)
+    held = _summary_semaphores.get(loop)
+    if held is None or held[0] != limit:
+        held = _summary_semaphores[loop] = limit, asyncio.Semaphore(limit)
+    return held[1]
+
+async def summarize_results(query: str, results: list) -> List[str]:
+    """Returns the content to keep for each search result, in order: an LLM summary of its raw content, else its snippet.
+
+    Summaries run concurrently, each request covering up to RESEARCH_SUMMARY_BATCH_SIZE results. At most
+    RESEARCH_SUMMARY_CONCURRENCY requests are in flight at a time across all searches of the event loop,
+    so a search_all_queries fan-out shares one limit.
+    """
+    contents = [result.content for result in results]
+    pending = [i for i, result in enumerate(results) if result.raw_content]
+    batch_size = max(1, RESEARCH_SUMMARY_BATCH_SIZE)
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    semaphore = _summary_semaphore()
+
+    async def summarize(batch: List[int]) -> List[str]:
+        async with semaphore:
+            search_stats["summary_requests"] += 1
+            search_stats["summaries"] += len(batch)
+            if len(batch) == 1:
+                return [await _summarize_one(query, results[batch[0]])]
+            return await _summarize_batch(query, [results[i] for i in batch])
+
+    for batch, summaries in zip(batches, await asyncio.gather(*(summarize(batch) for batch in batches))):
+        for i, summary in zip(batch, summaries):
+            contents[i] = summary
+    return contents
+
+async def fetch_results(query: str, semaphore: Optional[asyncio.Semaphore] = None,
+                        timeout: Optional[float] = None) -> Optional[SearchResults]:
+    """Searches one query; None when the search failed or timed out."""
+    search_stats["queries"] += 1
+    timeout = RESEARCH_SEARCH_TIMEOUT_SECONDS if timeout is None else timeout
+    try:
+        # The semaphore bounds concurrent searches; the timeout starts once the search is sent
+        async with semaphore or contextlib.nullcontext():
+            return await asyncio.wait_for(
+                atavily_search_results(query, max_results=RESEARCH_MAX_RESULTS, include_raw=True), timeout)
+    except asyncio.TimeoutError:
+        search_stats["timeouts"] += 1
+        print(f"--- Tool: Tavily search timed out after {timeout}s for: {query}, falling back to simulated results ---")
     except Exception as e:
+        search_stats["failures"] += 1
         print(f"--- Tool: Tavily search failed: {e}, falling back to simulated results ---")
+    return None
+
+async def summarize_search(query: str, search_results_data: Optional[SearchResults]) -> List[dict]:
+    """Summarizes the hits of a search into session results; a failed search gives a fallback result."""
+    if search_results_data is None:
         # Fallback to simulated results if Tavily fails
-        search_results = [{
-            "title": f"Research Result for {query}",
-            "content": f"Fallback: Information related to {query}. Unable to fetch real search results.",
-            "source": "fallback.com",
-            "relevance_score": 0.6
-        }]
-    
-    # Store results in session
+        return _fallback_results(query)
+    try:
+        # Filter and summarize content using LLM for better relevance
+        contents = await summarize_results(query, search_results_data.results)
+    except Exception as e:
+        search_stats["failures"] += 1
+        print(f"--- Tool: Summarizing search results failed: {e}, falling back to simulated results ---")
+        return _fallback_results(query)
+    
+    search_results = []
+    for result, filtered_content in zip(search_results_data.results, contents):
+        search_results.append({
+            "title": result.title,
+            "content": filtered_content,
+            "source": result.link,
+            "relevance_score": 0.9  # Default high relevance for Tavily results
+        })
+    
+    print(f"--- Tool: Tavily found {len(search_results)} new search results for: {query} ---")
+    return search_results
+
+def _dedup_results(session: ResearchSession, search_results_data: SearchResults) -> SearchResults:
+    """Drops the results of a search that repeat earlier results of the session, and counts them."""
+    deduplicator = ResultDeduplicator(session.seen_sources, session.content_fingerprints)
+    unique = search_results_data.dedup(deduplicator)
+    removed = len(search_results_data.results) - len(unique.results)
+    session.results_found += len(search_results_data.results)
+    session.duplicates_removed += removed
+    search_stats["duplicates"] += removed
+    return unique
+
+def dedup_ratio(session: ResearchSession) -> float:
+    """Returns the share of a session's search results dropped as duplicates."""
+    return session.duplicates_removed / session.results_found if session.results_found else 0.0
+
+async def search_query(query: str, semaphore: Optional[asyncio.Semaphore] = None,
+                       timeout: Optional[float] = None,
+                       session: Optional[ResearchSession] = None) -> List[dict]:
+    """Searches one query, drops repeats of the session's earlier results and summarizes the rest."""
+    search_results_data = await fetch_results(query, semaphore, timeout)
+    if RESEARCH_DEDUP and session is not None and search_results_data is not None:
+        search_results_data = _dedup_results(session, search_results_data)
+    return await summarize_search(query, search_results_data)
+
+def _store_results(tool_context: ToolContext, search_results: List[dict]):
+    """Appends search results to the research session."""
     session = tool_context.state.get("research_session")
     if session:
         for result in search_results:
@@ -192,10 +276,56 @@ Provide a concise summary (2-3 sentences) that highlights the most relevant info
                 relevance_score=result["relevance_score"]
             )
             session.all_results.append(research_result)
+
+async def tavily_web_search(query: str, tool_context: ToolContext) -> dict:
+    """Perform real web search using Tavily API."""
+    print(f"--- Tool: tavily_web_search for query: {query} ---")
+    
+    session = tool_context.state.get("research_session")
+    search_results = await search_query(query, session=session)
+    _store_results(tool_context, search_results)
     
     print(f"--- Tool: Stored {len(search_results)} search results in session ---")
     return {"status": "success", "results": search_results, "count": len(search_results)}
 
+async def search_all_queries(tool_context: ToolContext) -> dict:
+    """Search the web for every generated research query at once using Tavily API."""
+    print("--- Tool: search_all_queries ---")
+    
+    session = tool_context.state.get("research_session")
+    if not session or not session.queries:
+        return {"status": "error", "message": "No research queries to search, generate them first"}
+    
+    search_stats["fan_outs"] += 1
+    semaphore = asyncio.Semaphore(RESEARCH_SEARCH_CONCURRENCY)
+    started = time.perf_counter()
+    fetched = await asyncio.gather(*(fetch_results(q.query, semaphore) for q in session.queries))
+    
+    # Dedup in query order, so which copy of a repeated article is kept does not depend on timing,
+    # and only then summarize - duplicates never reach the LLM
+    if RESEARCH_DEDUP:
+        fetched = [_dedup_results(session, data) if data is not None else None for data in fetched]
+    per_query = await asyncio.gather(*(summarize_search(q.query, data) for q, data in zip(session.queries, fetched)))
+    
+    # Stored in query order, whatever order the searches finished in
+    for research_query, search_results in zip(session.queries, per_query):
+        research_query.results = search_results
+        _store_results(tool_context, search_results)
+    
+    total = sum(len(search_results) for search_results in per_query)
+    print(f"--- Tool: Searched {len(per_query)} queries concurrently in {time.perf_counter() - started:.2f}s, "
+          f"stored {total} search results in session ---")
+    print(f"--- Tool: Dedup dropped {session.duplicates_removed} of {session.results_found} search results "
+          f"({dedup_ratio(session):.0%}) ---")
+    return {
+        "status": "success",
+        "queries": [{"query": q.query, "count": len(r), "titles": [result["title"] for result in r]}
+                    for q, r in zip(session.queries, per_query)],
+        "count": total,
+        "duplicates_removed": session.duplicates_removed,
+        "dedup_ratio": round(dedup_ratio(session), 3)
+    }
+
 async def filter_and_rank_results(topic: str, tool_context: ToolContext) -> dict:
     """Filter and rank research results by relevance to the topic."""
     print(f"--- Tool: filter_and_rank_results for topic: {topic} ---")
@@ -233,7 +363,7 @@ Format your response as JSON:
 
 Topic: {topic}"""
 
-    response = await call_llm_async(filter_prompt)
+    response = await call_llm_async(filter_prompt, model_for("filter_and_rank_results"))
     
     try:
         import re
@@ -287,7 +417,7 @@ Make the report professional, well-organized, and comprehensive while being acce
 
 Topic: {topic}"""
 
-    report = await call_llm_async(report_prompt)
+    report = await call_llm_async(report_prompt, model_for("generate_research_report"))
     
     # Store final report
     session.final_report = report
@@ -313,6 +443,8 @@ def get_research_progress(tool_context: ToolContext) -> dict:
         "total_results": len(session.all_results),
         "filtered_results": len(session.filtered_results),
         "report_ready": bool(session.final_report),
+        "duplicates_removed": session.duplicates_removed,
+        "dedup_ratio": round(dedup_ratio(session), 3),
         "current_step": "initialized"
     }
     
@@ -330,6 +462,7 @@ def get_research_progress(tool_context: ToolContext) -> dict:
 # Research tools - pass functions directly to the Agent
 research_tools = [
     generate_research_queries,
+    search_all_queries,
     tavily_web_search,
     filter_and_rank_results,
     generate_research_report,
@@ -338,26 +471,28 @@ research_tools = [
 
 def create_deep_research_agent():
     """Creates the main deep research agent."""
-    llm = create_llm()
+    llm = create_llm(model_for("deep_research_agent"))
     
     instruction = """You are a Deep Research Agent capable of conducting comprehensive research on any topic using real web search.
 
 Your workflow:
 1. Generate specific research queries for the given topic
-2. Search for information using Tavily web search API
+2. Search all of them at once using Tavily web search API
 3. Filter and rank results by relevance 
 4. Generate a comprehensive research report
 
 Available tools:
 - generate_research_queries: Create focused search queries
-- tavily_web_search: Search the web using Tavily API for real, current information
+- search_all_queries: Search the web for every generated query concurrently using Tavily API for real, current information
+- tavily_web_search: Search the web for a single query using Tavily API, e.g. a follow-up question
 - filter_and_rank_results: Filter results by relevance and quality
 - generate_research_report: Create final comprehensive research report
 - get_research_progress: Check current research status
 
 Process:
 1. Start by generating research queries for the topic
-2. Search each query using real web search to gather current information
+2. Search all generated queries with one search_all_queries call to gather current information.
+   Prefer search_all_queries over tavily_web_search; use tavily_web_search only for an extra follow-up query
 3. Filter results to keep only the most relevant and high-quality sources
 4. Generate a professional research report with citations
 
@@ -365,28 +500,34 @@ Always provide thorough, well-sourced research with clear structure, analysis, a
 
     return Agent(
         model=llm,
+        **agent_callbacks(),
         name="deep_research_agent",
         instruction=instruction,
         description="Conducts comprehensive research on topics and generates detailed reports",
         tools=research_tools
     )
 
-async def call_agent_async(query: str, runner: Runner, user_id: str, session_id: str):
-    """Call the deep research agent asynchronously."""
+async def call_agent_async(query: str, runner: Runner, user_id: str, session_id: str,
+                           on_partial_text: Optional[Callable[[str], Any]] = None,
+                           on_event: Optional[Callable[[StreamEvent], Any]] = None):
+    """Call the deep research agent asynchronously.
+
+    on_partial_text receives the output of tool LLM calls (summaries, the report) as it is generated;
+    on_event receives every stream event of the run (see common.streaming).
+    """
     print(f"--- Starting Deep Research Agent for query: {query} ---")
     
     try:
-        from google.genai.types import Content, Part
-        
-        # Create message content
-        content = Content(parts=[Part(text=query)], role="user")
-        
-        # Get the final response from the event stream
+        # Follow the whole run; the final response is the last one of the run
         final_response_text = "(No final response)"
-        async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
-            if event.is_final_response() and event.content and event.content.parts:
-                final_response_text = event.content.parts[0].text
-                break
+        async for event in stream_agent_events(runner, user_id, session_id, query):
+            await notify(on_event, event)
+            if event.kind == "partial_text":
+                await notify(on_partial_text, event.text)
+            elif event.kind in ("stage_start", "stage_end"):
+                print(format_stream_event(event))
+            elif event.kind == "run_end" and event.text:
+                final_response_text = event.text
         
         print(f"--- Deep Research Agent completed ---")
         return final_response_text
@@ -427,5 +568,11 @@ async def main():
         print(f"\nResult: {result}")
         print(f"\n{'='*60}")
 
+    print(f"\nSearch: {get_search_stats()}, clients: {get_search_client_stats()}")
+    print(f"Search cache: {get_search_cache_stats()}")
+    await aclose_search_clients()
+    print(f"LLM cache: {get_llm_cache_stats()}")
+    print(f"Telemetry: {get_telemetry_summary()}")
+
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Duplicate detection for search results, before any of them is summarized.
+
+Two results are duplicates when their URLs are the same after
+canonicalization (scheme, host case, "www.", default ports, fragments,
+tracking parameters, parameter order and trailing slashes ignored), or when
+their contents are near-identical: each text gets a 64-bit SimHash over its
+word 3-shingles, and fingerprints within RESEARCH_DEDUP_MAX_DISTANCE bits of
+each other count as the same article - syndicated copies, mirrors and pages
+that differ only in boilerplate.
+"""
+
+import hashlib
+import os
+import re
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Dedup configuration - 可以通过环境变量配置
+RESEARCH_DEDUP = os.getenv("RESEARCH_DEDUP", "true").lower() == "true"
+RESEARCH_DEDUP_MAX_DISTANCE = int(os.getenv("RESEARCH_DEDUP_MAX_DISTANCE", "6"))  # differing SimHash bits
+RESEARCH_DEDUP_MIN_WORDS = int(os.getenv("RESEARCH_DEDUP_MIN_WORDS", "30"))  # shorter texts are URL-checked only
+
+SIMHASH_BITS = 64
+SHINGLE_WORDS = 3
+FINGERPRINT_CHARS = 20000  # long pages are fingerprinted on their opening
+
+_TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref", "ref_src",
+                    "spm", "cmpid", "_hsenc", "_hsmi"}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonical_url(url: str) -> str:
+    """Returns the form of a URL two copies of the same page share."""
+    url = url.strip()
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port != _DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    path = re.sub(r"/(index|default)\.(html?|php|aspx?)$", "/", path, flags=re.IGNORECASE)
+    if len(path) > 1:
+        path = path.rstrip("/")
+    params = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                    if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS)
+    # http and https copies are the same page
+    return urlunsplit(("https", host, path, urlencode(params), ""))
+
+
+def simhash(text: str, bits: int = SIMHASH_BITS) -> int:
+    """Returns the SimHash of a text over its distinct word shingles."""
+    words = re.findall(r"\w+", text[:FINGERPRINT_CHARS].lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    # One bit string per shingle hash; a fingerprint bit is set when most shingles set it
+    rows = [format(int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=bits // 8).digest(), "big"),
+                   f"0{bits}b") for shingle in shingles]
+    half = len(rows) / 2
+    return int("".join("1" if column.count("1") > half else "0" for column in zip(*rows)), 2)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class ResultDeduplicator:
+    """Remembers the URLs and content fingerprints seen so far and flags repeats.
+
+    The lists it is given are updated in place, so a research session can keep
+    them and dedup every later search against the earlier ones.
+    """
+
+    def __init__(self, seen_urls: Optional[List[str]] = None, fingerprints: Optional[List[int]] = None,
+                 max_distance: int = RESEARCH_DEDUP_MAX_DISTANCE):
+        self.seen_urls = seen_urls if seen_urls is not None else []
+        self.fingerprints = fingerprints if fingerprints is not None else []
+        self.max_distance = max_distance
+        self._urls = set(self.seen_urls)
+        self.stats = {"checked": 0, "url_duplicates": 0, "near_duplicates": 0}
+
+    def check(self, url: str, text: str = "") -> Optional[str]:
+        """Returns why a result repeats an earlier one ("url" or "content"), or None and remembers it."""
+        self.stats["checked"] += 1
+        canonical = canonical_url(url) if url else ""
+        if canonical and canonical in self._urls:
+            self.stats["url_duplicates"] += 1
+            return "url"
+        fingerprint = None
+        if len(re.findall(r"\w+", text)) >= RESEARCH_DEDUP_MIN_WORDS:
+            fingerprint = simhash(text)
+            if any(hamming_distance(fingerprint, seen) <= self.max_distance for seen in self.fingerprints):
+                self.stats["near_duplicates"] += 1
+                return "content"
+        if canonical:
+            self._urls.add(canonical)
+            self.seen_urls.append(canonical)
+        if fingerprint is not None:
+            self.fingerprints.append(fingerprint)
+        return None
+
+    def unique(self, results: list) -> list:
+        """Returns the results (anything with .link and .raw_content / .content) that repeat no earlier one."""
+        return [result for result in results
+                if self.check(result.link, getattr(result, "raw_content", None) or result.content) is None]
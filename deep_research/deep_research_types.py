@@ -1,9 +1,38 @@
 import asyncio
 import os
+import weakref
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Optional, List, Tuple, Union
+
+import httpx
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 from tavily import AsyncTavilyClient, TavilyClient
 
+from common.mock_backends import SEARCH_BACKEND, MockTavilyClient, MockTavilySyncClient
+from common.telemetry import Span, end_span, start_span
+from .dedup import ResultDeduplicator
+from .search_cache import get_search_cache, search_cache_key
+
+# Load environment variables
+load_dotenv()
+
+# Tavily connection pool - 可以通过环境变量配置
+TAVILY_API_BASE_URL = os.getenv("TAVILY_API_BASE_URL", "https://api.tavily.com")
+TAVILY_MAX_CONNECTIONS = int(os.getenv("TAVILY_MAX_CONNECTIONS", "10"))
+TAVILY_KEEPALIVE_SECONDS = float(os.getenv("TAVILY_KEEPALIVE_SECONDS", "60"))
+
+SEARCH_DEPTH = "basic"
+
+# Long-lived clients: one sync client per process, one async client per event loop
+# (httpx connections belong to the loop that opened them)
+_tavily_client: Optional[Union[TavilyClient, MockTavilySyncClient]] = None
+_async_tavily_clients = weakref.WeakKeyDictionary()  # loop -> (client, its httpx client or None)
+
+# Client pool counters
+search_client_stats = {"clients_created": 0, "searches": 0}
+
 
 @dataclass(frozen=True, kw_only=True)
 class SearchResult:
@@ -39,6 +68,10 @@ class SearchResults:
     def short_str(self):
         return self.__str__(short=True)
 
+    def dedup(self, deduplicator: Optional[ResultDeduplicator] = None):
+        """Remove results repeating an earlier one: same canonical URL or near-identical content"""
+        return SearchResults(results=(deduplicator or ResultDeduplicator()).unique(self.results))
+
 
 @dataclass(frozen=True, kw_only=True)
 class DeepResearchResult(SearchResult):
@@ -69,15 +102,9 @@ class DeepResearchResults:
     def short_str(self):
         return self.__str__(short=True)
 
-    def dedup(self):
-        """Remove duplicate results based on link"""
-        seen_links = set()
-        unique_results = []
-        for result in self.results:
-            if result.link not in seen_links:
-                seen_links.add(result.link)
-                unique_results.append(result)
-        return DeepResearchResults(results=unique_results)
+    def dedup(self, deduplicator: Optional[ResultDeduplicator] = None):
+        """Remove duplicate results: same canonical URL or near-identical content"""
+        return DeepResearchResults(results=(deduplicator or ResultDeduplicator()).unique(self.results))
 
 
 def extract_tavily_results(response) -> SearchResults:
@@ -95,6 +122,130 @@ def extract_tavily_results(response) -> SearchResults:
     return SearchResults(results=results)
 
 
+def _tavily_api_key() -> str:
+    api_key = os.getenv("TAVILY_API_KEY")
+
+    if not api_key:
+        raise ValueError("TAVILY_API_KEY environment variable is not set")
+    return api_key
+
+
+def get_tavily_client() -> Union[TavilyClient, MockTavilySyncClient]:
+    """Returns the pooled blocking Tavily client, creating it on first use."""
+    global _tavily_client
+    if _tavily_client is None:
+        if SEARCH_BACKEND == "mock":
+            client = MockTavilySyncClient()
+        else:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TAVILY_MAX_CONNECTIONS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            client = TavilyClient(_tavily_api_key(), api_base_url=TAVILY_API_BASE_URL, session=session)
+        search_client_stats["clients_created"] += 1
+        _tavily_client = client
+    return _tavily_client
+
+
+def get_async_tavily_client() -> Union[AsyncTavilyClient, MockTavilyClient]:
+    """Returns the pooled async Tavily client of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client, _ = _async_tavily_clients.get(loop, (None, None))
+    if client is None:
+        http_client = None
+        if SEARCH_BACKEND == "mock":
+            client = MockTavilyClient()
+        else:
+            http_client = httpx.AsyncClient(
+                base_url=TAVILY_API_BASE_URL,
+                limits=httpx.Limits(max_connections=TAVILY_MAX_CONNECTIONS,
+                                    max_keepalive_connections=TAVILY_MAX_CONNECTIONS,
+                                    keepalive_expiry=TAVILY_KEEPALIVE_SECONDS),
+            )
+            client = AsyncTavilyClient(_tavily_api_key(), client=http_client)
+        search_client_stats["clients_created"] += 1
+        _async_tavily_clients[loop] = client, http_client
+    return client
+
+
+async def aclose_search_clients():
+    """Closes the pooled Tavily clients and their connections; the next search opens new ones.
+
+    Async clients of other running loops are closed on their own loop.
+    """
+    global _tavily_client
+    client, _tavily_client = _tavily_client, None
+    if isinstance(client, TavilyClient):
+        client.session.close()
+    current = asyncio.get_running_loop()
+    for loop, (_, http_client) in list(_async_tavily_clients.items()):
+        # The http clients were handed in, so AsyncTavilyClient.close() would leave them open
+        if loop is current:
+            del _async_tavily_clients[loop]
+            if http_client is not None:
+                await http_client.aclose()
+        elif loop.is_closed():
+            # Nothing can run on a closed loop any more; its connections went with it
+            del _async_tavily_clients[loop]
+        elif loop.is_running():
+            # httpx connections must be closed on the loop that opened them
+            del _async_tavily_clients[loop]
+            if http_client is not None:
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(http_client.aclose(), loop))
+        # A stopped but open loop keeps its client until it runs aclose_search_clients() itself
+
+
+def get_search_client_stats() -> dict:
+    """Returns the Tavily client pool counters."""
+    return {**search_client_stats, "async_clients": len(_async_tavily_clients),
+            "max_connections": TAVILY_MAX_CONNECTIONS}
+
+
+def _cached_search(query: str, max_results: int, include_raw: bool) -> Tuple[Optional[dict], Optional[str], Optional[Span]]:
+    """Starts a search span and looks the search up in the cache: (cached response or None, cache key, span)."""
+    span = start_span("search", "tavily")
+    cache = get_search_cache()
+    if cache is None:
+        return None, None, span
+    key = search_cache_key(query, max_results, SEARCH_DEPTH, include_raw)
+    return _cache_hit(span, cache.get(key)), key, span
+
+
+async def _acached_search(query: str, max_results: int, include_raw: bool) -> Tuple[Optional[dict], Optional[str], Optional[Span]]:
+    """_cached_search with the SQLite lookup on a worker thread, off the event loop."""
+    span = start_span("search", "tavily")
+    cache = get_search_cache()
+    if cache is None:
+        return None, None, span
+    key = search_cache_key(query, max_results, SEARCH_DEPTH, include_raw)
+    return _cache_hit(span, await asyncio.to_thread(cache.get, key)), key, span
+
+
+def _cache_hit(span: Optional[Span], cached: Optional[Tuple[dict, int]]) -> Optional[dict]:
+    """Finishes the span of a search answered from the cache; returns the cached response or None."""
+    if cached is None:
+        return None
+    response, size = cached
+    end_span(span, cache="hit", bytes_saved=size)
+    return response
+
+
+def _finish_search(query: str, key: Optional[str], span: Optional[Span], response: dict):
+    """Stores a fetched response in the cache and finishes its span."""
+    cache = get_search_cache()
+    if cache is not None and key is not None:
+        cache.put(key, query, response)
+    end_span(span, cache="miss" if key is not None else "disabled")
+
+
+async def _afinish_search(query: str, key: Optional[str], span: Optional[Span], response: dict):
+    """_finish_search with the compression and SQLite write on a worker thread, off the event loop."""
+    cache = get_search_cache()
+    if cache is not None and key is not None:
+        await asyncio.to_thread(cache.put, key, query, response)
+    end_span(span, cache="miss" if key is not None else "disabled")
+
+
 def tavily_search(query: str, max_results=3, include_raw: bool = True) -> SearchResults:
     """
     Perform a search using the Tavily Search API.
@@ -107,20 +258,25 @@ def tavily_search(query: str, max_results=3, include_raw: bool = True) -> Search
     Returns:
         SearchResults: Formatted search results with title, link, and snippet.
     """
-    api_key = os.getenv("TAVILY_API_KEY")
-
-    if not api_key:
-        raise ValueError("TAVILY_API_KEY environment variable is not set")
-
-    client = TavilyClient(api_key)
-
-    response = client.search(
-        query=query, 
-        search_depth="basic", 
-        max_results=max_results, 
-        include_raw_content=include_raw
-    )
+    cached, key, span = _cached_search(query, max_results, include_raw)
+    if cached is not None:
+        return extract_tavily_results(cached)
+
+    try:
+        client = get_tavily_client()
+        search_client_stats["searches"] += 1
+
+        response = client.search(
+            query=query, 
+            search_depth=SEARCH_DEPTH, 
+            max_results=max_results, 
+            include_raw_content=include_raw
+        )
+    except BaseException as e:
+        end_span(span, error=f"{type(e).__name__}: {e}")
+        raise
 
+    _finish_search(query, key, span, response)
     return extract_tavily_results(response)
 
 
@@ -136,18 +292,23 @@ async def atavily_search_results(query: str, max_results=3, include_raw: bool =
     Returns:
         SearchResults: Formatted search results.
     """
-    api_key = os.getenv("TAVILY_API_KEY")
-
-    if not api_key:
-        raise ValueError("TAVILY_API_KEY environment variable is not set")
-
-    client = AsyncTavilyClient(api_key)
-
-    response = await client.search(
-        query=query, 
-        search_depth="basic", 
-        max_results=max_results, 
-        include_raw_content=include_raw
-    )
+    cached, key, span = await _acached_search(query, max_results, include_raw)
+    if cached is not None:
+        return extract_tavily_results(cached)
+
+    try:
+        client = get_async_tavily_client()
+        search_client_stats["searches"] += 1
+
+        response = await client.search(
+            query=query, 
+            search_depth=SEARCH_DEPTH, 
+            max_results=max_results, 
+            include_raw_content=include_raw
+        )
+    except BaseException as e:
+        end_span(span, error=f"{type(e).__name__}: {e}")
+        raise
 
+    await _afinish_search(query, key, span, response)
     return extract_tavily_results(response) 
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Persistent SQLite cache for Tavily search responses.
+
+Entries are keyed on the normalized query (Unicode-normalized, case-folded,
+whitespace collapsed), max_results, search_depth and include_raw, so the same
+question asked with different spacing or capitals is answered from disk.
+Responses are stored zlib-compressed - raw_content makes up most of their
+size - expire after a TTL and are evicted least-recently-used once the cache
+grows past its size budget, which is checked against a running total kept in
+the file. One file is shared by every process using it.
+Enable with SEARCH_CACHE=true.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Cache configuration - 可以通过环境变量配置
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE", "false").lower() == "true"
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".search_cache.sqlite3")
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(24 * 3600)))  # 0 = never expire
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_results (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    raw_size INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS search_results_accessed_at ON search_results (accessed_at);
+BEGIN IMMEDIATE;
+-- Running total of the compressed sizes, kept by triggers so puts need not SUM the table
+CREATE TABLE IF NOT EXISTS cache_totals (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TRIGGER IF NOT EXISTS search_results_insert AFTER INSERT ON search_results BEGIN
+    UPDATE cache_totals SET value = value + NEW.size WHERE name = 'size';
+END;
+CREATE TRIGGER IF NOT EXISTS search_results_update AFTER UPDATE OF size ON search_results BEGIN
+    UPDATE cache_totals SET value = value + NEW.size - OLD.size WHERE name = 'size';
+END;
+CREATE TRIGGER IF NOT EXISTS search_results_delete AFTER DELETE ON search_results BEGIN
+    UPDATE cache_totals SET value = value - OLD.size WHERE name = 'size';
+END;
+-- Files written before the total existed are summed once
+INSERT OR IGNORE INTO cache_totals SELECT 'size', COALESCE(SUM(size), 0) FROM search_results
+    WHERE NOT EXISTS (SELECT 1 FROM cache_totals WHERE name = 'size');
+COMMIT;
+"""
+
+_TOTAL_SIZE = "SELECT value FROM cache_totals WHERE name = 'size'"
+
+
+def normalize_query(query: str) -> str:
+    """Returns the form of a query the cache compares: NFKC, case-folded, single spaces."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip().casefold()
+
+
+def search_cache_key(query: str, max_results: int, search_depth: str, include_raw: bool) -> str:
+    """Returns the cache key of a search: normalized query + max_results + search_depth + include_raw."""
+    payload = [normalize_query(query), int(max_results), search_depth, bool(include_raw)]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class SearchResultCache:
+    """Size-bounded LRU cache of search responses in one SQLite file."""
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: float = 0):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0,
+                      "bytes_saved": 0, "bytes_stored": 0, "raw_bytes_stored": 0}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+            # WAL lets other processes read while one writes
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def get(self, key: str) -> Optional[Tuple[dict, int]]:
+        """Returns (response, uncompressed size in bytes) for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            row = db.execute("SELECT created_at, raw_size, payload FROM search_results WHERE key = ?",
+                             (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            created_at, raw_size, payload = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                db.execute("DELETE FROM search_results WHERE key = ?", (key,))
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            try:
+                response = json.loads(zlib.decompress(payload))
+            except (zlib.error, ValueError):
+                db.execute("DELETE FROM search_results WHERE key = ?", (key,))
+                self.stats["misses"] += 1
+                return None
+            db.execute("UPDATE search_results SET accessed_at = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += raw_size
+        return response, raw_size
+
+    def put(self, key: str, query: str, response: dict):
+        """Stores a response compressed and evicts expired, then least recently used entries over budget."""
+        data = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        payload = zlib.compress(data, 6)
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # An upsert, not INSERT OR REPLACE: the replaced row would skip the delete trigger
+                db.execute("INSERT INTO search_results VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                           "query = excluded.query, created_at = excluded.created_at, "
+                           "accessed_at = excluded.accessed_at, size = excluded.size, "
+                           "raw_size = excluded.raw_size, payload = excluded.payload",
+                           (key, query, now, now, len(payload), len(data), payload))
+                if self.ttl_seconds:
+                    expired = db.execute("DELETE FROM search_results WHERE created_at < ?",
+                                         (now - self.ttl_seconds,)).rowcount
+                    self.stats["expired"] += max(expired, 0)
+                total = db.execute(_TOTAL_SIZE).fetchone()[0]
+                if total > self.max_bytes:
+                    # Oldest access first; the entry just stored stays
+                    for old_key, size in db.execute(
+                            "SELECT key, size FROM search_results WHERE key != ? ORDER BY accessed_at",
+                            (key,)).fetchall():
+                        if total <= self.max_bytes:
+                            break
+                        db.execute("DELETE FROM search_results WHERE key = ?", (old_key,))
+                        total -= size
+                        self.stats["evictions"] += 1
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            self.stats["stores"] += 1
+            self.stats["bytes_stored"] += len(payload)
+            self.stats["raw_bytes_stored"] += len(data)
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        with self._lock:
+            self._connect().execute("DELETE FROM search_results")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def get_stats(self) -> dict:
+        """Returns hit/miss counters, bytes saved and current size."""
+        with self._lock:
+            db = self._connect()
+            entries = db.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+            size = db.execute(_TOTAL_SIZE).fetchone()[0]
+        lookups = self.stats["hits"] + self.stats["misses"]
+        raw_stored = self.stats["raw_bytes_stored"]
+        return {
+            **self.stats,
+            "entries": entries,
+            "bytes": size,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "compression_ratio": round(self.stats["bytes_stored"] / raw_stored, 3) if raw_stored else 0.0,
+        }
+
+
+# Process-wide cache used by the Tavily search helpers
+search_cache: Optional[SearchResultCache] = (
+    SearchResultCache(SEARCH_CACHE_PATH, SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_TTL_SECONDS)
+    if SEARCH_CACHE_ENABLED else None
+)
+
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """Returns the process-wide search cache, or None when caching is off."""
+    return search_cache
+
+
+def set_search_cache(cache: Optional[SearchResultCache]):
+    """Replaces the process-wide search cache (None turns caching off)."""
+    global search_cache
+    search_cache = cache
+
+
+def get_search_cache_stats() -> dict:
+    """Returns the search cache counters, or {"enabled": False} when caching is off."""
+    if search_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **search_cache.get_stats()}
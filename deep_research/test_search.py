@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Test script for the concurrent search fan-out, summaries, Tavily client pool, search cache and result dedup of the Deep Research Agent
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run on the offline mock model and search backend
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["SEARCH_BACKEND"] = "mock"
+os.environ["MOCK_LLM_LATENCY_MS"] = "0"
+os.environ["MOCK_TAVILY_LATENCY_MS"] = "100"
+
+from common.llm import get_llm_client
+from common.mock_backends import MockTavilyServer, mock_prose
+from common.models import model_for
+from common.telemetry import get_telemetry_summary, telemetry
+from deep_research import agent as research_agent
+from deep_research import deep_research_types
+from deep_research.agent import (
+    ResearchQuery,
+    ResearchSession,
+    dedup_ratio,
+    get_research_progress,
+    get_search_stats,
+    search_all_queries,
+    search_query,
+    summarize_results,
+    tavily_web_search,
+)
+from deep_research.dedup import RESEARCH_DEDUP_MAX_DISTANCE, canonical_url, hamming_distance, simhash
+from deep_research.deep_research_types import (
+    DeepResearchResult,
+    DeepResearchResults,
+    aclose_search_clients,
+    atavily_search_results,
+    get_async_tavily_client,
+    get_search_client_stats,
+    tavily_search,
+)
+from deep_research.search_cache import (
+    SearchResultCache,
+    get_search_cache_stats,
+    search_cache_key,
+    set_search_cache,
+)
+
+QUERIES = ["overview of solar storage", "history of solar storage", "recent developments in solar storage",
+           "key challenges in solar storage", "future trends in solar storage", "case studies of solar storage"]
+
+
+def tool_context() -> SimpleNamespace:
+    session = ResearchSession(topic="solar storage", queries=[ResearchQuery(query=q) for q in QUERIES])
+    return SimpleNamespace(state={"research_session": session})
+
+
+async def timed(coroutine) -> tuple:
+    started = time.perf_counter()
+    result = await coroutine
+    return result, time.perf_counter() - started
+
+
+async def test_fan_out():
+    """All queries are searched at once, and results are stored in query order."""
+    print("=== Testing Search Fan-Out ===")
+
+    sequential = tool_context()
+    _, sequential_time = await timed(_search_one_by_one(sequential))
+
+    research_agent.RESEARCH_SEARCH_CONCURRENCY = len(QUERIES)
+    concurrent = tool_context()
+    response, concurrent_time = await timed(search_all_queries(concurrent))
+    assert response["status"] == "success" and len(response["queries"]) == len(QUERIES)
+
+    session = concurrent.state["research_session"]
+    assert [r.source for r in session.all_results] == [r.source for r in sequential.state["research_session"].all_results]
+    assert all(q.results for q in session.queries)
+    assert concurrent_time < sequential_time / 3, (concurrent_time, sequential_time)
+    print(f"{len(QUERIES)} queries: one by one {sequential_time:.2f}s, fan-out {concurrent_time:.2f}s")
+
+
+async def _search_one_by_one(context: SimpleNamespace):
+    for query in QUERIES:
+        await tavily_web_search(query, context)
+
+
+async def test_bounded_concurrency():
+    """The semaphore caps the searches in flight."""
+    print("\n=== Testing Bounded Concurrency ===")
+
+    research_agent.RESEARCH_SEARCH_CONCURRENCY = 2
+    _, elapsed = await timed(search_all_queries(tool_context()))
+    # Six 100ms searches, two at a time: three rounds
+    assert 0.3 <= elapsed < 0.6, elapsed
+    print(f"{len(QUERIES)} queries, 2 at a time: {elapsed:.2f}s")
+
+    response = await search_all_queries(SimpleNamespace(state={}))
+    assert response["status"] == "error"
+
+
+async def test_timeout():
+    """A search slower than the per-query timeout gives a fallback result instead of stalling the fan-out."""
+    print("\n=== Testing Per-Query Timeout ===")
+
+    timeouts = get_search_stats()["timeouts"]
+    results, elapsed = await timed(search_query("slow query about solar storage", timeout=0.02))
+    assert results[0]["source"] == "fallback.com" and elapsed < 0.1, (results, elapsed)
+    assert get_search_stats()["timeouts"] == timeouts + 1
+    print(f"Stats: {get_search_stats()}")
+
+
+async def test_parallel_summaries():
+    """Per-result summaries run concurrently, within one limit across searches, and keep the order of the results."""
+    print("\n=== Testing Parallel Summaries ===")
+
+    results = (await atavily_search_results(QUERIES[0], max_results=5, include_raw=True)).results
+    llm = get_llm_client(model_for("tavily_web_search"))
+    llm.latency_ms = 50
+    try:
+        research_agent.RESEARCH_SUMMARY_CONCURRENCY = 1
+        serial, serial_time = await timed(summarize_results(QUERIES[0], results))
+        research_agent.RESEARCH_SUMMARY_CONCURRENCY = 5
+        parallel, parallel_time = await timed(summarize_results(QUERIES[0], results))
+        assert parallel == serial and len(set(parallel)) == len(results)
+        assert parallel_time < serial_time / 2, (parallel_time, serial_time)
+        print(f"5 summaries: serial {serial_time:.2f}s, parallel {parallel_time:.2f}s")
+
+        # Batches of 2: three requests, every result still summarized in its place
+        requests = get_search_stats()["summary_requests"]
+        research_agent.RESEARCH_SUMMARY_BATCH_SIZE = 2
+        batched = await summarize_results(QUERIES[0], results)
+        assert get_search_stats()["summary_requests"] == requests + 3
+        assert len(batched) == len(results) and not set(batched) & {r.content for r in results}
+        assert get_search_stats()["batch_fallbacks"] == 0
+
+        # The limit holds across all searches of a fan-out, not per search
+        research_agent.RESEARCH_SUMMARY_BATCH_SIZE = 1
+        research_agent.RESEARCH_SUMMARY_CONCURRENCY = 3
+        summarize_one, in_flight = research_agent._summarize_one, {"now": 0, "peak": 0}
+
+        async def tracking_summarize_one(query, result):
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            try:
+                return await summarize_one(query, result)
+            finally:
+                in_flight["now"] -= 1
+
+        research_agent._summarize_one = tracking_summarize_one
+        try:
+            await search_all_queries(tool_context())
+        finally:
+            research_agent._summarize_one = summarize_one
+        assert in_flight["peak"] == 3, in_flight
+        print(f"Fan-out of {len(QUERIES)} searches: peak {in_flight['peak']} summaries in flight")
+    finally:
+        llm.latency_ms = 0
+        research_agent.RESEARCH_SUMMARY_BATCH_SIZE = 1
+        research_agent.RESEARCH_SUMMARY_CONCURRENCY = 5
+
+
+async def test_client_pool():
+    """The live clients keep their connections open across searches, against a local stand-in server."""
+    print("\n=== Testing Tavily Client Pool ===")
+
+    os.environ.setdefault("TAVILY_API_KEY", "test-placeholder-key")
+    backend, base_url = deep_research_types.SEARCH_BACKEND, deep_research_types.TAVILY_API_BASE_URL
+    deep_research_types.SEARCH_BACKEND = "tavily"
+    try:
+        with MockTavilyServer(latency_ms=10) as server:
+            deep_research_types.TAVILY_API_BASE_URL = server.url
+            await aclose_search_clients()
+            created = get_search_client_stats()["clients_created"]
+            for _ in range(3):
+                results = await asyncio.gather(*(atavily_search_results(q, max_results=5) for q in QUERIES))
+            assert [len(r.results) for r in results] == [5] * len(QUERIES)
+            assert get_async_tavily_client() is get_async_tavily_client()
+            assert server.requests == 3 * len(QUERIES) and server.connections <= len(QUERIES), server.connections
+            assert get_search_client_stats()["clients_created"] == created + 1
+
+            # The blocking client pools its connections too
+            await asyncio.to_thread(lambda: [tavily_search(q) for q in QUERIES[:3]])
+            assert server.connections <= len(QUERIES) + 1, server.connections
+            print(f"{server.requests} searches over {server.connections} connections")
+
+            # After shutdown the next search opens a new client
+            await aclose_search_clients()
+            assert get_search_client_stats()["async_clients"] == 0
+            await atavily_search_results(QUERIES[0])
+            assert get_search_client_stats()["clients_created"] == created + 3
+
+            # A client opened on another running loop is closed on that loop
+            other = asyncio.new_event_loop()
+            thread = threading.Thread(target=other.run_forever)
+            thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(atavily_search_results(QUERIES[1]), other).result()
+                http_client = deep_research_types._async_tavily_clients[other][1]
+                assert get_search_client_stats()["async_clients"] == 2
+                await aclose_search_clients()
+                assert http_client.is_closed and get_search_client_stats()["async_clients"] == 0
+            finally:
+                other.call_soon_threadsafe(other.stop)
+                thread.join()
+                other.close()
+    finally:
+        deep_research_types.SEARCH_BACKEND, deep_research_types.TAVILY_API_BASE_URL = backend, base_url
+
+
+async def test_search_cache():
+    """Searches differing only in case or spacing share one compressed, persistent, expiring cache entry."""
+    print("\n=== Testing Search Cache ===")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        path = os.path.join(cache_dir, "search.sqlite3")
+        cache = SearchResultCache(path, max_bytes=10 * 2**20, ttl_seconds=3600)
+        set_search_cache(cache)
+        telemetry.reset()
+        try:
+            first = await atavily_search_results("Solar  Storage costs", max_results=5)
+            again = await atavily_search_results("solar storage COSTS ", max_results=5)
+            assert again == first
+            await atavily_search_results("solar storage costs", max_results=3)  # another key
+            stats = get_search_cache_stats()
+            assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2), stats
+            assert stats["bytes_saved"] > 0 and stats["compression_ratio"] < 0.6, stats
+
+            # Hit rate and bytes saved reach the telemetry summary and /metrics
+            summary = get_telemetry_summary()["search:tavily"]
+            assert summary["cache"] == {"hit": 1, "miss": 2} and summary["bytes_saved"] == stats["bytes_saved"]
+            assert "minion_search_cache_bytes_saved_total" in telemetry.prometheus_text()
+
+            # Another process opening the same file gets the entry; an expired entry is fetched again
+            cache.close()
+            reopened = SearchResultCache(path, max_bytes=10 * 2**20, ttl_seconds=3600)
+            assert reopened.get(search_cache_key("SOLAR storage costs", 5, "basic", True)) is not None
+            expiring = SearchResultCache(path, max_bytes=10 * 2**20, ttl_seconds=1e-6)
+            assert expiring.get(search_cache_key("solar storage costs", 5, "basic", True)) is None
+            assert expiring.get_stats()["expired"] == 1
+
+            # Over the size budget the least recently used entries go
+            small = SearchResultCache(os.path.join(cache_dir, "small.sqlite3"), max_bytes=4000)
+            for query in QUERIES:
+                small.put(search_cache_key(query, 5, "basic", True), query,
+                          {"results": [{"raw_content": os.urandom(800).hex()}]})
+            small_stats = small.get_stats()
+            assert small_stats["bytes"] <= 4000 and small_stats["evictions"] > 0, small_stats
+            assert small.get(search_cache_key(QUERIES[-1], 5, "basic", True)) is not None
+
+            # The running total follows stores, replacements, evictions, expiry and clearing
+            def total_matches(opened: SearchResultCache) -> bool:
+                with sqlite3.connect(opened.path) as db:
+                    size = db.execute("SELECT COALESCE(SUM(size), 0) FROM search_results").fetchone()[0]
+                return opened.get_stats()["bytes"] == size
+
+            small.put(search_cache_key(QUERIES[-1], 5, "basic", True), QUERIES[-1], {"results": []})
+            assert total_matches(small) and total_matches(expiring)
+            small.clear()
+            assert total_matches(small) and small.get_stats()["bytes"] == 0
+            print(f"Stats: {get_search_cache_stats()}")
+            for opened in (cache, reopened, expiring, small):
+                opened.close()
+        finally:
+            set_search_cache(None)
+
+
+def test_dedup():
+    """Canonical URLs and SimHash fingerprints catch copies of one article; distinct articles are kept."""
+    print("\n=== Testing Result Dedup ===")
+
+    assert canonical_url("http://WWW.Example.com:80/news/story/?utm_source=x&b=2&a=1#top") == \
+        canonical_url("https://example.com/news/story?a=1&b=2")
+    assert canonical_url("https://example.com/a") != canonical_url("https://example.com/b")
+    assert canonical_url("https://example.com/index.html") == canonical_url("https://example.com/")
+
+    article = mock_prose(7, 300)
+    edited = article.replace(".", "!", 2) + " Syndicated from the original publisher."
+    other = mock_prose(8, 300)
+    assert hamming_distance(simhash(article), simhash(edited)) <= RESEARCH_DEDUP_MAX_DISTANCE
+    assert hamming_distance(simhash(article), simhash(other)) > 3 * RESEARCH_DEDUP_MAX_DISTANCE
+
+    def result(link: str, text: str) -> DeepResearchResult:
+        return DeepResearchResult(title=link, link=link, content=text[:100], raw_content=text,
+                                  filtered_raw_content=text)
+
+    results = DeepResearchResults(results=[
+        result("https://example.com/story", article),
+        result("https://www.example.com/story/?utm_medium=feed", article),   # same URL
+        result("https://mirror.example.org/copy", edited),                  # same content
+        result("https://example.com/other", other),
+    ])
+    assert [r.link for r in results.dedup().results] == ["https://example.com/story", "https://example.com/other"]
+    print("Dedup OK")
+
+
+async def test_session_dedup():
+    """Repeats across a session's queries are dropped before summarization and the ratio is reported."""
+    print("\n=== Testing Session Dedup ===")
+
+    context = tool_context()
+    summaries = get_search_stats()["summaries"]
+    response = await search_all_queries(context)
+    session = context.state["research_session"]
+    stored = len(session.all_results)
+    assert get_search_stats()["summaries"] - summaries == stored
+    assert len({canonical_url(r.source) for r in session.all_results}) == stored
+    assert session.results_found == 5 * len(QUERIES) and session.duplicates_removed == session.results_found - stored
+    assert response["dedup_ratio"] == round(dedup_ratio(session), 3) > 0
+
+    # A later single search is deduped against the session too
+    await tavily_web_search(QUERIES[0], context)
+    assert len(session.all_results) == stored
+    assert get_research_progress(context)["progress"]["duplicates_removed"] == session.duplicates_removed
+    print(f"Dedup ratio: {dedup_ratio(session):.0%} ({session.duplicates_removed} of {session.results_found})")
+
+
+async def main():
+    """Run all tests"""
+    print("Search Fan-Out Test Suite")
+    print("=========================")
+
+    await test_fan_out()
+    await test_bounded_concurrency()
+    await test_timeout()
+    await test_parallel_summaries()
+    await test_client_pool()
+    await test_search_cache()
+    test_dedup()
+    await test_session_dedup()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
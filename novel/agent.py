@@ -1,8 +1,6 @@
-import os
 import asyncio
 from dotenv import load_dotenv
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
 from google.adk.tools import BaseTool
@@ -10,63 +8,23 @@ from google.adk.tools.tool_context import ToolContext
 from google.adk.agents.callback_context import CallbackContext
 from google.adk.models.llm_request import LlmRequest
 from google.adk.models.llm_response import LlmResponse
-from google.genai import types
-from typing import Optional, Dict, Any
-import google.generativeai as genai
+from typing import Optional, Dict, Any, Callable
+
+from common.cache import get_llm_cache_stats
+from common.telemetry import get_telemetry_summary
+from common.callbacks import agent_callbacks
+from common.llm import create_llm, call_llm_async
+from common.models import model_for
+from common.streaming import StreamEvent, format_stream_event, notify, stream_agent_events
+from novel.context import prepare_chapter_context, prepare_project_overview, save_chapter
+from novel.router import fast_path_router, get_router_stats
 
 # Load environment variables
 load_dotenv()
 
-# Configure ADK to use API keys directly
-os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "False"
-
-# Model constants - 可以通过环境变量配置
-USE_AZURE = os.getenv("USE_AZURE", "false").lower() == "true"  # 默认使用Azure
-AZURE_MODEL_NAME = os.getenv("AZURE_MODEL_NAME", "gpt-4.1")  # Azure deployment name
-GOOGLE_MODEL_NAME = os.getenv("GOOGLE_MODEL_NAME", "gemini-2.0-flash-exp")  # Google model name
-
-def create_llm():
-    """Creates a LLM instance - Azure LiteLLM or Google model string based on environment."""
-    if USE_AZURE:
-        # 返回Azure LiteLLM实例
-        return LiteLlm(
-            model=f"azure/{AZURE_MODEL_NAME}",
-            api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_API_VERSION")
-        )
-    else:
-        # 返回Google模型字符串，ADK会自动处理
-        return GOOGLE_MODEL_NAME
-
-async def call_llm_for_content_generation_async(prompt: str) -> str:
-    """Helper function to call LLM for content generation in tools - supports both Azure and Google."""
-    try:
-        if USE_AZURE:
-            # 使用Azure通过LiteLLM
-            llm = create_llm()
-            # 创建LlmRequest对象
-            from google.adk.models.llm_request import LlmRequest
-            from google.genai import types
-            
-            content = types.Content(role='user', parts=[types.Part(text=prompt)])
-            llm_request = LlmRequest(contents=[content])
-            
-            # 使用异步生成内容
-            full_response = ""
-            async for response in llm.generate_content_async(llm_request):
-                if response.content and response.content.parts:
-                    full_response += response.content.parts[0].text
-            return full_response
-        else:
-            # 使用Google - 转换为异步
-            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-            model = genai.GenerativeModel(GOOGLE_MODEL_NAME)
-            response = await model.generate_content_async(prompt)
-            return response.text
-    except Exception as e:
-        print(f"Error calling LLM: {e}")
-        return f"[LLM Error: Could not generate content. {str(e)}]"
+async def call_llm_for_content_generation_async(prompt: str, tool_name: str = "") -> str:
+    """Helper function to call LLM for content generation in tools, on the model tier of the tool."""
+    return await call_llm_async(prompt, model_for(tool_name) if tool_name else None)
 
 # Novel Writing Tools
 async def create_outline(genre: str, theme: str, target_length: str, tool_context: ToolContext) -> dict:
@@ -98,7 +56,7 @@ Format as a structured outline suitable for {genre} fiction."""
     print(f"--- Tool: Generating outline with LLM ---")
     
     # Generate outline using LLM
-    generated_outline_text = await call_llm_for_content_generation_async(outline_prompt)
+    generated_outline_text = await call_llm_for_content_generation_async(outline_prompt, "create_outline")
     
     # Create structured outline data
     estimated_chapters = 12 if target_length == "short" else (18 if target_length == "medium" else 24)
@@ -155,7 +113,7 @@ Make the character compelling, three-dimensional, and appropriate for the {genre
     print(f"--- Tool: Generating character profile with LLM ---")
     
     # Generate character profile using LLM
-    generated_profile_text = await call_llm_for_content_generation_async(character_prompt)
+    generated_profile_text = await call_llm_for_content_generation_async(character_prompt, "create_character_profile")
     
     profile = {
         "name": character_name,
@@ -200,15 +158,26 @@ def get_novel_progress(tool_context: ToolContext) -> dict:
     
     return {"status": "success", "progress": progress}
 
+def novel_agent_callbacks(**extra_callbacks) -> dict:
+    """Callbacks of every novel agent: the shared ones plus the fast-path router."""
+    return agent_callbacks(before_model_callback=fast_path_router, **extra_callbacks)
+
+def chapter_agent_callbacks() -> dict:
+    """Callbacks of the chapter specialists: build the chapter's context slice, save the chapter."""
+    return novel_agent_callbacks(before_agent_callback=prepare_chapter_context, after_agent_callback=save_chapter)
+
 # Agent definitions
 def create_agents():
     """Creates and returns the novel writing agent team."""
-    # Create LLM instance (automatically chooses Azure or Google based on USE_AZURE env var)
-    llm = create_llm()
+    # Each agent runs on the model tier assigned to it (common/model_tiers.json);
+    # create_llm chooses Azure or Google based on USE_AZURE
+    def llm_for(agent_name: str):
+        return create_llm(model_for(agent_name))
 
     # Outline Agent
     outline_agent = Agent(
-        model=llm,
+        model=llm_for("outline_agent"),
+        **novel_agent_callbacks(),
         name="outline_agent",
         instruction="""You are the Outline Agent. You create comprehensive novel outlines with proper story structure.
 
@@ -226,7 +195,8 @@ Use the 'create_outline' tool to structure and save the outline to project state
 
     # Character Profile Agent  
     character_agent = Agent(
-        model=llm,
+        model=llm_for("character_agent"),
+        **novel_agent_callbacks(),
         name="character_agent",
         instruction="""You are the Character Profile Agent. You create detailed character profiles and development arcs.
 
@@ -250,15 +220,15 @@ Use the 'create_character_profile' tool to structure and save profiles to projec
 
     # Create Chapter Writing Agents with instruction interpolation
     opening_agent = Agent(
-        model=llm,
+        model=llm_for("opening_chapter_agent"),
+        **chapter_agent_callbacks(),
         name="opening_chapter_agent",
         instruction="""You are the Opening Chapter Specialist. You write compelling opening chapters for novels.
 
 CURRENT PROJECT CONTEXT:
 Genre: {novel_genre?}
 Theme: {novel_theme?}
-Outline: {novel_outline?}
-Characters: {character_profiles?}
+{chapter_context?}
 
 Your task is to write an engaging opening chapter that:
 1. Uses a strong hook to grab reader attention
@@ -272,18 +242,19 @@ Your task is to write an engaging opening chapter that:
 When asked to write an opening chapter, generate the complete chapter content directly without using any tools.""",
         description="Specializes in writing engaging opening chapters that hook readers and follow the outline.",
         tools=[],  # No tools needed - generate content directly
+        output_key="latest_chapter"
     )
 
     action_agent = Agent(
-        model=llm,
-        name="action_chapter_agent", 
+        model=llm_for("action_chapter_agent"),
+        **chapter_agent_callbacks(),
+        name="action_chapter_agent",
         instruction="""You are the Action Chapter Specialist. You write exciting action and conflict scenes.
 
 CURRENT PROJECT CONTEXT:
 Genre: {novel_genre?}
 Theme: {novel_theme?}
-Outline: {novel_outline?}
-Characters: {character_profiles?}
+{chapter_context?}
 
 Your task is to write intense action chapters that:
 1. Feature fast-paced narrative with varied sentence lengths
@@ -298,18 +269,19 @@ Your task is to write intense action chapters that:
 When asked to write an action chapter, generate the complete chapter content directly without using any tools.""",
         description="Specializes in writing fast-paced action and conflict chapters.",
         tools=[],  # No tools needed - generate content directly
+        output_key="latest_chapter"
     )
 
     dialogue_agent = Agent(
-        model=llm,
+        model=llm_for("dialogue_chapter_agent"),
+        **chapter_agent_callbacks(),
         name="dialogue_chapter_agent",
         instruction="""You are the Dialogue Chapter Specialist. You write character-driven dialogue scenes.
 
 CURRENT PROJECT CONTEXT:
 Genre: {novel_genre?}
 Theme: {novel_theme?}
-Outline: {novel_outline?}
-Characters: {character_profiles?}
+{chapter_context?}
 
 Your task is to write dialogue-heavy chapters that:
 1. Give each character a distinct voice and speaking style
@@ -324,18 +296,19 @@ Your task is to write dialogue-heavy chapters that:
 When asked to write a dialogue chapter, generate the complete chapter content directly without using any tools.""",
         description="Specializes in writing dialogue-heavy chapters with strong character interaction.",
         tools=[],  # No tools needed - generate content directly
+        output_key="latest_chapter"
     )
 
     climax_agent = Agent(
-        model=llm,
+        model=llm_for("climax_chapter_agent"),
+        **chapter_agent_callbacks(),
         name="climax_chapter_agent",
         instruction="""You are the Climax Chapter Specialist. You write powerful climactic scenes with resolution.
 
 CURRENT PROJECT CONTEXT:
 Genre: {novel_genre?}
-Theme: {novel_theme?}  
-Outline: {novel_outline?}
-Characters: {character_profiles?}
+Theme: {novel_theme?}
+{chapter_context?}
 
 Your task is to write climactic chapters that:
 1. Build to maximum tension and stakes
@@ -350,20 +323,21 @@ Your task is to write climactic chapters that:
 When asked to write a climax chapter, generate the complete chapter content directly without using any tools.""",
         description="Specializes in writing climactic chapters with emotional and plot resolution.",
         tools=[],  # No tools needed - generate content directly
+        output_key="latest_chapter"
     )
 
     # Act Agent coordinates the chapter writing specialists
     act_agent = Agent(
         name="act_agent",
-        model=llm,
+        model=llm_for("act_agent"),
+        **novel_agent_callbacks(before_agent_callback=prepare_chapter_context),
         description="Act Writing Coordinator: Manages different types of chapter writing through specialized sub-agents.",
         instruction="""You are the Act Agent, coordinating chapter writing across different chapter types.
 
 CURRENT PROJECT CONTEXT:
 Genre: {novel_genre?}
 Theme: {novel_theme?}
-Outline: {novel_outline?}
-Characters: {character_profiles?}
+{chapter_context?}
 
 CRITICAL: Always ensure chapters follow the novel outline structure and character profiles.
 
@@ -373,7 +347,7 @@ Delegate chapter writing as follows:
 - Dialogue/character development scenes → 'dialogue_chapter_agent'
 - Climactic/resolution scenes → 'climax_chapter_agent'
 
-Each specialist has access to the same project context and will generate content directly.""",
+Each specialist receives the same context slice for the target chapter and will generate content directly.""",
         tools=[],  # Coordinates through sub-agents
         sub_agents=[opening_agent, action_agent, dialogue_agent, climax_agent],
         output_key="chapter_writing_result"
@@ -381,7 +355,8 @@ Each specialist has access to the same project context and will generate content
 
     # Progress Tracking Agent
     progress_agent = Agent(
-        model=llm,
+        model=llm_for("progress_agent"),
+        **novel_agent_callbacks(),
         name="progress_agent",
         instruction="You are the Progress Tracking Agent. Your task is to monitor novel writing progress using the 'get_novel_progress' tool. "
                    "Provide updates on completion status and suggest next steps.",
@@ -392,7 +367,8 @@ Each specialist has access to the same project context and will generate content
     # Root Novel Writing Agent
     root_agent = Agent(
         name="novel_write_agent",
-        model=llm,
+        model=llm_for("novel_write_agent"),
+        **novel_agent_callbacks(before_agent_callback=prepare_project_overview),
         description="Main novel writing orchestrator: Coordinates outline creation, character development, chapter writing, and progress tracking.",
         instruction="""You are the Novel Writing Agent. You coordinate the entire novel writing process.
 
@@ -400,9 +376,7 @@ CURRENT PROJECT STATUS:
 Genre: {novel_genre?}
 Theme: {novel_theme?}
 Target Length: {novel_target_length?}
-Outline Complete: {novel_outline?}
-Character Profiles: {character_profiles?}
-Chapters Written: {chapters?}
+{project_overview?}
 
 Your responsibilities:
 1. Guide users through the complete novel writing workflow
@@ -425,16 +399,26 @@ Always ensure that:
 
     return root_agent
 
-async def call_agent_async(query: str, runner: Runner, user_id: str, session_id: str):
-    """Sends a query to the agent and prints the final response."""
+async def call_agent_async(query: str, runner: Runner, user_id: str, session_id: str,
+                           on_partial_text: Optional[Callable[[str], Any]] = None,
+                           on_event: Optional[Callable[[StreamEvent], Any]] = None) -> str:
+    """Sends a query to the agent, prints each agent as it starts and finishes, and returns the final response.
+
+    on_partial_text receives the output of tool LLM calls (outlines, profiles) as it is generated;
+    on_event receives every stream event of the run (see common.streaming).
+    """
     print(f"\n>>> User Query: {query}")
-    content = types.Content(role='user', parts=[types.Part(text=query)])
-    
-    async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
-        if event.is_final_response():
-            if event.content and event.content.parts:
-                print(f"<<< Agent Response: {event.content.parts[0].text}")
-            break
+    final_response = ""
+    async for event in stream_agent_events(runner, user_id, session_id, query):
+        await notify(on_event, event)
+        if event.kind == "partial_text":
+            await notify(on_partial_text, event.text)
+        elif event.kind in ("stage_start", "stage_end"):
+            print(format_stream_event(event))
+        elif event.kind == "run_end":
+            final_response = event.text
+            print(f"<<< Agent Response: {final_response}")
+    return final_response
 
 # Session setup
 session_service = InMemorySessionService()
@@ -456,14 +440,14 @@ root_agent = create_agents()
 async def main():
     """Main function to run the novel writing agent."""
 
-    runner = Runner(root_agent, session_service=session_service)
+    runner = Runner(agent=root_agent, session_service=session_service, app_name=APP_NAME)
     
     # Initialize session
     await session_service.create_session(
         app_name=APP_NAME,
         user_id=USER_ID,
         session_id=SESSION_ID,
-        initial_state=initial_state
+        state=initial_state
     )
     
     # Example conversations
@@ -478,5 +462,9 @@ async def main():
         await call_agent_async(query, runner, USER_ID, SESSION_ID)
         await asyncio.sleep(1)  # Brief pause between queries
 
+    print(f"\n📦 LLM cache: {get_llm_cache_stats()}")
+    print(f"⏱️ Telemetry: {get_telemetry_summary()}")
+    print(f"🧭 Router: {get_router_stats()}")
+
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
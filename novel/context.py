@@ -0,0 +1,214 @@
+"""
+Context slicing for the chapter writing agents.
+
+Instead of interpolating the whole outline, every character profile and the
+whole manuscript into every instruction, the chapter agents get a context
+built for the target chapter: the outline section of its act, the characters
+who appear in it and short summaries of the neighbouring chapters. The root
+agent gets a compact project overview. Prompt size stays bounded as the
+manuscript grows.
+"""
+
+import re
+from typing import Any, Dict, List
+
+from google.adk.agents.callback_context import CallbackContext
+
+# Context budgets, in characters
+MAX_OUTLINE_SECTION_CHARS = 2000
+MAX_PROFILE_CHARS = 400
+MAX_SUMMARY_CHARS = 300
+MAX_CHARACTERS = 6
+NEIGHBOUR_CHAPTERS = 1
+
+_ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6,
+    "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10, "eleventh": 11, "twelfth": 12,
+    "opening": 1,
+}
+_CHINESE_NUMERALS = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+_ROMAN_NUMERALS = {"i": 1, "ii": 2, "iii": 3, "one": 1, "two": 2, "three": 3}
+
+_CHAPTER_NUMBER = re.compile(r"\bchapter\s+(\d+)\b|\bch\.?\s*(\d+)\b|第\s*(\d+)\s*章", re.IGNORECASE)
+_ORDINAL_CHAPTER = re.compile(
+    r"\b(" + "|".join(_ORDINALS) + r"|final|last)\s+chapter\b|\bchapter\s+(" + "|".join(_ORDINALS) + r")\b",
+    re.IGNORECASE)
+_CHINESE_CHAPTER = re.compile(r"第([一二三四五六七八九十]+)章")
+_ACT_HEADING = re.compile(r"^[\W_]*act\s+(\d|one|two|three|iii|ii|i)\b", re.IGNORECASE | re.MULTILINE)
+
+
+def _chinese_number(numeral: str) -> int:
+    if numeral.startswith("十"):
+        return 10 + _CHINESE_NUMERALS.get(numeral[1:], 0)
+    if "十" in numeral:
+        tens, _, ones = numeral.partition("十")
+        return _CHINESE_NUMERALS[tens] * 10 + _CHINESE_NUMERALS.get(ones, 0)
+    return _CHINESE_NUMERALS[numeral]
+
+
+def target_chapter(request: str, chapters: Dict[str, Any], total_chapters: int) -> int:
+    """Finds the chapter a request is about ("chapter 3", "the first chapter", "第三章"), else the next one."""
+    match = _CHAPTER_NUMBER.search(request)
+    if match:
+        return int(next(group for group in match.groups() if group))
+    match = _CHINESE_CHAPTER.search(request)
+    if match:
+        return _chinese_number(match.group(1))
+    match = _ORDINAL_CHAPTER.search(request)
+    if match:
+        word = (match.group(1) or match.group(2)).lower()
+        if word in ("final", "last"):
+            return total_chapters or len(chapters) + 1
+        return _ORDINALS[word]
+    written = [int(number) for number in chapters if str(number).isdigit()]
+    return max(written, default=0) + 1
+
+
+def act_for_chapter(chapter: int, total_chapters: int) -> int:
+    """Maps a chapter to its act - the first and last quarter are Acts 1 and 3."""
+    if not total_chapters:
+        return 1
+    position = (chapter - 1) / total_chapters
+    return 1 if position < 0.25 else (2 if position < 0.75 else 3)
+
+
+def _truncate(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    sentence_end = cut.rfind(". ")
+    return (cut[:sentence_end + 1] if sentence_end > limit // 2 else cut.rstrip()) + " ..."
+
+
+def outline_section(outline: Dict[str, Any], act: int) -> str:
+    """Returns the title, the act summary and the act's part of the generated outline."""
+    if not outline:
+        return ""
+    lines = [f"Title: {outline.get('title', 'Untitled')}"]
+    act_summary = (outline.get("structure") or {}).get(f"act{act}")
+    if act_summary:
+        lines.append(f"Act {act}: {act_summary}")
+
+    generated = outline.get("generated_outline") or ""
+    headings = list(_ACT_HEADING.finditer(generated))
+    for i, heading in enumerate(headings):
+        number = heading.group(1).lower()
+        heading_act = int(number) if number.isdigit() else _ROMAN_NUMERALS[number]
+        if heading_act == act:
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(generated)
+            lines.append(generated[heading.start():end].strip()[:MAX_OUTLINE_SECTION_CHARS])
+            break
+    return "\n".join(lines)
+
+
+def _profile_summary(name: str, profile: Dict[str, Any]) -> str:
+    details = profile.get("generated_profile") or "; ".join(
+        str(profile[key]) for key in ("background", "personality", "motivation", "character_arc") if profile.get(key))
+    return f"- {name} ({profile.get('role', 'character')}): {_truncate(details, MAX_PROFILE_CHARS)}"
+
+
+def chapter_characters(profiles: Dict[str, Any], *texts: str) -> List[str]:
+    """Picks the characters mentioned in the chapter's texts, plus the protagonist."""
+    haystack = " ".join(texts).lower()
+    mentioned = [name for name in profiles if name.lower() in haystack]
+    leads = [name for name, profile in profiles.items()
+             if "protagonist" in str(profile.get("role", "")).lower() and name not in mentioned]
+    selected = mentioned + leads
+    return (selected or list(profiles))[:MAX_CHARACTERS]
+
+
+def chapter_summary(chapter: Dict[str, Any]) -> str:
+    """Returns a stored chapter's summary, falling back to the start of its text."""
+    return chapter.get("summary") or _truncate(chapter.get("content", ""), MAX_SUMMARY_CHARS)
+
+
+def neighbour_summaries(chapters: Dict[str, Any], chapter: int) -> List[str]:
+    """Short summaries of the chapters written just before and after the target chapter."""
+    summaries = []
+    for number in range(chapter - NEIGHBOUR_CHAPTERS, chapter + NEIGHBOUR_CHAPTERS + 1):
+        neighbour = chapters.get(str(number))
+        if number != chapter and neighbour:
+            summaries.append(f"- Chapter {number}: {chapter_summary(neighbour)}")
+    return summaries
+
+
+def build_chapter_context(state: Dict[str, Any], request: str) -> Dict[str, Any]:
+    """Builds the context slice for the chapter a request is about."""
+    outline = state.get("novel_outline") or {}
+    profiles = state.get("character_profiles") or {}
+    chapters = state.get("chapters") or {}
+    total_chapters = outline.get("estimated_chapters", 0)
+
+    chapter = target_chapter(request, chapters, total_chapters)
+    act = act_for_chapter(chapter, total_chapters)
+    section = outline_section(outline, act)
+    neighbours = neighbour_summaries(chapters, chapter)
+    characters = chapter_characters(profiles, request, section, *neighbours)
+
+    parts = [f"Target chapter: {chapter}" + (f" of {total_chapters}" if total_chapters else "") + f" (Act {act})"]
+    if section:
+        parts.append(f"Outline (Act {act}):\n{section}")
+    if characters:
+        parts.append("Characters in this chapter:\n" + "\n".join(
+            _profile_summary(name, profiles[name]) for name in characters))
+    if neighbours:
+        parts.append("Neighbouring chapters:\n" + "\n".join(neighbours))
+    return {"chapter": chapter, "act": act, "text": "\n\n".join(parts)}
+
+
+def build_project_overview(state: Dict[str, Any]) -> str:
+    """Builds the compact project status the root agent coordinates with."""
+    outline = state.get("novel_outline") or {}
+    profiles = state.get("character_profiles") or {}
+    chapters = state.get("chapters") or {}
+
+    lines = [f"Outline: {outline.get('title', 'created') if outline else 'not created yet'}"]
+    if outline.get("estimated_chapters"):
+        lines.append(f"Estimated chapters: {outline['estimated_chapters']}")
+    lines.append("Characters: " + (", ".join(
+        f"{name} ({profile.get('role', 'character')})" for name, profile in profiles.items()) or "none yet"))
+    written = sorted(int(number) for number in chapters if str(number).isdigit())
+    lines.append(f"Chapters written: {', '.join(map(str, written)) if written else 'none yet'}")
+    return "\n".join(lines)
+
+
+def _request_text(callback_context: CallbackContext) -> str:
+    content = callback_context.user_content
+    if not content or not content.parts:
+        return ""
+    return " ".join(part.text for part in content.parts if part.text)
+
+
+async def prepare_chapter_context(callback_context: CallbackContext) -> None:
+    """Stores the context slice for the requested chapter in state before a chapter agent runs."""
+    state = callback_context.state.to_dict()
+    context = build_chapter_context(state, _request_text(callback_context))
+    callback_context.state["target_chapter"] = context["chapter"]
+    callback_context.state["chapter_context"] = context["text"]
+    callback_context.state["latest_chapter"] = None
+    return None
+
+
+async def prepare_project_overview(callback_context: CallbackContext) -> None:
+    """Stores the compact project overview in state before the root agent runs."""
+    callback_context.state["project_overview"] = build_project_overview(callback_context.state.to_dict())
+    return None
+
+
+async def save_chapter(callback_context: CallbackContext) -> None:
+    """Saves the chapter a specialist just wrote, with a short summary for its neighbours."""
+    content = callback_context.state.get("latest_chapter")
+    chapter = callback_context.state.get("target_chapter")
+    if not content or not chapter:
+        return None
+    chapters = dict(callback_context.state.get("chapters") or {})
+    chapters[str(chapter)] = {
+        "type": callback_context.agent_name.replace("_chapter_agent", ""),
+        "content": content,
+        "summary": _truncate(content, MAX_SUMMARY_CHARS),
+        "word_count": len(content.split()),
+    }
+    callback_context.state["chapters"] = chapters
+    print(f"--- Context: saved chapter {chapter} ({chapters[str(chapter)]['word_count']} words) ---")
+    return None
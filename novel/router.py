@@ -0,0 +1,169 @@
+"""
+Deterministic fast-path router for the novel writing agents.
+
+Requests with an unambiguous intent ("write chapter 3 (action)", "create
+character profiles", "写第一章") are classified locally with a rule table and
+routed straight to the agent that handles them: every delegation hop on the
+way is answered with a transfer_to_agent call without calling the model.
+Requests the rules cannot classify with confidence fall back to the normal LLM
+delegation by novel_write_agent and act_agent.
+"""
+
+import os
+import re
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Pattern
+
+from dotenv import load_dotenv
+from google.adk.agents import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from novel.context import target_chapter
+
+# Load environment variables
+load_dotenv()
+
+NOVEL_FAST_ROUTER = os.getenv("NOVEL_FAST_ROUTER", "true").lower() == "true"
+
+CHAPTER_COORDINATOR = "act_agent"
+
+
+class Route(NamedTuple):
+    agent_name: str
+    reason: str
+
+
+def _rule(*patterns: str) -> Pattern:
+    return re.compile("|".join(patterns), re.IGNORECASE)
+
+
+# A request is about writing a chapter when it matches this
+CHAPTER_REQUEST = _rule(
+    r"\b(write|draft|compose|continue|create|start)\b.*\b(chapter|scene)\b",
+    r"\bchapter\s+\d+\b",
+    r"[写續续].*(章|场景|場景)",
+)
+
+# Chapter type -> specialist
+CHAPTER_RULES: Dict[str, Pattern] = {
+    "opening_chapter_agent": _rule(r"\bopening\b", r"\bfirst chapter\b", r"\bchapter (1|one)\b(?!\d)",
+                                   r"\bintroduc", r"\bbeginning\b", r"开篇|开头|第一章|第1章"),
+    "action_chapter_agent": _rule(r"\baction\b", r"\bfight", r"\bbattle", r"\bchase\b", r"\bcombat\b",
+                                  r"\bconflict\b", r"\bambush", r"打斗|战斗|追逐|冲突"),
+    "dialogue_chapter_agent": _rule(r"\bdialog(ue)?\b", r"\bconversation\b", r"\bdiscuss", r"\btalk",
+                                    r"\bargu(e|ment)", r"\bconfess", r"对话|交谈|谈话"),
+    "climax_chapter_agent": _rule(r"\bclima(x|ctic)\b", r"\b(final|last) chapter\b", r"\bconfrontation\b",
+                                  r"\bresolution\b", r"\bshowdown\b", r"高潮|结局|最后一章"),
+}
+
+# Other intents -> agent
+INTENT_RULES: Dict[str, Pattern] = {
+    "outline_agent": _rule(r"\boutline\b", r"\b(start|begin|new)\b.*\bnovel\b", r"大纲"),
+    "character_agent": _rule(r"\bcharacter (profile|sheet|arc|backstor)", r"\bprofiles?\b.*\b(protagonist|antagonist|characters?)\b",
+                             r"人物(设定|小传)|角色(设定|档案)"),
+    "progress_agent": _rule(r"\bprogress\b", r"\bstatus\b", r"\bhow many chapters\b", r"进度"),
+}
+
+# Invocation id -> agent a routed request is on its way to
+_routes: Dict[str, str] = {}
+
+router_stats = {"routed": 0, "fallback": 0, "hops_skipped": 0}
+
+
+def classify_request(text: str, total_chapters: int = 0) -> Optional[Route]:
+    """Returns the agent a request should go to, or None when the rules are not confident."""
+    if CHAPTER_REQUEST.search(text):
+        matches = [name for name, rule in CHAPTER_RULES.items() if rule.search(text)]
+        if len(matches) == 1:
+            return Route(matches[0], "chapter type keywords")
+        if not matches and total_chapters and target_chapter(text, {}, total_chapters) == total_chapters:
+            return Route("climax_chapter_agent", "final chapter")
+        # Several chapter types or none - the act agent picks the specialist
+        return Route(CHAPTER_COORDINATOR, "chapter request")
+
+    matches = [name for name, rule in INTENT_RULES.items() if rule.search(text)]
+    if len(matches) == 1:
+        return Route(matches[0], "intent keywords")
+    return None
+
+
+def route_path(agent: BaseAgent, target_name: str) -> List[str]:
+    """Transfer hops from an agent to the target, through the targets ADK lets each agent transfer to."""
+    def neighbours(node: BaseAgent) -> List[BaseAgent]:
+        parent = node.parent_agent
+        peers = [peer for peer in parent.sub_agents if peer is not node] if parent else []
+        return list(node.sub_agents) + ([parent] if parent else []) + peers
+
+    previous: Dict[str, Optional[BaseAgent]] = {agent.name: None}
+    queue = deque([agent])
+    while queue:
+        node = queue.popleft()
+        if node.name == target_name:
+            path = []
+            while previous[node.name] is not None:
+                path.append(node.name)
+                node = previous[node.name]
+            return path[::-1]
+        for neighbour in neighbours(node):
+            if neighbour.name not in previous:
+                previous[neighbour.name] = node
+                queue.append(neighbour)
+    return []
+
+
+def _is_new_user_turn(llm_request: LlmRequest) -> bool:
+    """True on the first model call for a new user message (not one relayed from another agent)."""
+    if not llm_request.contents:
+        return False
+    last = llm_request.contents[-1]
+    texts = [part.text for part in last.parts or [] if part.text]
+    relayed = texts and (texts[0].startswith("For context") or "<<<BEGIN_QUOTED_AGENT_CONTENT>>>" in texts[0])
+    return last.role == "user" and bool(texts) and not relayed
+
+
+def _transfer(agent_name: str) -> LlmResponse:
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(
+        function_call=types.FunctionCall(name="transfer_to_agent", args={"agent_name": agent_name}))]))
+
+
+async def fast_path_router(callback_context: CallbackContext,
+                           llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """Answers delegation hops of confidently classified requests with transfers, without the model."""
+    if not NOVEL_FAST_ROUTER:
+        return None
+    invocation_id = callback_context.invocation_id
+    agent = callback_context.get_invocation_context().agent
+
+    target = _routes.get(invocation_id)
+    if target is None:
+        if not _is_new_user_turn(llm_request):
+            return None
+        text = " ".join(part.text for part in llm_request.contents[-1].parts if part.text)
+        outline = callback_context.state.get("novel_outline") or {}
+        route = classify_request(text, outline.get("estimated_chapters", 0))
+        if route is None:
+            router_stats["fallback"] += 1
+            return None
+        if route.agent_name == agent.name:
+            return None
+        target = route.agent_name
+        _routes[invocation_id] = target
+        router_stats["routed"] += 1
+        print(f"--- Router: routing to {target} ({route.reason}) ---")
+
+    if target == agent.name:
+        del _routes[invocation_id]
+        return None
+    path = route_path(agent, target)
+    if not path:
+        del _routes[invocation_id]
+        return None
+    router_stats["hops_skipped"] += 1
+    return _transfer(path[0])
+
+
+def get_router_stats() -> dict:
+    return dict(router_stats)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for the chapter context slicing of the Novel Writing Agent
+"""
+
+import asyncio
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from common.mock_backends import MockLlm
+from novel.context import act_for_chapter, build_chapter_context, build_project_overview, target_chapter
+
+OUTLINE = {
+    "title": "The Crystal of Elderwood",
+    "structure": {
+        "act1": "Setup - Young mage discovers ancient crystal with dark power",
+        "act2": "Development - Friends must choose between power and friendship",
+        "act3": "Resolution - Sacrifice leads to redemption and new understanding",
+    },
+    "generated_outline": "ACT I: THE CRYSTAL\nLyra finds the crystal.\n\n"
+                         "ACT II: THE BETRAYAL\nMorwen turns the village against Finn.\n\n"
+                         "ACT III: THE SACRIFICE\nLyra gives up her fire.",
+    "estimated_chapters": 12,
+}
+
+PROFILES = {
+    "Lyra": {"role": "protagonist", "generated_profile": "Young fire mage from a humble village."},
+    "Finn": {"role": "best friend", "generated_profile": "Earth mage, Lyra's childhood companion."},
+    "Morwen": {"role": "antagonist", "generated_profile": "Exiled sorceress hunting the crystal."},
+    "Bram": {"role": "innkeeper", "generated_profile": "Keeps the village inn and its secrets."},
+}
+
+
+def test_target_chapter_and_act():
+    """Chapter numbers are read from English and Chinese requests and mapped to acts."""
+    print("=== Testing Target Chapter Detection ===")
+
+    chapters = {"1": {}, "2": {}}
+    assert target_chapter("Write chapter 5, an action scene", chapters, 12) == 5
+    assert target_chapter("Write the third chapter", chapters, 12) == 3
+    assert target_chapter("写第七章", chapters, 12) == 7
+    assert target_chapter("Write the final chapter", chapters, 12) == 12
+    assert target_chapter("Write the next chapter", chapters, 12) == 3
+    assert [act_for_chapter(n, 12) for n in (1, 3, 4, 9, 10, 12)] == [1, 1, 2, 2, 3, 3]
+    print("Chapter detection OK")
+
+
+def test_chapter_context_is_sliced():
+    """Only the target act, the chapter's characters and neighbouring summaries are included."""
+    print("\n=== Testing Chapter Context Slicing ===")
+
+    state = {
+        "novel_outline": OUTLINE,
+        "character_profiles": PROFILES,
+        "chapters": {str(n): {"content": f"Chapter {n} text. " * 200} for n in range(1, 9)},
+    }
+    context = build_chapter_context(state, "Write chapter 6 where Finn faces the betrayal")
+    text = context["text"]
+
+    assert context["chapter"] == 6 and context["act"] == 2
+    assert "Morwen turns the village against Finn" in text
+    assert "Lyra finds the crystal" not in text and "Lyra gives up her fire" not in text
+    assert "- Finn (best friend)" in text and "- Lyra (protagonist)" in text
+    assert "- Morwen" in text, "characters named in the act outline are included"
+    assert "Bram" not in text
+    assert "Chapter 5:" in text and "Chapter 7:" in text and "Chapter 4:" not in text
+    assert len(text) < 2000, f"context should stay small, got {len(text)} characters"
+    print(f"Context ({len(text)} chars):\n{text[:300]}...")
+
+    overview = build_project_overview(state)
+    assert "Chapters written: 1, 2, 3, 4, 5, 6, 7, 8" in overview and "Chapter 1 text" not in overview
+    print(f"Overview:\n{overview}")
+
+
+def test_agents_use_sliced_context():
+    """Chapter agents get the sliced context in their instructions and save the chapter they write."""
+    print("\n=== Testing Agents With Sliced Context ===")
+
+    import novel.agent as novel_agent
+
+    llm = MockLlm(model="mock/context-test", latency_ms=0)
+    original_create_llm = novel_agent.create_llm
+    novel_agent.create_llm = lambda model_name=None: llm
+    try:
+        root_agent = novel_agent.create_agents()
+    finally:
+        novel_agent.create_llm = original_create_llm
+
+    system_instructions = []
+
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=root_agent, app_name="context_test", session_service=session_service)
+        await session_service.create_session(app_name="context_test", user_id="u", session_id="s", state={
+            "novel_genre": "fantasy", "novel_theme": "friendship", "novel_outline": OUTLINE,
+            "character_profiles": PROFILES, "chapters": {},
+        })
+        message = types.Content(role="user", parts=[types.Part(text="Write chapter 1, the opening chapter")])
+        async for event in runner.run_async(user_id="u", session_id="s", new_message=message):
+            pass
+        return await session_service.get_session(app_name="context_test", user_id="u", session_id="s")
+
+    original_generate = llm.__class__.generate_content_async
+
+    async def recording_generate(self, llm_request, stream=False):
+        system_instructions.append(llm_request.config.system_instruction)
+        async for response in original_generate(self, llm_request, stream):
+            yield response
+
+    llm.__class__.generate_content_async = recording_generate
+    try:
+        session = asyncio.run(run())
+    finally:
+        llm.__class__.generate_content_async = original_generate
+
+    specialist = next(s for s in system_instructions if "Opening Chapter Specialist" in s)
+    assert "Target chapter: 1 of 12 (Act 1)" in specialist
+    assert "Lyra finds the crystal" in specialist and "Lyra gives up her fire" not in specialist
+    assert "Bram" not in specialist
+    assert session.state["chapters"]["1"]["type"] == "opening"
+    assert session.state["chapters"]["1"]["summary"]
+    print(f"Saved chapter 1: {session.state['chapters']['1']['word_count']} words")
+
+
+def main():
+    """Run all tests"""
+    print("Chapter Context Test Suite")
+    print("==========================")
+
+    test_target_chapter_and_act()
+    test_chapter_context_is_sliced()
+    test_agents_use_sliced_context()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
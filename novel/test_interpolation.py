@@ -24,7 +24,7 @@ async def test_instruction_interpolation():
     
     # Create agents and runner
     root_agent = create_agents()
-    runner = Runner(root_agent, session_service=session_service)
+    runner = Runner(agent=root_agent, session_service=session_service, app_name=APP_NAME)
     
     # Initialize session with some initial data
     initial_state = {
@@ -65,7 +65,7 @@ async def test_instruction_interpolation():
         app_name=APP_NAME,
         user_id=USER_ID,
         session_id=SESSION_ID,
-        initial_state=initial_state
+        state=initial_state
     )
     
     print("📊 Initial project state loaded with:")
@@ -115,7 +115,7 @@ async def test_empty_context():
     print("\n🎪 Testing Empty Context Handling\n")
     
     root_agent = create_agents()
-    runner = Runner(root_agent, session_service=session_service)
+    runner = Runner(agent=root_agent, session_service=session_service, app_name=APP_NAME)
     
     # Initialize session with minimal data
     empty_session_id = "empty_context_session"
@@ -131,7 +131,7 @@ async def test_empty_context():
         app_name=APP_NAME,
         user_id=USER_ID,
         session_id=empty_session_id,
-        initial_state=minimal_state
+        state=minimal_state
     )
     
     print("📝 Testing with empty context (should handle gracefully with ? syntax)")
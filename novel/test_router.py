@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for the fast-path router of the Novel Writing Agent
+"""
+
+import asyncio
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+import novel.agent as novel_agent
+from common.mock_backends import MockLlm
+from novel import router
+from novel.router import classify_request, route_path
+
+
+def create_mock_agents(llm: MockLlm):
+    """Creates the novel agent team on a mock model."""
+    original_create_llm = novel_agent.create_llm
+    novel_agent.create_llm = lambda model_name=None: llm
+    try:
+        return novel_agent.create_agents()
+    finally:
+        novel_agent.create_llm = original_create_llm
+
+
+def test_classify_request():
+    """Confident requests map to one agent; ambiguous ones fall back to the LLM."""
+    print("=== Testing Request Classification ===")
+
+    cases = {
+        "write chapter 3 (action)": "action_chapter_agent",
+        "Write the first chapter introducing the main character": "opening_chapter_agent",
+        "Draft chapter 7 where Lyra and Finn discuss the crystal": "dialogue_chapter_agent",
+        "Write the climactic showdown chapter": "climax_chapter_agent",
+        "写第五章，一场激烈的战斗": "action_chapter_agent",
+        "写第一章": "opening_chapter_agent",
+        "Write chapter 4": "act_agent",
+        "Write chapter 6, an action scene full of dialogue": "act_agent",
+        "Create an outline for a mystery novel": "outline_agent",
+        "Create character profiles for the main protagonist and antagonist": "character_agent",
+        "What's my current progress on the novel?": "progress_agent",
+        "帮我写一个大纲": "outline_agent",
+    }
+    for text, expected in cases.items():
+        route = classify_request(text)
+        assert route and route.agent_name == expected, f"{text!r}: expected {expected}, got {route}"
+
+    assert classify_request("Write chapter 18", total_chapters=18).agent_name == "climax_chapter_agent"
+    assert classify_request("Tell me a joke") is None
+    assert classify_request("Update the outline and show my progress") is None
+    print(f"{len(cases)} requests classified")
+
+
+def test_route_path():
+    """Routes follow the transfers ADK allows: sub-agents, parent and peers."""
+    print("\n=== Testing Route Paths ===")
+
+    root_agent = create_mock_agents(MockLlm(model="mock/router-test", latency_ms=0))
+    action_agent = root_agent.find_agent("action_chapter_agent")
+    assert route_path(root_agent, "action_chapter_agent") == ["act_agent", "action_chapter_agent"]
+    assert route_path(action_agent, "dialogue_chapter_agent") == ["dialogue_chapter_agent"]
+    assert route_path(action_agent, "outline_agent") == ["act_agent", "outline_agent"]
+    assert route_path(root_agent, "novel_write_agent") == []
+    print("Route paths OK")
+
+
+def run_request(text: str) -> tuple:
+    """Sends one request to a fresh novel session; returns (model calls, authors of the events)."""
+    llm = MockLlm(model="mock/router-test", latency_ms=0)
+    root_agent = create_mock_agents(llm)
+
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=root_agent, app_name="router_test", session_service=session_service)
+        await session_service.create_session(app_name="router_test", user_id="u", session_id="s",
+                                             state=dict(novel_agent.initial_state))
+        authors = []
+        message = types.Content(role="user", parts=[types.Part(text=text)])
+        async for event in runner.run_async(user_id="u", session_id="s", new_message=message):
+            authors.append(event.author)
+        return authors
+
+    authors = asyncio.run(run())
+    return llm.calls, authors
+
+
+def test_fast_path_skips_delegation_calls():
+    """A classified chapter request reaches its specialist with one model call instead of three."""
+    print("\n=== Testing Fast-Path Routing ===")
+
+    calls, authors = run_request("write chapter 3 (action)")
+    assert calls == 1, f"expected only the specialist's model call, got {calls}"
+    assert authors[-1] == "action_chapter_agent"
+
+    router.NOVEL_FAST_ROUTER = False
+    try:
+        llm_calls, _ = run_request("write chapter 3 (action)")
+    finally:
+        router.NOVEL_FAST_ROUTER = True
+    assert llm_calls == 3, f"LLM delegation should take three model calls, got {llm_calls}"
+    print(f"Model calls: {llm_calls} with LLM delegation, {calls} with the fast path")
+
+
+def main():
+    """Run all tests"""
+    print("Fast-Path Router Test Suite")
+    print("===========================")
+
+    test_classify_request()
+    test_route_path()
+    test_fast_path_skips_delegation_calls()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,193 +2,66 @@ import os
 import asyncio
 from dotenv import load_dotenv
 from google.adk.agents import LlmAgent, SequentialAgent, Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
 
-from google.genai import types
-from typing import Optional, Dict, Any, List
-import google.generativeai as genai
+from typing import Optional, Any, Callable
+
+from common.cache import get_llm_cache_stats
+from common.telemetry import get_telemetry_summary
+from common.callbacks import agent_callbacks
+from common.llm import create_llm
+from common.models import model_for
+from common.streaming import StreamEvent, format_stream_event, notify, stream_agent_events
+from novel_fix.chapters import ChapterFanOutAgent
+from novel_fix.checkpoint import checkpointed, get_checkpoint_stats
+from novel_fix.continuity import ContinuityAgent, continuity_key
+from novel_fix.params import fast_param_extraction, get_param_stats, match_params
+from novel_fix.scheduler import DagAgent, Stage
 
 # Load environment variables
 load_dotenv()
 
-# Configure ADK to use API keys directly
-os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "False"
-
-# Model constants
-USE_AZURE = os.getenv("USE_AZURE", "false").lower() == "true"
-AZURE_MODEL_NAME = os.getenv("AZURE_MODEL_NAME", "gpt-4.1")
-GOOGLE_MODEL_NAME = os.getenv("GOOGLE_MODEL_NAME", "gemini-2.0-flash-exp")
-
-def create_llm():
-    """Creates a LLM instance based on environment configuration."""
-    if USE_AZURE:
-        return LiteLlm(
-            model=f"azure/{AZURE_MODEL_NAME}",
-            api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_API_VERSION")
-        )
-    else:
-        return GOOGLE_MODEL_NAME
+# Run independent stages concurrently - 可以通过环境变量配置
+NOVEL_FIX_DAG_SCHEDULER = os.getenv("NOVEL_FIX_DAG_SCHEDULER", "true").lower() == "true"
+# Condition each act on a rolling digest of the acts before it; opt-in, as it runs the acts in order - 可以通过环境变量配置
+NOVEL_FIX_CONTINUITY = os.getenv("NOVEL_FIX_CONTINUITY", "false").lower() == "true"
 
+# State keys every act writer reads
+ACT_READS = ("extracted_parameters", "novel_outline", "character_profiles")
 
 
 # ===== WORKFLOW AGENTS FOR FIXED PIPELINE =====
 
-def create_act_agent(act_name: str):
-    """Creates an agent for writing a specific act of the novel."""
-    llm = create_llm()
-    
-    act_instructions = {
-        "Act 1": """You are the Act 1 Writer for the Novel Fix system.
-
-Your job is to write all chapters for Act 1 (Setup) based on information from previous steps.
-
-INPUT: Use information from previous agents:
-- Extracted parameters (genre, theme, length)
-- Novel outline (specifically Act 1 chapters)
-- Character profiles
-
-ACT 1 FOCUS:
-- Introduce protagonist and world
-- Establish the main conflict/problem
-- Hook the reader with engaging opening
-- Set up character relationships
-- End with inciting incident
-
-CHAPTER COUNT (based on length):
-- Short novel: 4 chapters
-- Medium novel: 6 chapters  
-- Long novel: 8 chapters
-
-OUTPUT: Write each chapter in sequence:
-- Chapter title
-- Full chapter content (2000-3000 words per chapter)
-- Smooth transitions between chapters
-- Consistent character voice and style""",
-
-        "Act 2": """You are the Act 2 Writer for the Novel Fix system.
-
-Your job is to write all chapters for Act 2 (Development) based on information from previous steps.
-
-INPUT: Use information from previous agents:
-- Extracted parameters, outline, characters
-- Act 1 content for continuity
-
-ACT 2 FOCUS:
-- Develop main conflict and obstacles
-- Character growth and relationship development
-- Rising action and complications
-- Midpoint crisis or revelation
-- Build toward climax
-
-CHAPTER COUNT (based on length):
-- Short novel: 6 chapters
-- Medium novel: 8 chapters
-- Long novel: 10 chapters
-
-OUTPUT: Write each chapter in sequence:
-- Chapter title
-- Full chapter content (2000-3000 words per chapter)
-- Continue story from Act 1
-- Build tension toward Act 3""",
-
-        "Act 3": """You are the Act 3 Writer for the Novel Fix system.
-
-Your job is to write all chapters for Act 3 (Resolution) based on information from previous steps.
-
-INPUT: Use information from previous agents:
-- Extracted parameters, outline, characters
-- Act 1 and Act 2 content for continuity
-
-ACT 3 FOCUS:
-- Climax and confrontation
-- Resolution of main conflict
-- Character arc completion
-- Tie up subplots and loose ends
-- Satisfying conclusion
+def create_act_agent(act_name: str, continuity: Optional[str] = None):
+    """Creates an agent that writes a specific act of the novel, one chapter per model call."""
+    act_id = act_name.lower().replace(' ', '_')
+    return ChapterFanOutAgent(
+        name=f"{act_id}_writer",
+        description=f"Writes all chapters for {act_name} based on outline and character profiles",
+        act=int(act_name.split()[-1]),
+        output_key=f"{act_id}_content",
+        continuity_key=continuity,
+        **checkpointed({}, reads=ACT_READS + ((continuity,) if continuity else ()))
+    )
 
-CHAPTER COUNT (based on length):
-- Short novel: 4 chapters
-- Medium novel: 6 chapters
-- Long novel: 8 chapters
 
-OUTPUT: Write each chapter in sequence:
-- Chapter title
-- Full chapter content (2000-3000 words per chapter)
-- Continue story from Acts 1 & 2
-- Provide satisfying conclusion"""
-    }
-    
-    return Agent(
-        model=llm,
-        name=f"{act_name.lower().replace(' ', '_')}_writer",
-        instruction=act_instructions[act_name],
-        description=f"Writes all chapters for {act_name} based on outline and character profiles",
-        output_key=f"{act_name.lower().replace(' ', '_')}_content"
+def create_continuity_agent(act: int):
+    """Creates an agent that rolls an act into the continuity digest of the story so far."""
+    return ContinuityAgent(
+        name=f"{continuity_key(act)}_keeper",
+        description=f"Condenses Act {act} and the earlier digest into plot state, character states, open threads and style notes",
+        act=act,
+        output_key=continuity_key(act),
+        previous_key=continuity_key(act - 1) if act > 1 else None,
+        **checkpointed({}, reads=(f"act_{act}_content",) + ((continuity_key(act - 1),) if act > 1 else ()))
     )
 
 # ===== PARAMETER EXTRACTION =====
 
 def extract_novel_params_from_text(user_input: str) -> dict:
     """Extract genre, theme, and target_length from user input text."""
-    import re
-    
-    # Default values
-    params = {
-        "genre": "fantasy",
-        "theme": "adventure and discovery", 
-        "target_length": "medium"
-    }
-    
-    # Extract genre
-    genre_patterns = [
-        r"(fantasy|science fiction|sci-fi|mystery|romance|thriller|horror|historical|adventure|drama)",
-        r"write.*?(fantasy|science fiction|sci-fi|mystery|romance|thriller|horror|historical|adventure|drama)",
-        r"(fantasy|science fiction|sci-fi|mystery|romance|thriller|horror|historical|adventure|drama).*?novel"
-    ]
-    
-    for pattern in genre_patterns:
-        match = re.search(pattern, user_input.lower())
-        if match:
-            genre = match.group(1)
-            if genre == "sci-fi":
-                genre = "science fiction"
-            params["genre"] = genre
-            break
-    
-    # Extract target length
-    length_patterns = [
-        r"(short|medium|long).*?length",
-        r"(short|medium|long).*?novel",
-        r"length.*?(short|medium|long)",
-        r"write.*?(short|medium|long)"
-    ]
-    
-    for pattern in length_patterns:
-        match = re.search(pattern, user_input.lower())
-        if match:
-            params["target_length"] = match.group(1)
-            break
-    
-    # Extract theme (more complex, look for "about X" patterns)
-    theme_patterns = [
-        r"about\s+([^,\.!?]+)",
-        r"theme.*?[:\-]\s*([^,\.!?]+)",
-        r"story.*?about\s+([^,\.!?]+)"
-    ]
-    
-    for pattern in theme_patterns:
-        match = re.search(pattern, user_input.lower())
-        if match:
-            theme = match.group(1).strip()
-            if len(theme) > 5:  # Only use if it's substantial
-                params["theme"] = theme
-            break
-    
-    return params
+    return match_params(user_input).params
 
 
 
@@ -196,10 +69,11 @@ def extract_novel_params_from_text(user_input: str) -> dict:
 
 def create_parameter_extraction_agent():
     """Creates an agent that extracts genre, theme, and target_length from user input."""
-    llm = create_llm()
+    llm = create_llm(model_for("parameter_extractor"))
     
     return Agent(
         model=llm,
+        **checkpointed(agent_callbacks(before_model_callback=fast_param_extraction)),
         name="parameter_extractor",
         instruction="""You are a Parameter Extraction Agent for the Novel Fix system.
 
@@ -239,10 +113,11 @@ Length: short""",
 
 def create_outline_agent():
     """Creates the agent responsible for creating the novel outline."""
-    llm = create_llm()
+    llm = create_llm(model_for("outline_creator"))
     
     return Agent(
         model=llm,
+        **checkpointed(agent_callbacks()),
         name="outline_creator",
         instruction="""You are the Outline Creator for the Novel Fix system.
 
@@ -276,10 +151,11 @@ Make sure the outline fits the specified genre and theme.""",
 
 def create_character_agent():
     """Creates the agent responsible for character development."""
-    llm = create_llm()
+    llm = create_llm(model_for("character_developer"))
     
     return Agent(
         model=llm,
+        **checkpointed(agent_callbacks()),
         name="character_developer",
         instruction="""You are the Character Developer for the Novel Fix system.
 
@@ -322,31 +198,48 @@ Ensure characters fit the genre and support the theme effectively.""",
 # ===== SIMPLIFIED ROOT AGENT =====
 
 def create_root_agent():
-    """Creates the root agent as a SequentialAgent with parameter extraction and writing steps."""
+    """Creates the root agent: the pipeline stages scheduled by the state keys they read and write."""
     
-    # Create all sub-agents
-    parameter_agent = create_parameter_extraction_agent()
-    outline_agent = create_outline_agent()
-    character_agent = create_character_agent()
-    act1_agent = create_act_agent("Act 1")
-    act2_agent = create_act_agent("Act 2") 
-    act3_agent = create_act_agent("Act 3")
-    
-    # Create the sequential workflow
-    root_agent = SequentialAgent(
-        name="novel_fix_sequential_pipeline",
-        description="Complete novel writing pipeline: parameter extraction → outline → characters → Act 1 → Act 2 → Act 3",
-        sub_agents=[
-            parameter_agent,
-            outline_agent,
-            character_agent,
-            act1_agent,
-            act2_agent,
-            act3_agent
+    # Create all sub-agents with the state keys they read and write
+    stages = [
+        Stage(create_parameter_extraction_agent(), reads=(), writes=("extracted_parameters",)),
+        Stage(create_outline_agent(), reads=("extracted_parameters",), writes=("novel_outline",)),
+        Stage(create_character_agent(), reads=("extracted_parameters", "novel_outline"),
+              writes=("character_profiles",)),
+    ]
+    act_reads = ACT_READS
+    if NOVEL_FIX_CONTINUITY:
+        # Each act reads the digest of the acts before it, so the acts run in order;
+        # their chapters are still written concurrently
+        for act in (1, 2, 3):
+            digest = continuity_key(act - 1) if act > 1 else None
+            stages.append(Stage(create_act_agent(f"Act {act}", continuity=digest),
+                                reads=act_reads + ((digest,) if digest else ()), writes=(f"act_{act}_content",)))
+            if act < 3:
+                stages.append(Stage(create_continuity_agent(act),
+                                    reads=(f"act_{act}_content",) + ((digest,) if digest else ()),
+                                    writes=(continuity_key(act),)))
+    else:
+        # Acts are written chapter by chapter from the outline beats, so they do not wait for each other
+        stages += [
+            Stage(create_act_agent(f"Act {act}"), reads=act_reads, writes=(f"act_{act}_content",))
+            for act in (1, 2, 3)
         ]
+
+    if not NOVEL_FIX_DAG_SCHEDULER:
+        # Strictly sequential workflow
+        return SequentialAgent(
+            name="novel_fix_sequential_pipeline",
+            description="Complete novel writing pipeline: parameter extraction → outline → characters → Act 1 → Act 2 → Act 3",
+            sub_agents=[stage.agent for stage in stages]
+        )
+
+    return DagAgent.from_stages(
+        name="novel_fix_sequential_pipeline",
+        description="Complete novel writing pipeline: parameter extraction → outline → characters → Acts 1-3 "
+                    + ("with rolling continuity digests" if NOVEL_FIX_CONTINUITY else "in parallel"),
+        stages=stages
     )
-    
-    return root_agent
 
 # ===== STANDALONE PIPELINE EXECUTION (for testing) =====
 
@@ -374,16 +267,22 @@ APP_NAME = "novel_fix"
 USER_ID = "writer_1"
 SESSION_ID = "novel_fix_session_001"
 
-async def call_agent_async(query: str, runner: Runner, user_id: str, session_id: str):
-    """Sends a query to the agent and prints the final response."""
+async def call_agent_async(query: str, runner: Runner, user_id: str, session_id: str,
+                           on_event: Optional[Callable[[StreamEvent], Any]] = None) -> str:
+    """Sends a query to the pipeline, prints every stage and chapter as it finishes, and returns the final response.
+
+    on_event receives every stream event of the run (see common.streaming), e.g. to render chapters as they are written.
+    """
     print(f"\n>>> User Query: {query}")
-    content = types.Content(role='user', parts=[types.Part(text=query)])
-    
-    async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
-        if event.is_final_response():
-            if event.content and event.content.parts:
-                print(f"<<< Agent Response: {event.content.parts[0].text}")
-            break
+    final_response = ""
+    async for event in stream_agent_events(runner, user_id, session_id, query):
+        await notify(on_event, event)
+        if event.kind in ("stage_start", "stage_end", "progress"):
+            print(format_stream_event(event))
+        elif event.kind == "run_end":
+            final_response = event.text
+            print(f"<<< Agent Response: {final_response}")
+    return final_response
 
 root_agent = create_root_agent()
 
@@ -419,14 +318,10 @@ async def main():
         await call_agent_async(query, runner, USER_ID, SESSION_ID)
         await asyncio.sleep(1)  # Brief pause between queries
 
-def get_chapter_counts(target_length: str) -> dict:
-    """Returns chapter count breakdown for each act based on target length."""
-    chapter_counts = {
-        "short": {"act1": 4, "act2": 6, "act3": 4, "total": 14},
-        "medium": {"act1": 6, "act2": 8, "act3": 6, "total": 20},
-        "long": {"act1": 8, "act2": 10, "act3": 8, "total": 26}
-    }
-    return chapter_counts.get(target_length, chapter_counts["medium"])
+    print(f"\n📦 LLM cache: {get_llm_cache_stats()}")
+    print(f"⏱️ Telemetry: {get_telemetry_summary()}")
+    print(f"💾 Checkpoints: {get_checkpoint_stats()}")
+    print(f"🔎 Parameter extraction: {get_param_stats()}")
 
 if __name__ == "__main__":
     # For standalone testing
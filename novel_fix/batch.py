@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Batch runner for the Novel Fix pipeline.
+
+Reads novel specs from a JSONL file and runs each one through
+create_root_agent() in its own session, on a bounded pool of async workers.
+All workers share the process-wide LLM rate limiters, and --rpm, --tpm and
+--max-llm-concurrency cap the model calls of all jobs together, whichever
+tier's model they go to, so the batch as a whole stays within one rate
+budget. Every stage output is written to the job's directory as soon as the
+stage finishes, and every finished job appends one line with its status and
+timings to results.jsonl. A rerun skips the jobs results.jsonl records as
+done, so a crash loses at most the jobs that were in flight.
+
+Job spec, one JSON object per line:
+    {"id": "harbor", "request": "Write a short mystery novel about a lighthouse"}
+    {"id": "dragons", "genre": "fantasy", "theme": "the last dragon rider", "length": "long"}
+
+Usage:
+    python -m novel_fix.batch jobs.jsonl [--output-dir DIR] [--workers N]
+                                         [--rpm N] [--tpm N] [--max-llm-concurrency N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the parent directory to the path so we can import from adk modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from common import ratelimit
+from novel_fix.agent import create_root_agent
+from novel_fix.scheduler import SCHEDULE_STATE_KEY
+
+# Load environment variables
+load_dotenv()
+
+# Batch configuration - 可以通过环境变量配置
+NOVEL_FIX_BATCH_WORKERS = int(os.getenv("NOVEL_FIX_BATCH_WORKERS", "2"))
+NOVEL_FIX_BATCH_OUTPUT_DIR = os.getenv("NOVEL_FIX_BATCH_OUTPUT_DIR", "novel_fix_batch_output")
+
+APP_NAME = "novel_fix_batch"
+USER_ID = "batch"
+RESULTS_FILE = "results.jsonl"
+
+# Stage outputs written to each job's directory as they are produced
+STAGE_OUTPUT_KEYS = ["extracted_parameters", "novel_outline", "character_profiles",
+                     "act_1_content", "act_2_content", "act_3_content"]
+
+
+def job_request(spec: Dict[str, Any]) -> str:
+    """Returns the pipeline request of a job spec: its "request", or one built from genre/theme/length."""
+    if spec.get("request"):
+        return spec["request"]
+    length = spec.get("length", "medium")
+    genre = spec.get("genre", "fantasy")
+    theme = spec.get("theme", "adventure and discovery")
+    return f"Write a {length} {genre} novel about {theme}"
+
+
+def _job_id(spec: Dict[str, Any], line_number: int) -> str:
+    job_id = str(spec.get("id") or f"job-{line_number}")
+    return re.sub(r"[^\w.-]+", "_", job_id)
+
+
+def load_jobs(jobs_path: str) -> List[Dict[str, Any]]:
+    """Reads job specs from a JSONL file; lines that are not valid JSON become failed jobs."""
+    jobs = []
+    seen = set()
+    with open(jobs_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                spec = json.loads(line)
+                error = None if isinstance(spec, dict) else "job spec is not a JSON object"
+            except ValueError as e:
+                spec, error = {}, f"invalid JSON: {e}"
+            spec = spec if isinstance(spec, dict) else {}
+            job_id = _job_id(spec, line_number)
+            if job_id in seen:
+                job_id, error = f"{job_id}-line-{line_number}", f"duplicate job id {spec.get('id')!r}"
+            seen.add(job_id)
+            jobs.append({"id": job_id, "spec": spec, "error": error})
+    return jobs
+
+
+def completed_job_ids(output_dir: Path) -> set:
+    """Returns the ids of the jobs results.jsonl records as done."""
+    done = set()
+    results_path = output_dir / RESULTS_FILE
+    if not results_path.exists():
+        return done
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if result.get("status") == "done":
+                done.add(result["id"])
+    return done
+
+
+def _write_atomic(path: Path, text: str):
+    temp_path = path.with_suffix(path.suffix + ".tmp")
+    temp_path.write_text(text, encoding="utf-8")
+    os.replace(temp_path, path)
+
+
+class BatchRunner:
+    """Runs novel jobs through one pipeline on a bounded worker pool."""
+
+    def __init__(self, output_dir: str = NOVEL_FIX_BATCH_OUTPUT_DIR, workers: int = NOVEL_FIX_BATCH_WORKERS):
+        self.output_dir = Path(output_dir)
+        self.workers = max(1, workers)
+        self.session_service = InMemorySessionService()
+        self.runner = Runner(agent=create_root_agent(), app_name=APP_NAME, session_service=self.session_service)
+        self.stats = {"done": 0, "failed": 0, "skipped": 0, "in_flight": 0, "peak_in_flight": 0}
+        self._results_lock = asyncio.Lock()
+
+    async def _record(self, result: Dict[str, Any]):
+        """Appends a job result to results.jsonl and flushes it to disk."""
+        async with self._results_lock:
+            with open(self.output_dir / RESULTS_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    async def run_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs one job in its own session, streaming stage outputs to the job's directory."""
+        job_dir = self.output_dir / job["id"]
+        job_dir.mkdir(parents=True, exist_ok=True)
+        request = job_request(job["spec"])
+        result: Dict[str, Any] = {"id": job["id"], "request": request, "started_at": time.time()}
+        started = time.perf_counter()
+        stage_times: Dict[str, float] = {}
+        schedule = None
+
+        try:
+            if job["error"]:
+                raise ValueError(job["error"])
+            session_id = f"{job['id']}-{int(result['started_at'] * 1000)}"
+            await self.session_service.create_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+            message = types.Content(role="user", parts=[types.Part(text=request)])
+            async for event in self.runner.run_async(user_id=USER_ID, session_id=session_id, new_message=message):
+                state_delta = event.actions.state_delta if event.actions else {}
+                for key, value in state_delta.items():
+                    if key in STAGE_OUTPUT_KEYS and isinstance(value, str):
+                        _write_atomic(job_dir / f"{key}.md", value)
+                        stage_times[key] = round(time.perf_counter() - started, 3)
+                        print(f"--- Batch: {job['id']} wrote {key} ---")
+                    elif key == SCHEDULE_STATE_KEY:
+                        schedule = value
+            missing = [key for key in STAGE_OUTPUT_KEYS if key not in stage_times]
+            if missing:
+                raise RuntimeError(f"pipeline finished without {', '.join(missing)}")
+            result["status"] = "done"
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = f"{type(e).__name__}: {e}"
+            _write_atomic(job_dir / "error.txt", traceback.format_exc())
+            print(f"--- Batch: {job['id']} failed: {result['error']} ---")
+
+        result["wall_time_seconds"] = round(time.perf_counter() - started, 3)
+        result["stage_output_seconds"] = stage_times
+        if schedule is not None:
+            result["schedule"] = schedule
+        await self._record(result)
+        return result
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            job = await queue.get()
+            try:
+                self.stats["in_flight"] += 1
+                self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+                result = await self.run_job(job)
+                self.stats["done" if result["status"] == "done" else "failed"] += 1
+            finally:
+                self.stats["in_flight"] -= 1
+                queue.task_done()
+
+    async def run(self, jobs: List[Dict[str, Any]]) -> dict:
+        """Runs every job results.jsonl does not record as done; returns the batch stats."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        done = completed_job_ids(self.output_dir)
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            if job["id"] in done:
+                self.stats["skipped"] += 1
+            else:
+                queue.put_nowait(job)
+        print(f"--- Batch: {queue.qsize()} jobs to run, {self.stats['skipped']} already done, "
+              f"{self.workers} workers ---")
+
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.workers)]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return dict(self.stats)
+
+
+def configure_rate_budget(rpm: Optional[float], tpm: Optional[float], max_concurrency: Optional[int]):
+    """Sets one rate budget for the model calls of the whole batch, across every model the stages use."""
+    if rpm or tpm or max_concurrency:
+        ratelimit.set_process_rate_budget(rpm or 0, tpm or 0, max_concurrency or 0)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of novel jobs through the Novel Fix pipeline")
+    parser.add_argument("jobs", help="JSONL file with one novel spec per line")
+    parser.add_argument("--output-dir", default=NOVEL_FIX_BATCH_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=NOVEL_FIX_BATCH_WORKERS, help="jobs run at the same time")
+    parser.add_argument("--rpm", type=float, help="shared requests-per-minute budget for all models")
+    parser.add_argument("--tpm", type=float, help="shared tokens-per-minute budget for all models")
+    parser.add_argument("--max-llm-concurrency", type=int, help="model calls in flight across all jobs")
+    args = parser.parse_args(argv)
+
+    configure_rate_budget(args.rpm, args.tpm, args.max_llm_concurrency)
+    jobs = load_jobs(args.jobs)
+    stats = asyncio.run(BatchRunner(args.output_dir, args.workers).run(jobs))
+
+    print(f"\n📚 Batch: {stats}")
+    print(f"🚦 Rate limiter: {ratelimit.get_rate_limiter_stats()}")
+    print(f"📝 Results: {Path(args.output_dir) / RESULTS_FILE}")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
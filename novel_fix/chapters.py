@@ -0,0 +1,363 @@
+"""
+Per-chapter fan-out for the act stages of the Novel Fix pipeline.
+
+Instead of one model call writing a whole act (up to 30k words, which runs
+into output-token limits and is fully serial), every act expands into one
+generation task per chapter of the outline's chapter list. Up to N chapters
+are written concurrently, each conditioned on the beat summaries of its
+neighbouring chapters, and the chapters are reassembled in order into the
+act's output key (act_1_content, act_2_content, act_3_content). A chapter
+cut off by the output-token cap is continued rather than regenerated
+(novel_fix.continuation).
+
+Each chapter reads only its slices of the plan: the parameters, its own and
+its neighbours' beats, and the character entries named in those beats. With
+checkpointing on, every chapter is recorded with fingerprints of these
+slices, and a rerun after an edit regenerates only the chapters whose slices
+changed (novel_fix.checkpoint.ChapterRecords).
+"""
+
+import asyncio
+import os
+import re
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from common.llm import call_llm_with_finish_reason
+from common.models import model_for
+from common.telemetry import current_span, end_span, start_span, trace_id_for
+from novel_fix.checkpoint import ChapterRecords, chapter_records, fingerprint, request_text
+from novel_fix.continuation import complete_text
+
+# Load environment variables
+load_dotenv()
+
+# Chapters written at the same time per act - 可以通过环境变量配置
+NOVEL_FIX_CHAPTER_CONCURRENCY = int(os.getenv("NOVEL_FIX_CHAPTER_CONCURRENCY", "4"))
+MAX_BEAT_CHARS = 600
+
+ACT_FOCUS = {
+    1: ("Setup", """- Introduce protagonist and world
+- Establish the main conflict/problem
+- Hook the reader with engaging opening
+- Set up character relationships
+- End with inciting incident"""),
+    2: ("Development", """- Develop main conflict and obstacles
+- Character growth and relationship development
+- Rising action and complications
+- Midpoint crisis or revelation
+- Build toward climax"""),
+    3: ("Resolution", """- Climax and confrontation
+- Resolution of main conflict
+- Character arc completion
+- Tie up subplots and loose ends
+- Satisfying conclusion"""),
+}
+
+_ACT_HEADING = re.compile(r"^[\W_]*act\s+(\d|one|two|three|iii|ii|i)\b", re.IGNORECASE | re.MULTILINE)
+_CHAPTER_HEADING = re.compile(r"^[\W_]*chapter\s+(\d+)\b[\s:.)\-–—*]*(.*)$", re.IGNORECASE | re.MULTILINE)
+_TITLE_END = re.compile(r"\*\*|\s[-–—:]\s")
+_ACT_NUMBERS = {"1": 1, "2": 2, "3": 3, "i": 1, "ii": 2, "iii": 3, "one": 1, "two": 2, "three": 3}
+_LENGTH = re.compile(r"length\s*:\s*\**\s*(short|medium|long)", re.IGNORECASE)
+# A character entry starts at a markdown heading or a line-leading bold label ("1. **PROTAGONIST**:")
+_PROFILE_HEADING = re.compile(r"^[ \t]*(?:#{1,6}[ \t]+(.+)|(?:\d+[.)][ \t]*)?\*\*([^*\n]+\*\*[^\n]{0,40}))$",
+                              re.MULTILINE)
+_PROFILE_NAME_LINE = re.compile(r"\bname[^:\n]{0,12}:\**\s*([^\n,;(]+)", re.IGNORECASE)
+_NAME_WORD = re.compile(r"[^\W\d_][\w'-]*")
+_ROLE_WORDS = {"protagonist", "antagonist", "supporting", "character", "characters", "relationship",
+               "relationships", "profile", "profiles", "main", "key", "minor", "secondary", "the", "and",
+               "name", "age", "role", "dynamics"}
+
+
+def get_chapter_counts(target_length: str) -> dict:
+    """Returns chapter count breakdown for each act based on target length."""
+    chapter_counts = {
+        "short": {"act1": 4, "act2": 6, "act3": 4, "total": 14},
+        "medium": {"act1": 6, "act2": 8, "act3": 6, "total": 20},
+        "long": {"act1": 8, "act2": 10, "act3": 8, "total": 26}
+    }
+    return chapter_counts.get(target_length, chapter_counts["medium"])
+
+
+def target_length_from_parameters(extracted_parameters: str) -> str:
+    """Reads the target length from the parameter extractor's "Length: ..." line."""
+    match = _LENGTH.search(extracted_parameters or "")
+    return match.group(1).lower() if match else "medium"
+
+
+def _chapter_entries(text: str) -> List[Dict[str, str]]:
+    """Splits outline text into its chapter entries (title and beat summary)."""
+    headings = list(_CHAPTER_HEADING.finditer(text))
+    entries = []
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        # "Chapter 3: Title - beat" or "**Chapter 3: Title** beat" carry the beat on the heading line
+        title, *inline_beat = _TITLE_END.split(heading.group(2), 1)
+        beat = " ".join(f"{' '.join(inline_beat)} {text[heading.end():end]}".split()).strip(" -–—*")
+        title = title.strip(" *#_\"'")
+        entries.append({"title": title, "beat": beat[:MAX_BEAT_CHARS] or title})
+    return entries
+
+
+def parse_outline_chapters(outline: str) -> Dict[int, List[Dict[str, str]]]:
+    """Returns the outline's chapter entries per act (act 0 when the outline has no act sections)."""
+    headings = list(_ACT_HEADING.finditer(outline or ""))
+    if not headings:
+        return {0: _chapter_entries(outline or "")}
+    acts: Dict[int, List[Dict[str, str]]] = {}
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(outline)
+        act = _ACT_NUMBERS[heading.group(1).lower()]
+        acts.setdefault(act, []).extend(_chapter_entries(outline[heading.end():end]))
+    return acts
+
+
+def plan_chapters(outline: str, target_length: str) -> List[Dict]:
+    """Plans every chapter of the novel from the outline's chapter list.
+
+    Acts the outline has no chapter list for get the default chapter count
+    for the target length, with the act's focus as their beat.
+    """
+    counts = get_chapter_counts(target_length)
+    parsed = parse_outline_chapters(outline)
+    unsectioned = parsed.get(0, [])
+
+    plan = []
+    for act in (1, 2, 3):
+        entries = parsed.get(act)
+        if not entries and unsectioned:
+            entries, unsectioned = unsectioned[:counts[f"act{act}"]], unsectioned[counts[f"act{act}"]:]
+        if not entries:
+            focus = ACT_FOCUS[act][0]
+            entries = [{"title": "", "beat": f"{focus}: chapter {k} of {counts[f'act{act}']} in Act {act}"}
+                       for k in range(1, counts[f"act{act}"] + 1)]
+        for k, entry in enumerate(entries, 1):
+            plan.append({"number": len(plan) + 1, "act": act, "act_chapter": k,
+                         "act_chapters": len(entries), **entry})
+    return plan
+
+
+def _name_words(text: str) -> List[str]:
+    return [word for word in _NAME_WORD.findall(text)
+            if word.lower() not in _ROLE_WORDS and len(word) > 2 and (word[0].isupper() or not word.isascii())]
+
+
+def character_entries(profiles: str) -> List[Dict[str, Any]]:
+    """Splits the character profiles into entries: label, the names to look for, text, and whether it is a lead.
+
+    Text before the first heading, and entries without a name (e.g. "Character Relationships"), are shared by
+    every chapter; profiles without headings are one shared entry.
+    """
+    headings = list(_PROFILE_HEADING.finditer(profiles or ""))
+    entries = []
+    if not headings or profiles[:headings[0].start()].strip():
+        preamble = profiles[:headings[0].start()] if headings else profiles or ""
+        entries.append({"label": "shared", "names": [], "text": preamble.strip(), "lead": False})
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(profiles)
+        title = (heading.group(1) or heading.group(2)).replace("**", " ").strip(" *#:")
+        text = profiles[heading.start():end].strip()
+        names = _name_words(title)
+        if not names:
+            name_line = _PROFILE_NAME_LINE.search(text)
+            names = _name_words(name_line.group(1)) if name_line else []
+        label = " ".join(names) or title
+        labels = [entry["label"] for entry in entries]
+        if label in labels:
+            label = f"{label} ({labels.count(label) + 1})"
+        entries.append({"label": label, "names": names, "text": text, "lead": "protagonist" in title.lower()})
+    return [entry for entry in entries if entry["text"]]
+
+
+def select_characters(entries: List[Dict[str, Any]], *texts: str) -> List[Dict[str, Any]]:
+    """Picks the entries named in the texts, the protagonist and the shared entries."""
+    haystack = " ".join(texts)
+    return [entry for entry in entries
+            if entry["lead"] or not entry["names"]
+            or any(re.search(rf"(?<!\w){re.escape(name)}(?!\w)", haystack) for name in entry["names"])]
+
+
+def characters_text(profiles: str, entries: List[Dict[str, Any]], selected: List[Dict[str, Any]]) -> str:
+    """Returns the character profiles a chapter reads: all of them, or only its selected entries."""
+    if len(selected) == len(entries):
+        return profiles
+    return "\n\n".join(entry["text"] for entry in selected)
+
+
+def neighbour_beats(plan: List[Dict], index: int) -> Tuple[str, str]:
+    """Returns the beats of the chapters before and after a chapter."""
+    previous_beat = plan[index - 1]["beat"] if index > 0 else "(this is the first chapter of the novel)"
+    next_beat = plan[index + 1]["beat"] if index + 1 < len(plan) else "(this is the last chapter of the novel)"
+    return previous_beat, next_beat
+
+
+def chapter_dependencies(plan: List[Dict], index: int, parameters: str, characters: List[Dict[str, Any]],
+                         continuity: str = "") -> Dict[str, str]:
+    """Fingerprints the context slices a chapter is written from: parameters, beats, character entries, digest."""
+    chapter = plan[index]
+    beats = [chapter["act"], chapter["act_chapter"], chapter["act_chapters"], chapter["title"], chapter["beat"],
+             *neighbour_beats(plan, index)]
+    dependencies = {"parameters": fingerprint(parameters), "outline": fingerprint(beats)}
+    for entry in characters:
+        dependencies[f"character:{entry['label']}"] = fingerprint(entry["text"])
+    if continuity:
+        dependencies["continuity"] = fingerprint(continuity)
+    return dependencies
+
+
+def build_chapter_prompt(plan: List[Dict], index: int, parameters: str, characters: str,
+                         continuity: str = "") -> str:
+    """Builds the prompt for one chapter, conditioned on the beats of its neighbours and the story so far."""
+    chapter = plan[index]
+    focus_name, focus = ACT_FOCUS[chapter["act"]]
+    title = f' "{chapter["title"]}"' if chapter["title"] else ""
+    previous_beat, next_beat = neighbour_beats(plan, index)
+    story_so_far = f"\nSTORY SO FAR (continuity digest of the previous acts):\n{continuity}\n" if continuity else ""
+
+    return f"""You are writing Chapter {chapter['number']}{title} of a novel - chapter {chapter['act_chapter']} of {chapter['act_chapters']} in Act {chapter['act']} ({focus_name}).
+
+NOVEL PARAMETERS:
+{parameters}
+
+CHARACTERS:
+{characters}
+
+ACT {chapter['act']} FOCUS:
+{focus}
+{story_so_far}
+PREVIOUS CHAPTER (beat summary): {previous_beat}
+THIS CHAPTER (beat summary): {chapter['beat']}
+NEXT CHAPTER (beat summary): {next_beat}
+
+Write only this chapter:
+- Start with the chapter title
+- Full chapter content (2000-3000 words)
+- Pick up where the previous chapter's beat ends and lead into the next chapter's beat
+- Stay consistent with the story so far: character states, open threads and style
+- Consistent character voice and style"""
+
+
+def assemble_act(chapters: List[Dict], texts: List[str]) -> str:
+    """Joins the chapters of an act in order."""
+    return "\n\n".join(f"## Chapter {chapter['number']}\n\n{text.strip()}" for chapter, text in zip(chapters, texts))
+
+
+class ChapterFanOutAgent(BaseAgent):
+    """Writes an act chapter by chapter, up to max_concurrency chapters at a time."""
+
+    act: int
+    output_key: str
+    max_concurrency: int = NOVEL_FIX_CHAPTER_CONCURRENCY
+    # State key of the continuity digest of the previous acts, if any
+    continuity_key: Optional[str] = None
+
+    async def write_act(self, state: Dict, on_chapter: Optional[Callable[[Dict, str], Any]] = None,
+                        records: Optional[ChapterRecords] = None) -> str:
+        """Plans the novel from the outline and writes this act's chapters concurrently.
+
+        on_chapter(chapter, text) is called as each chapter is finished, in completion order.
+        Chapters recorded in records whose context is unchanged are reused instead of written.
+        """
+        parameters = state.get("extracted_parameters", "")
+        plan = plan_chapters(state.get("novel_outline", ""), target_length_from_parameters(parameters))
+        indexes = [i for i, chapter in enumerate(plan) if chapter["act"] == self.act]
+        profiles = state.get("character_profiles", "")
+        entries = character_entries(profiles)
+        continuity = state.get(self.continuity_key, "") if self.continuity_key else ""
+        print(f"--- Act {self.act}: writing {len(indexes)} chapters, up to {self.max_concurrency} at a time ---")
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        model_name = model_for(self.name)
+
+        async def generate(prompt: str) -> tuple:
+            return await call_llm_with_finish_reason(prompt, model_name=model_name)
+
+        async def write_chapter(index: int) -> str:
+            number = plan[index]["number"]
+            characters = select_characters(entries, plan[index]["title"], plan[index]["beat"],
+                                           *neighbour_beats(plan, index))
+            dependencies = chapter_dependencies(plan, index, parameters, characters, continuity)
+            text = await records.reuse(number, dependencies) if records is not None else None
+            if text is not None:
+                print(f"--- Act {self.act}: chapter {number} unchanged, reused ---")
+            else:
+                async with semaphore:
+                    prompt = build_chapter_prompt(plan, index, parameters,
+                                                  characters_text(profiles, entries, characters), continuity)
+                    # A chapter cut off by the output-token cap is continued from its tail, not regenerated
+                    text = await complete_text(prompt, generate, label=f"chapter {number}",
+                                               context=prompt.split("\n", 1)[0])
+                if text.startswith("[LLM Error"):
+                    # Fail the stage rather than stitch the error into the act (or checkpoint it)
+                    raise RuntimeError(f"Act {self.act}: chapter {number} failed: {text}")
+                print(f"--- Act {self.act}: chapter {number} written ({len(text.split())} words) ---")
+                if records is not None:
+                    await records.save(number, dependencies, text)
+            if on_chapter is not None:
+                on_chapter(plan[index], text)
+            return text
+
+        tasks = [asyncio.ensure_future(write_chapter(i)) for i in indexes]
+        try:
+            texts = await asyncio.gather(*tasks)
+        except BaseException:
+            # One failed chapter fails the act; stop writing the others
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return assemble_act([plan[i] for i in indexes], texts)
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        span = start_span("agent", self.name, trace_id=trace_id_for(ctx.invocation_id), agent=self.name)
+        finished: asyncio.Queue = asyncio.Queue()
+
+        async def write() -> str:
+            try:
+                return await self.write_act(ctx.session.state,
+                                            lambda chapter, text: finished.put_nowait((chapter, text)),
+                                            chapter_records(request_text(ctx.user_content)))
+            finally:
+                finished.put_nowait(None)
+
+        # The chapter calls run in their own task, nested under this agent's span
+        token = current_span.set(span)
+        task = asyncio.create_task(write())
+        current_span.reset(token)
+        error = None
+        try:
+            # Each chapter is streamed as a partial event as soon as it is written;
+            # partial events are not added to the session history
+            while (item := await finished.get()) is not None:
+                chapter, text = item
+                yield Event(
+                    invocation_id=ctx.invocation_id,
+                    author=self.name,
+                    branch=ctx.branch,
+                    partial=True,
+                    content=types.Content(role="model", parts=[types.Part(
+                        text=assemble_act([chapter], [text]))]),
+                    custom_metadata={"act": self.act, "chapter": chapter["number"], "title": chapter["title"]},
+                )
+            act_text = await task
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            end_span(span, error)
+
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=act_text)]),
+            actions=EventActions(state_delta={self.output_key: act_text}),
+        )
@@ -0,0 +1,286 @@
+"""
+Checkpoint and resume for the Novel Fix pipeline stages.
+
+Every stage's output_key result (extracted_parameters, novel_outline,
+character_profiles, act_N_content) is written to a checkpoint file as soon as
+the stage completes. Checkpoints are keyed on a hash of the user's request, so
+a rerun of the same request - e.g. after act_3_writer failed - restores the
+stages that already have a valid output instead of generating them again.
+Enable with NOVEL_FIX_CHECKPOINT=true.
+
+Derived stages (the act writers and continuity keepers) also record a
+fingerprint of every state key they read, and are only restored while those
+inputs are unchanged. Every chapter is recorded, in a file of its own, with
+fingerprints of the context slices it was written from (ChapterRecords), so
+after an edit of the outline or the character profiles (novel_fix.rebuild) an
+act writer that has to run again regenerates only the chapters whose slices
+changed. Stages and chapters are read and written on worker threads, off the
+event loop the chapter fan-outs run on.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+# Load environment variables
+load_dotenv()
+
+# Checkpoint configuration - 可以通过环境变量配置
+NOVEL_FIX_CHECKPOINT = os.getenv("NOVEL_FIX_CHECKPOINT", "false").lower() == "true"
+NOVEL_FIX_CHECKPOINT_DIR = os.getenv("NOVEL_FIX_CHECKPOINT_DIR", ".novel_fix_checkpoints")
+# Regenerate recorded chapters when the continuity digest they read changed - 可以通过环境变量配置
+NOVEL_FIX_STRICT_CONTINUITY = os.getenv("NOVEL_FIX_STRICT_CONTINUITY", "false").lower() == "true"
+
+# Bump when stage prompts change so old checkpoints are not reused
+CHECKPOINT_VERSION = 2
+
+# Outputs containing this were produced by a failed model call
+_ERROR_MARKER = "[LLM Error"
+
+checkpoint_stats = {"restored": 0, "saved": 0, "invalid": 0, "stale": 0,
+                    "chapters_reused": 0, "chapters_invalidated": 0}
+
+# Stage saves read, update and replace one file per request; concurrent stages take turns
+_stage_file_lock = threading.Lock()
+
+
+def input_hash(request: str) -> str:
+    """Returns the checkpoint key of a pipeline input: the whitespace-normalized request."""
+    payload = json.dumps({"version": CHECKPOINT_VERSION, "input": " ".join(request.split())}, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def fingerprint(value: Any) -> str:
+    """Returns a short content hash of a context slice, ignoring whitespace differences."""
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def input_fingerprints(state: Dict[str, Any], reads: Sequence[str]) -> Dict[str, str]:
+    """Fingerprints the state keys a stage reads."""
+    return {key: fingerprint(state.get(key) or "") for key in reads}
+
+
+def changed_dependencies(recorded: Dict[str, str], current: Dict[str, str]) -> List[str]:
+    """Names the context slices that differ between a chapter's record and its current context.
+
+    The continuity digest only counts with NOVEL_FIX_STRICT_CONTINUITY: a digest is
+    rewritten whenever an earlier chapter changes, which would invalidate every later act.
+    """
+    names = sorted(set(recorded) | set(current))
+    return [name for name in names
+            if recorded.get(name) != current.get(name) and (name != "continuity" or NOVEL_FIX_STRICT_CONTINUITY)]
+
+
+def is_valid_output(value: Any) -> bool:
+    """True when a stage output is complete enough to resume from."""
+    return isinstance(value, str) and bool(value.strip()) and _ERROR_MARKER not in value
+
+
+class CheckpointStore:
+    """Stage outputs of pipeline runs, one JSON file per input hash, and its chapters one file each."""
+
+    def __init__(self, checkpoint_dir: str):
+        self.checkpoint_dir = Path(checkpoint_dir)
+
+    def _path(self, key: str) -> Path:
+        return self.checkpoint_dir / f"{key}.json"
+
+    def _chapters_dir(self, key: str) -> Path:
+        return self.checkpoint_dir / f"{key}.chapters"
+
+    def load(self, key: str) -> Dict[str, Any]:
+        """Returns the checkpoint of an input, or an empty one."""
+        try:
+            return json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"stages": {}}
+
+    def get(self, key: str, output_key: str, inputs: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Returns a stage's saved output if it is valid and, when inputs are given, was made from them."""
+        stage = self.load(key)["stages"].get(output_key)
+        if stage is None:
+            return None
+        if not is_valid_output(stage.get("value")):
+            checkpoint_stats["invalid"] += 1
+            return None
+        if inputs is not None and stage.get("inputs") != inputs:
+            checkpoint_stats["stale"] += 1
+            return None
+        return stage["value"]
+
+    def save(self, key: str, output_key: str, agent_name: str, value: str, request: str = "",
+             inputs: Optional[Dict[str, str]] = None):
+        """Adds a stage's output to the input's checkpoint; the file is replaced atomically."""
+        with _stage_file_lock:
+            checkpoint = self.load(key)
+            checkpoint["input"] = request or checkpoint.get("input", "")
+            checkpoint["stages"][output_key] = {"agent": agent_name, "value": value, "saved_at": time.time()}
+            if inputs is not None:
+                checkpoint["stages"][output_key]["inputs"] = inputs
+            self._write(self._path(key), checkpoint)
+
+    def edit(self, key: str, output_key: str, value: str, request: str = ""):
+        """Replaces a stage's output with an edited one, which later runs of the request restore."""
+        with _stage_file_lock:
+            checkpoint = self.load(key)
+            checkpoint["input"] = request or checkpoint.get("input", "")
+            stage = checkpoint["stages"].setdefault(output_key, {"agent": "edit"})
+            stage.update(value=value, edited_at=time.time())
+            self._write(self._path(key), checkpoint)
+
+    def get_chapter(self, key: str, number: int) -> Optional[Dict[str, Any]]:
+        """Returns the record of a written chapter: its text and the fingerprints of its context."""
+        try:
+            return json.loads((self._chapters_dir(key) / f"{number}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def load_chapters(self, key: str) -> Dict[int, Dict[str, Any]]:
+        """Returns the records of every chapter written for an input, by chapter number."""
+        paths = self._chapters_dir(key).glob("*.json") if self._chapters_dir(key).is_dir() else []
+        records = {int(path.stem): self.get_chapter(key, int(path.stem)) for path in paths if path.stem.isdigit()}
+        return {number: record for number, record in sorted(records.items()) if record is not None}
+
+    def save_chapter(self, key: str, number: int, text: str, dependencies: Dict[str, str]):
+        """Records a written chapter with the fingerprints of the context slices it was written from.
+
+        Each chapter has a file of its own, so a save writes one chapter, not the whole act.
+        """
+        self._write(self._chapters_dir(key) / f"{number}.json",
+                    {"text": text, "dependencies": dependencies, "saved_at": time.time()})
+
+    def _write(self, path: Path, data: Dict[str, Any]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        temp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp_path, path)
+
+    def clear(self, key: str):
+        """Deletes the checkpoint of an input and its chapters."""
+        self._path(key).unlink(missing_ok=True)
+        shutil.rmtree(self._chapters_dir(key), ignore_errors=True)
+
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    """Returns the checkpoint store, or None when checkpointing is disabled."""
+    return CheckpointStore(NOVEL_FIX_CHECKPOINT_DIR) if NOVEL_FIX_CHECKPOINT else None
+
+
+class ChapterRecords:
+    """The chapters written for one request, reused while the context they were written from is unchanged."""
+
+    def __init__(self, store: CheckpointStore, key: str):
+        self.store = store
+        self.key = key
+
+    async def reuse(self, number: int, dependencies: Dict[str, str]) -> Optional[str]:
+        """Returns a recorded chapter if none of its context slices changed."""
+        record = await asyncio.to_thread(self.store.get_chapter, self.key, number)
+        if record is None or not is_valid_output(record.get("text")):
+            return None
+        changed = changed_dependencies(record.get("dependencies", {}), dependencies)
+        if changed:
+            checkpoint_stats["chapters_invalidated"] += 1
+            print(f"--- Rebuild: chapter {number} changed ({', '.join(changed)}), regenerating ---")
+            return None
+        checkpoint_stats["chapters_reused"] += 1
+        return record["text"]
+
+    async def save(self, number: int, dependencies: Dict[str, str], text: str):
+        """Records a chapter that was just written, on a worker thread."""
+        if is_valid_output(text):
+            await asyncio.to_thread(self.store.save_chapter, self.key, number, text, dependencies)
+
+
+def chapter_records(request: str) -> Optional[ChapterRecords]:
+    """Returns the chapter records of a request, or None when checkpointing is disabled."""
+    store = get_checkpoint_store()
+    return ChapterRecords(store, input_hash(request)) if store is not None and request else None
+
+
+def request_text(content: Optional[types.Content]) -> str:
+    """Returns the text of the user's request."""
+    if not content or not content.parts:
+        return ""
+    return " ".join(part.text for part in content.parts if part.text)
+
+
+def _output_key(callback_context: CallbackContext) -> Optional[str]:
+    return getattr(callback_context.get_invocation_context().agent, "output_key", None)
+
+
+async def restore_stage(callback_context: CallbackContext,
+                        reads: Optional[Sequence[str]] = None) -> Optional[types.Content]:
+    """Skips a stage whose output is checkpointed for this request, restoring the output into state.
+
+    A stage with reads is only restored if those state keys are unchanged since it was saved.
+    """
+    store = get_checkpoint_store()
+    output_key = _output_key(callback_context)
+    request = request_text(callback_context.user_content)
+    if store is None or not output_key or not request:
+        return None
+
+    inputs = input_fingerprints(callback_context.state.to_dict(), reads) if reads is not None else None
+    value = await asyncio.to_thread(store.get, input_hash(request), output_key, inputs)
+    if value is None:
+        return None
+    callback_context.state[output_key] = value
+    checkpoint_stats["restored"] += 1
+    print(f"--- Checkpoint: restored {output_key} for {callback_context.agent_name} ---")
+    return types.Content(role="model", parts=[types.Part(text=value)])
+
+
+async def save_stage(callback_context: CallbackContext, reads: Optional[Sequence[str]] = None) -> None:
+    """Checkpoints the output a stage just wrote, with the fingerprints of its reads if it has any."""
+    store = get_checkpoint_store()
+    output_key = _output_key(callback_context)
+    request = request_text(callback_context.user_content)
+    if store is None or not output_key or not request:
+        return None
+
+    value = callback_context.state.get(output_key)
+    if not is_valid_output(value):
+        return None
+    inputs = input_fingerprints(callback_context.state.to_dict(), reads) if reads is not None else None
+    await asyncio.to_thread(store.save, input_hash(request), output_key, callback_context.agent_name, value,
+                            request, inputs)
+    checkpoint_stats["saved"] += 1
+    print(f"--- Checkpoint: saved {output_key} ---")
+    return None
+
+
+def checkpointed(callbacks: Dict[str, Any], reads: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Adds checkpointing to an agent's callback keyword arguments.
+
+    The restore runs before every other before_agent_callback, so a restored
+    stage starts no agent span; the save runs after the others. Derived stages
+    pass the state keys they read, so an edit upstream makes them run again.
+    """
+    def as_list(callback):
+        return callback if isinstance(callback, list) else ([callback] if callback else [])
+
+    restore, save = restore_stage, save_stage
+    if reads is not None:
+        restore = functools.partial(restore_stage, reads=tuple(reads))
+        save = functools.partial(save_stage, reads=tuple(reads))
+    callbacks = dict(callbacks)
+    callbacks["before_agent_callback"] = [restore] + as_list(callbacks.get("before_agent_callback"))
+    callbacks["after_agent_callback"] = as_list(callbacks.get("after_agent_callback")) + [save]
+    return callbacks
+
+
+def get_checkpoint_stats() -> dict:
+    return dict(checkpoint_stats)
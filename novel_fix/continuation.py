@@ -0,0 +1,115 @@
+"""
+Truncation detection and continuation for the chapter generations of Novel Fix.
+
+A chapter that runs into the model's output-token cap stops mid-sentence and
+used to be stored as is; the only recovery was to rerun the whole act stage.
+Here a cut-off answer is detected - from a MAX_TOKENS finish reason, or, when
+the provider reports none, from text that stops mid-sentence - and the model
+is asked to continue from the last few hundred words only. The parts are
+stitched back together, dropping any text the continuation repeats.
+"""
+
+import os
+import re
+from typing import Awaitable, Callable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Continuation requests per generation - 可以通过环境变量配置
+NOVEL_FIX_MAX_CONTINUATIONS = int(os.getenv("NOVEL_FIX_MAX_CONTINUATIONS", "3"))
+# Characters of the cut-off text sent back with a continuation request
+CONTINUATION_TAIL_CHARS = 1200
+# Shortest repeated text removed when stitching, so a shared word or two is kept
+MIN_OVERLAP_CHARS = 20
+
+TRUNCATED_FINISH_REASONS = {"MAX_TOKENS", "LENGTH"}
+_SENTENCE_END = re.compile(r"""[.!?…。！？」』"'”’)\]*_~`]\s*$""")
+_JOINED_START = re.compile(r"""^[\s.,;:!?…。，；：！？"'”’)\]]""")
+
+continuation_stats = {"truncated": 0, "continuations": 0, "unresolved": 0}
+
+Generate = Callable[[str], Awaitable[Tuple[str, Optional[str]]]]
+
+
+def is_truncated(text: str, finish_reason: Optional[str]) -> bool:
+    """True when a generation was cut off: by the output-token cap, or mid-sentence without a finish reason."""
+    if not text.strip() or text.startswith("[LLM Error"):
+        return False
+    if finish_reason:
+        return finish_reason.upper() in TRUNCATED_FINISH_REASONS
+    return not _SENTENCE_END.search(text)
+
+
+def text_tail(text: str, max_chars: int = CONTINUATION_TAIL_CHARS) -> str:
+    """Returns the end of a text, at most max_chars long and starting on a word boundary."""
+    if len(text) <= max_chars:
+        return text
+    tail = text[-max_chars:]
+    space = tail.find(" ")
+    return tail[space + 1:] if 0 <= space < max_chars // 4 else tail
+
+
+def build_continuation_prompt(tail: str, context: str = "") -> str:
+    """Builds the prompt that asks the model to carry on from the tail of a cut-off text."""
+    task = f"{context.strip()}\n\n" if context.strip() else ""
+    return f"""{task}Your previous answer was cut off. It ends with:
+
+<<<
+{tail}
+>>>
+
+Continue exactly where the text stops, mid-sentence if needed, and write until the piece is complete.
+- Do not repeat any of the text above
+- Do not restart, add a title or comment on the continuation"""
+
+
+def stitch(text: str, continuation: str) -> str:
+    """Appends a continuation to a cut-off text, dropping the start of it that repeats the text's end."""
+    continuation = continuation.lstrip("\n")
+    longest = min(len(continuation), len(text), CONTINUATION_TAIL_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if text.endswith(continuation[:size]):
+            continuation = continuation[size:]
+            break
+    if not continuation:
+        return text
+    if text[-1:].isspace() or _JOINED_START.match(continuation):
+        return text + continuation
+    return f"{text} {continuation}"
+
+
+async def complete_text(prompt: str, generate: Generate, label: str = "generation", context: str = "",
+                        max_continuations: Optional[int] = None) -> str:
+    """Generates the answer to a prompt and continues it while it is cut off, up to max_continuations times.
+
+    generate(prompt) returns (text, finish_reason), like common.llm.call_llm_with_finish_reason.
+    """
+    if max_continuations is None:
+        max_continuations = NOVEL_FIX_MAX_CONTINUATIONS
+    text, finish_reason = await generate(prompt)
+    if not is_truncated(text, finish_reason):
+        return text
+
+    continuation_stats["truncated"] += 1
+    for attempt in range(1, max_continuations + 1):
+        print(f"--- Continuation: {label} cut off at {len(text.split())} words "
+              f"({finish_reason or 'mid-sentence'}), continuing ({attempt}/{max_continuations}) ---")
+        continuation, finish_reason = await generate(build_continuation_prompt(text_tail(text), context))
+        if not continuation.strip() or continuation.startswith("[LLM Error"):
+            break
+        continuation_stats["continuations"] += 1
+        text = stitch(text, continuation)
+        if not is_truncated(text, finish_reason):
+            return text
+
+    continuation_stats["unresolved"] += 1
+    print(f"--- Continuation: {label} is still cut off, keeping {len(text.split())} words ---")
+    return text
+
+
+def get_continuation_stats() -> dict:
+    """Returns how many generations were cut off and how many continuation requests they took."""
+    return dict(continuation_stats)
@@ -0,0 +1,102 @@
+"""
+Rolling continuity memory for the Novel Fix act writers.
+
+After an act is written, a continuity stage condenses it - together with the
+digest of the acts before it - into a compact structured digest: plot state,
+character states, open threads and style notes. The chapters of the next act
+are conditioned on that digest instead of the raw prose of the earlier acts,
+so their prompts stay the same size however long the novel gets.
+"""
+
+from typing import AsyncGenerator, Dict, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from common.llm import call_llm_async
+from common.models import model_for
+from common.telemetry import current_span, end_span, start_span, trace_id_for
+
+# Upper bound of a digest, in characters
+MAX_DIGEST_CHARS = 3000
+
+DIGEST_SECTIONS = ["PLOT STATE", "CHARACTER STATES", "OPEN THREADS", "STYLE NOTES"]
+
+
+def continuity_key(act: int) -> str:
+    """State key of the digest of the story up to the end of an act."""
+    return f"continuity_act_{act}"
+
+
+def build_digest_prompt(act: int, act_text: str, previous_digest: str = "") -> str:
+    """Builds the prompt that rolls an act into the continuity digest."""
+    sections = "\n".join(f"## {section}" for section in DIGEST_SECTIONS)
+    previous = previous_digest or "(none - this is the first act)"
+    return f"""You are the Continuity Keeper for a novel. Update the continuity digest with Act {act}.
+
+CONTINUITY DIGEST SO FAR:
+{previous}
+
+ACT {act} TEXT:
+{act_text}
+
+Write the updated digest of the whole story up to the end of Act {act}, using exactly these sections:
+{sections}
+
+- PLOT STATE: what has happened and where the story stands now
+- CHARACTER STATES: for each important character - location, goals, relationships, what they know
+- OPEN THREADS: unresolved questions, promises and foreshadowing the next acts must pay off
+- STYLE NOTES: point of view, tense, tone, recurring motifs and voice
+
+Be concise - at most {MAX_DIGEST_CHARS // 6} words. Keep facts from the earlier digest that still matter."""
+
+
+def clip_digest(digest: str) -> str:
+    """Keeps a digest within MAX_DIGEST_CHARS, cutting at a line break where possible."""
+    digest = digest.strip()
+    if len(digest) <= MAX_DIGEST_CHARS:
+        return digest
+    cut = digest[:MAX_DIGEST_CHARS]
+    line_end = cut.rfind("\n")
+    return (cut[:line_end] if line_end > MAX_DIGEST_CHARS // 2 else cut).rstrip() + "\n..."
+
+
+class ContinuityAgent(BaseAgent):
+    """Rolls an act and the digest of the acts before it into a new continuity digest."""
+
+    act: int
+    output_key: str
+    previous_key: Optional[str] = None
+
+    async def write_digest(self, state: Dict) -> str:
+        """Condenses this act and the previous digest into the digest of the story so far."""
+        act_text = state.get(f"act_{self.act}_content", "")
+        previous_digest = state.get(self.previous_key, "") if self.previous_key else ""
+        print(f"--- Continuity: digesting Act {self.act} ({len(act_text.split())} words) ---")
+        prompt = build_digest_prompt(self.act, act_text, previous_digest)
+        digest = await call_llm_async(prompt, model_name=model_for(self.name))
+        if digest.startswith("[LLM Error"):
+            # Fail the stage rather than hand the error to the next act as the story so far
+            raise RuntimeError(f"Continuity digest of Act {self.act} failed: {digest}")
+        digest = clip_digest(digest)
+        print(f"--- Continuity: digest after Act {self.act} is {len(digest.split())} words ---")
+        return digest
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        span = start_span("agent", self.name, trace_id=trace_id_for(ctx.invocation_id), agent=self.name)
+        token = current_span.set(span)
+        try:
+            digest = await self.write_digest(ctx.session.state)
+        finally:
+            current_span.reset(token)
+            end_span(span)
+
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=digest)]),
+            actions=EventActions(state_delta={self.output_key: digest}),
+        )
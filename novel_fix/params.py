@@ -0,0 +1,151 @@
+"""
+Local fast path for the parameter_extractor stage of the Novel Fix pipeline.
+
+Genre, length and theme are read from the request with one precompiled
+pattern in a single pass over the lowercased text, in English and in the
+Chinese phrasing users type ("写一部关于友谊的短篇奇幻小说"). When the match is
+confident the stage answers with the same "Genre: / Theme: / Length:" text
+the model would have written, without calling the model; otherwise the
+request goes to the LLM as before.
+"""
+
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+# Load environment variables
+load_dotenv()
+
+NOVEL_FIX_FAST_PARAMS = os.getenv("NOVEL_FIX_FAST_PARAMS", "true").lower() == "true"
+
+DEFAULT_PARAMS = {"genre": "fantasy", "theme": "adventure and discovery", "target_length": "medium"}
+
+# Phrase -> canonical value
+GENRES = {
+    "fantasy": "fantasy", "science fiction": "science fiction", "sci-fi": "science fiction",
+    "scifi": "science fiction", "mystery": "mystery", "detective": "mystery", "romance": "romance",
+    "love story": "romance", "thriller": "thriller", "horror": "horror", "historical": "historical",
+    "adventure": "adventure", "drama": "drama",
+    "奇幻": "fantasy", "玄幻": "fantasy", "魔幻": "fantasy", "科幻": "science fiction",
+    "悬疑": "mystery", "推理": "mystery", "侦探": "mystery", "爱情": "romance", "言情": "romance",
+    "惊悚": "thriller", "恐怖": "horror", "历史": "historical", "冒险": "adventure", "剧情": "drama",
+}
+LENGTHS = {
+    "short": "short", "novella": "short", "medium": "medium", "long": "long", "epic": "long",
+    "短篇": "short", "中篇": "medium", "长篇": "long",
+}
+
+_THEME_STOP = r"[^,.!?;\n，。！？；]"
+
+
+def _alternation(phrases) -> str:
+    # Longest first so "science fiction" wins over shorter overlapping phrases
+    return "|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+
+
+def _word_bounded(phrases) -> str:
+    """English phrases match whole words only; Chinese phrases match anywhere."""
+    english = [phrase for phrase in phrases if phrase.isascii()]
+    chinese = [phrase for phrase in phrases if not phrase.isascii()]
+    return rf"\b(?:{_alternation(english)})\b|{_alternation(chinese)}"
+
+
+# One pattern, one pass: every match is a theme, a genre or a length. Themes stop before
+# a trailing length ("about space exploration with medium length") so the pass still sees it.
+_MATCHER = re.compile(
+    rf"(?P<theme>(?:\babout\b|\btheme\s*[:\-])\s*"
+    rf"(?P<theme_text>{_THEME_STOP}+?)(?=\s+(?:with|in|at|of)\s+(?:a\s+)?(?:short|medium|long)\b|[,.!?;\n]|$)"
+    rf"|主题[是为:：]?\s*(?P<theme_topic>{_THEME_STOP}+)"
+    rf"|(?:关于|讲述|讲一个)\s*(?P<theme_zh>{_THEME_STOP}+?)(?=的|[,.!?;\n，。！？；]|$))"
+    rf"|(?P<genre>{_word_bounded(GENRES)})"
+    rf"|(?P<length>{_word_bounded(LENGTHS)})"
+)
+_GENRE_ONLY = re.compile(_word_bounded(GENRES))
+_THEME_GROUPS = ("theme_text", "theme_topic", "theme_zh")
+# Genres that usually qualify another one ("a fantasy adventure", "a historical drama")
+QUALIFIER_GENRES = {"adventure", "drama"}
+
+
+class ParamMatch(NamedTuple):
+    params: Dict[str, str]
+    confident: bool
+    missing: List[str]
+
+
+def match_params(user_input: str) -> ParamMatch:
+    """Matches genre, length and theme in one pass; defaults fill whatever was not found."""
+    text = user_input.lower()
+    # Themes keep their original case; lower() only rarely changes the length of a string
+    original = user_input if len(user_input) == len(text) else text
+    genres, lengths, themes = [], [], []
+    for match in _MATCHER.finditer(text):
+        kind = match.lastgroup
+        if kind == "genre":
+            genres.append(GENRES[match.group(kind)])
+        elif kind == "length":
+            lengths.append(LENGTHS[match.group(kind)])
+        else:
+            group = next(name for name in _THEME_GROUPS if match.start(name) >= 0)
+            theme = original[match.start(group):match.end(group)].strip()
+            if len(theme) >= 3 or (theme and not theme.isascii()):
+                themes.append(theme)
+
+    if not genres and themes:
+        # "about a haunted mystery house" - the genre is inside the theme
+        genres = [GENRES[genre] for genre in _GENRE_ONLY.findall(themes[0].lower())]
+    main_genres = [genre for genre in genres if genre not in QUALIFIER_GENRES]
+    genres = main_genres or genres
+
+    params = dict(DEFAULT_PARAMS)
+    missing = []
+    for key, found in (("genre", genres), ("target_length", lengths), ("theme", themes)):
+        if found:
+            params[key] = found[0]
+        else:
+            missing.append(key)
+
+    # Genre and theme must be stated and unambiguous - the model is better at inferring them.
+    # A missing length defaults to medium just like the model's instructions say.
+    conflicting = len(set(genres)) > 1 or len(set(lengths)) > 1
+    confident = not conflicting and not {"genre", "theme"} & set(missing)
+    return ParamMatch(params, confident, missing)
+
+
+def format_params(params: Dict[str, str]) -> str:
+    """Renders parameters in the parameter_extractor's output format."""
+    return f"Genre: {params['genre']}\nTheme: {params['theme']}\nLength: {params['target_length']}"
+
+
+param_stats = {"local": 0, "llm": 0}
+
+
+def _request_text(llm_request: LlmRequest) -> str:
+    for content in reversed(llm_request.contents or []):
+        if content.role == "user":
+            return " ".join(part.text for part in content.parts or [] if part.text)
+    return ""
+
+
+async def fast_param_extraction(callback_context: CallbackContext,
+                                llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """Answers the parameter_extractor's model call locally when the request is clear enough."""
+    if not NOVEL_FIX_FAST_PARAMS:
+        return None
+    match = match_params(_request_text(llm_request))
+    if not match.confident:
+        param_stats["llm"] += 1
+        print(f"--- Params: low confidence (missing {', '.join(match.missing) or 'none'}), asking the model ---")
+        return None
+    param_stats["local"] += 1
+    print(f"--- Params: extracted locally ({match.params['genre']}, {match.params['target_length']}) ---")
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=format_params(match.params))]))
+
+
+def get_param_stats() -> dict:
+    return dict(param_stats)
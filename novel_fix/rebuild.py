@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Incremental rebuild of a Novel Fix novel after an outline or character edit.
+
+An edit replaces a planning stage's checkpointed output (the outline, the
+character profiles or the parameters) and reruns the request from its
+checkpoint. The planning stages are restored with the edited text; the act
+writers and continuity keepers run again only if a state key they read
+changed, and an act writer that runs again reuses every chapter whose
+context slices - its beats, the character entries named in them and the
+parameters - still match the fingerprints recorded when it was written
+(novel_fix.checkpoint.ChapterRecords). Changing one act of the outline or
+one character profile regenerates the chapters that read it, not the novel.
+
+Usage:
+    python -m novel_fix.rebuild "Write a short mystery novel about trust" --export novel_out
+    # edit novel_out/novel_outline.md or novel_out/character_profiles.md, then
+    python -m novel_fix.rebuild "Write a short mystery novel about trust" \\
+        --outline novel_out/novel_outline.md --characters novel_out/character_profiles.md --export novel_out
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the parent directory to the path so we can import from adk modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from novel_fix import checkpoint
+from novel_fix.agent import create_root_agent
+from novel_fix.batch import STAGE_OUTPUT_KEYS
+from novel_fix.checkpoint import CheckpointStore, get_checkpoint_stats, input_hash
+
+APP_NAME = "novel_fix_rebuild"
+USER_ID = "editor"
+
+# Stage outputs a user can edit; everything after them is derived
+EDITABLE_KEYS = ("extracted_parameters", "novel_outline", "character_profiles")
+
+
+def edit_stage(request: str, output_key: str, value: str, checkpoint_dir: Optional[str] = None):
+    """Replaces a planning stage's output in the request's checkpoint with an edited one."""
+    if output_key not in EDITABLE_KEYS:
+        raise ValueError(f"{output_key} is not editable, expected one of {', '.join(EDITABLE_KEYS)}")
+    store = CheckpointStore(checkpoint_dir or checkpoint.NOVEL_FIX_CHECKPOINT_DIR)
+    store.edit(input_hash(request), output_key, value, request)
+    print(f"--- Rebuild: edited {output_key} ({len(value.split())} words) ---")
+
+
+async def rebuild(request: str, checkpoint_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Reruns a request from its checkpoint, regenerating only what its edits invalidated; returns the final state."""
+    previous = checkpoint.NOVEL_FIX_CHECKPOINT, checkpoint.NOVEL_FIX_CHECKPOINT_DIR
+    checkpoint.NOVEL_FIX_CHECKPOINT = True
+    checkpoint.NOVEL_FIX_CHECKPOINT_DIR = checkpoint_dir or previous[1]
+    try:
+        session_service = InMemorySessionService()
+        runner = Runner(agent=create_root_agent(), app_name=APP_NAME, session_service=session_service)
+        session = await session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+        message = types.Content(role="user", parts=[types.Part(text=request)])
+        async for _ in runner.run_async(user_id=USER_ID, session_id=session.id, new_message=message):
+            pass
+        session = await session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+        return session.state
+    finally:
+        checkpoint.NOVEL_FIX_CHECKPOINT, checkpoint.NOVEL_FIX_CHECKPOINT_DIR = previous
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Apply outline or character edits to a Novel Fix novel and "
+                                                 "regenerate only the chapters they affect")
+    parser.add_argument("request", help="the novel's original request")
+    parser.add_argument("--outline", help="file with the edited novel outline")
+    parser.add_argument("--characters", help="file with the edited character profiles")
+    parser.add_argument("--parameters", help="file with the edited extracted parameters")
+    parser.add_argument("--checkpoint-dir", default=checkpoint.NOVEL_FIX_CHECKPOINT_DIR)
+    parser.add_argument("--export", help="directory to write every stage output to after the run")
+    args = parser.parse_args(argv)
+
+    edits = {"novel_outline": args.outline, "character_profiles": args.characters,
+             "extracted_parameters": args.parameters}
+    for output_key, path in edits.items():
+        if path:
+            edit_stage(args.request, output_key, Path(path).read_text(encoding="utf-8"), args.checkpoint_dir)
+
+    state = asyncio.run(rebuild(args.request, args.checkpoint_dir))
+
+    if args.export:
+        export_dir = Path(args.export)
+        export_dir.mkdir(parents=True, exist_ok=True)
+        for key in STAGE_OUTPUT_KEYS:
+            if isinstance(state.get(key), str):
+                (export_dir / f"{key}.md").write_text(state[key], encoding="utf-8")
+        print(f"📝 Stage outputs: {export_dir}")
+    print(f"\n💾 Checkpoints: {get_checkpoint_stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
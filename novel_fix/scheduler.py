@@ -0,0 +1,240 @@
+"""
+Dependency-graph stage scheduler for the Novel Fix pipeline.
+
+Each stage declares the state keys it reads and the keys it writes. A stage
+depends on the stages that write the keys it reads, and starts as soon as all
+of them have finished, so independent stages run concurrently instead of one
+after another. Stages that can overlap run in their own branch, as in ADK's
+ParallelAgent, so their events stay out of each other's history. After a run the scheduler reports the critical path - the chain
+of stages that determined the wall-clock time - and every stage's slack, and
+ends on the output of the last stage in topological order.
+"""
+
+import asyncio
+import time
+from typing import AsyncGenerator, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+from pydantic import Field, model_validator
+
+SCHEDULE_STATE_KEY = "pipeline_schedule"
+
+
+class Stage(NamedTuple):
+    agent: BaseAgent
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+
+
+def stage_dependencies(reads: Dict[str, Sequence[str]], writes: Dict[str, Sequence[str]]) -> Dict[str, List[str]]:
+    """Maps every stage to the stages that write the keys it reads; keys nobody writes are pipeline inputs."""
+    writers: Dict[str, str] = {}
+    for stage, keys in writes.items():
+        for key in keys:
+            if key in writers:
+                raise ValueError(f"State key '{key}' is written by both {writers[key]} and {stage}")
+            writers[key] = stage
+    return {stage: sorted({writers[key] for key in reads.get(stage, ()) if key in writers and writers[key] != stage})
+            for stage in writes}
+
+
+def topological_order(dependencies: Dict[str, List[str]]) -> List[str]:
+    """Orders stages so every stage comes after its dependencies."""
+    order: List[str] = []
+    visiting: set = set()
+
+    def visit(stage: str):
+        if stage in order:
+            return
+        if stage in visiting:
+            raise ValueError(f"Stage dependency cycle through {stage}")
+        visiting.add(stage)
+        for dependency in dependencies[stage]:
+            visit(dependency)
+        visiting.discard(stage)
+        order.append(stage)
+
+    for stage in dependencies:
+        visit(stage)
+    return order
+
+
+def concurrent_stages(dependencies: Dict[str, List[str]]) -> set:
+    """Returns the stages that can run at the same time as another stage: those neither before nor after it."""
+    ancestors: Dict[str, set] = {}
+    for stage in topological_order(dependencies):
+        ancestors[stage] = set(dependencies[stage]).union(*(ancestors[dep] for dep in dependencies[stage]))
+    return {stage for stage in ancestors for other in ancestors
+            if other != stage and other not in ancestors[stage] and stage not in ancestors[other]}
+
+
+def critical_path_report(timings: Dict[str, Tuple[float, float]], dependencies: Dict[str, List[str]]) -> dict:
+    """Builds the critical path and per-stage slack from (start, end) offsets in seconds.
+
+    A stage's slack is how much later it could have finished without delaying
+    any stage that depends on it (or the end of the run).
+    """
+    if not timings:
+        return {"wall_time": 0.0, "critical_path": [], "stages": {}}
+    wall_time = max(end for _, end in timings.values())
+
+    stages = {}
+    for stage, (start, end) in timings.items():
+        dependent_starts = [timings[other][0] for other, deps in dependencies.items()
+                            if stage in deps and other in timings]
+        latest_finish = min(dependent_starts, default=wall_time)
+        stages[stage] = {"start": round(start, 3), "end": round(end, 3), "duration": round(end - start, 3),
+                         "slack": round(max(0.0, latest_finish - end), 3)}
+
+    # Walk back from the last stage to finish through the dependency that finished last
+    path = [max(timings, key=lambda name: timings[name][1])]
+    while True:
+        finished = [dep for dep in dependencies.get(path[-1], []) if dep in timings]
+        if not finished:
+            break
+        path.append(max(finished, key=lambda name: timings[name][1]))
+    path.reverse()
+
+    return {"wall_time": round(wall_time, 3), "critical_path": path, "stages": stages}
+
+
+def format_report(report: dict) -> str:
+    """Renders a critical-path report as text."""
+    path = " → ".join(f"{name} ({report['stages'][name]['duration']:.2f}s)" for name in report["critical_path"])
+    lines = [f"Wall time {report['wall_time']:.2f}s, critical path: {path}"]
+    width = max((len(name) for name in report["stages"]), default=0)
+    for name, stage in sorted(report["stages"].items(), key=lambda item: item[1]["start"]):
+        lines.append(f"  {name:<{width}} {stage['start']:7.2f}s → {stage['end']:7.2f}s "
+                     f"({stage['duration']:.2f}s, slack {stage['slack']:.2f}s)")
+    return "\n".join(lines)
+
+
+class DagAgent(BaseAgent):
+    """Runs its sub-agents as a dependency graph of stages, each as soon as the keys it reads are written."""
+
+    stage_reads: Dict[str, List[str]] = Field(default_factory=dict)
+    stage_writes: Dict[str, List[str]] = Field(default_factory=dict)
+    last_report: Optional[dict] = None
+
+    @classmethod
+    def from_stages(cls, name: str, description: str, stages: Sequence[Stage]) -> "DagAgent":
+        return cls(
+            name=name,
+            description=description,
+            sub_agents=[stage.agent for stage in stages],
+            stage_reads={stage.agent.name: list(stage.reads) for stage in stages},
+            stage_writes={stage.agent.name: list(stage.writes) for stage in stages},
+        )
+
+    @model_validator(mode="after")
+    def _check_graph(self) -> "DagAgent":
+        names = {agent.name for agent in self.sub_agents}
+        unknown = (set(self.stage_reads) | set(self.stage_writes)) - names
+        if unknown:
+            raise ValueError(f"Stages declared for unknown sub-agents: {sorted(unknown)}")
+        topological_order(self.dependencies)
+        return self
+
+    @property
+    def dependencies(self) -> Dict[str, List[str]]:
+        writes = {agent.name: self.stage_writes.get(agent.name, []) for agent in self.sub_agents}
+        return stage_dependencies(self.stage_reads, writes)
+
+    def _final_content(self, ctx: InvocationContext, name: str) -> Optional[types.Content]:
+        """Returns the state values a stage wrote as the run's final response, or None if it wrote none."""
+        outputs = [str(ctx.session.state[key]) for key in self.stage_writes.get(name, [])
+                   if ctx.session.state.get(key)]
+        if not outputs:
+            return None
+        return types.Content(role="model", parts=[types.Part(text="\n\n".join(outputs))])
+
+    def _stage_context(self, ctx: InvocationContext, name: str) -> InvocationContext:
+        """Returns a copy of the context on a branch of its own for a stage, like ParallelAgent's sub-agents."""
+        stage_ctx = ctx.model_copy()
+        suffix = f"{self.name}.{name}"
+        stage_ctx.branch = f"{ctx.branch}.{suffix}" if ctx.branch else suffix
+        return stage_ctx
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        dependencies = self.dependencies
+        agents = {agent.name: agent for agent in self.sub_agents}
+        # Stages that can overlap get their own branch; the others see the whole run, as in a SequentialAgent
+        branched = concurrent_stages(dependencies)
+        pending = topological_order(dependencies)
+        finished: set = set()
+        timings: Dict[str, Tuple[float, float]] = {}
+        started_at = time.perf_counter()
+
+        # (stage, event, resume signal) while a stage runs, (stage, None, error) when it ends
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks: List[asyncio.Task] = []
+
+        async def run_stage(name: str):
+            error = None
+            try:
+                stage_ctx = self._stage_context(ctx, name) if name in branched else ctx
+                async for event in agents[name].run_async(stage_ctx):
+                    resume = asyncio.Event()
+                    await queue.put((name, event, resume))
+                    # Wait for the runner to apply the event before the stage continues
+                    await resume.wait()
+            except Exception as e:
+                error = e
+            finally:
+                await queue.put((name, None, error))
+
+        def start_ready_stages():
+            for name in [name for name in pending if set(dependencies[name]) <= finished]:
+                pending.remove(name)
+                timings[name] = (time.perf_counter() - started_at, 0.0)
+                tasks.append(asyncio.create_task(run_stage(name)))
+
+        start_ready_stages()
+        running = len(tasks)
+        failure: Optional[BaseException] = None
+        print(f"--- DAG: started {', '.join(agent for agent in timings)} ---")
+        try:
+            while running:
+                name, event, signal = await queue.get()
+                if event is not None:
+                    yield event
+                    signal.set()
+                    continue
+                running -= 1
+                timings[name] = (timings[name][0], time.perf_counter() - started_at)
+                if signal is not None:
+                    # Stages already running finish (and checkpoint); nothing new starts
+                    print(f"--- DAG: {name} failed: {signal} ---")
+                    failure = failure or signal
+                    continue
+                finished.add(name)
+                if failure is not None:
+                    continue
+                already_started = set(timings)
+                start_ready_stages()
+                newly_started = [stage for stage in timings if stage not in already_started]
+                running += len(newly_started)
+                if newly_started:
+                    print(f"--- DAG: {name} finished, started {', '.join(newly_started)} ---")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        if failure is not None:
+            raise failure
+
+        report = critical_path_report(timings, dependencies)
+        self.last_report = report
+        print(f"--- DAG: schedule ---\n{format_report(report)}")
+        # The run ends on the output of the last stage in topological order, as a SequentialAgent
+        # would, not on whichever concurrent stage happened to finish last
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=self._final_content(ctx, topological_order(dependencies)[-1]),
+            actions=EventActions(state_delta={SCHEDULE_STATE_KEY: report}),
+        )
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test script for the batch runner of the Novel Fix pipeline
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the jobs on the offline mock model
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "5")
+
+from common import ratelimit
+from common.llm import create_llm, set_mock_llm_latency
+from common.models import model_for
+from novel_fix import batch, chapters
+from novel_fix.batch import RESULTS_FILE, STAGE_OUTPUT_KEYS, BatchRunner, job_request, load_jobs
+
+JOBS = [
+    {"id": "harbor", "request": "Write a short mystery novel about a lighthouse keeper"},
+    {"id": "dragons", "genre": "fantasy", "theme": "the last dragon rider", "length": "short"},
+    {"id": "stars", "request": "写一部关于第一次接触的短篇科幻小说"},
+]
+
+
+def write_jobs(path: Path, lines):
+    path.write_text("\n".join(line if isinstance(line, str) else json.dumps(line, ensure_ascii=False)
+                              for line in lines) + "\n", encoding="utf-8")
+
+
+def read_results(output_dir: Path) -> list:
+    return [json.loads(line) for line in (output_dir / RESULTS_FILE).read_text(encoding="utf-8").splitlines()]
+
+
+def test_load_jobs():
+    """Specs become jobs with safe ids; broken lines become failed jobs instead of stopping the batch."""
+    print("=== Testing Job Loading ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs_path = Path(tmp) / "jobs.jsonl"
+        write_jobs(jobs_path, JOBS + ["{not json", {"id": "harbor", "request": "again"}, {"request": "x"}])
+        jobs = load_jobs(str(jobs_path))
+
+    assert [job["id"] for job in jobs] == ["harbor", "dragons", "stars", "job-4", "harbor-line-5", "job-6"]
+    assert jobs[3]["error"].startswith("invalid JSON") and "duplicate" in jobs[4]["error"]
+    assert job_request(JOBS[1]) == "Write a short fantasy novel about the last dragon rider"
+    print("Job loading OK")
+
+
+def test_batch_run_and_resume():
+    """Jobs run on a bounded pool, stream their outputs to disk, and a rerun skips finished jobs."""
+    print("\n=== Testing Batch Run ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp) / "out"
+        jobs_path = Path(tmp) / "jobs.jsonl"
+        write_jobs(jobs_path, JOBS)
+
+        # The dragon job fails in Act 3; the others are not affected
+        original_call_llm = chapters.call_llm_with_finish_reason
+
+        async def failing_dragons(prompt: str, model_name=None) -> str:
+            if "dragon rider" in prompt and "in Act 3 (Resolution)" in prompt:
+                raise RuntimeError("provider outage")
+            return await original_call_llm(prompt, model_name=model_name)
+
+        chapters.call_llm_with_finish_reason = failing_dragons
+        try:
+            stats = asyncio.run(BatchRunner(str(output_dir), workers=2).run(load_jobs(str(jobs_path))))
+        finally:
+            chapters.call_llm_with_finish_reason = original_call_llm
+
+        assert stats["done"] == 2 and stats["failed"] == 1, stats
+        assert stats["peak_in_flight"] == 2, "two workers should run two jobs at once"
+        results = {result["id"]: result for result in read_results(output_dir)}
+        assert results["harbor"]["status"] == "done" and results["dragons"]["status"] == "failed"
+        assert "provider outage" in results["dragons"]["error"]
+        assert results["harbor"]["wall_time_seconds"] > 0 and results["harbor"]["schedule"]["critical_path"]
+        for key in STAGE_OUTPUT_KEYS:
+            assert (output_dir / "stars" / f"{key}.md").read_text(encoding="utf-8")
+        # Stages finished before the failure were streamed to disk
+        assert (output_dir / "dragons" / "novel_outline.md").exists()
+        assert (output_dir / "dragons" / "error.txt").exists()
+
+        # Rerun: only the failed job runs again
+        stats = asyncio.run(BatchRunner(str(output_dir), workers=2).run(load_jobs(str(jobs_path))))
+        assert stats["skipped"] == 2 and stats["done"] == 1, stats
+        assert sum(1 for result in read_results(output_dir) if result["status"] == "done") == 3
+    print("Batch run and resume OK")
+
+
+def test_rate_budget_covers_every_model():
+    """--rpm/--max-llm-concurrency cap the calls of every model the stages run on, fast tier included."""
+    print("\n=== Testing Rate Budget ===")
+
+    batch.configure_rate_budget(6000, None, 2)
+    budget = ratelimit.get_process_rate_budget()
+    peak = {"in_flight": 0}
+    acquire = budget.concurrency.acquire
+
+    async def tracking_acquire():
+        await acquire()
+        peak["in_flight"] = max(peak["in_flight"], budget.concurrency.in_flight)
+
+    budget.concurrency.acquire = tracking_acquire
+    # Slow enough for the jobs' model calls to overlap
+    latency = set_mock_llm_latency(5)
+    before = {model: stats["requests"] for model, stats in ratelimit.get_rate_limiter_stats().items()}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs_path = Path(tmp) / "jobs.jsonl"
+            write_jobs(jobs_path, JOBS[:2])
+            stats = asyncio.run(BatchRunner(str(Path(tmp) / "out"), workers=2).run(load_jobs(str(jobs_path))))
+        assert stats["done"] == 2, stats
+
+        # The limiters the agents' model calls go through all draw on the one budget
+        for name in ("outline_creator", "character_developer", "act_1_writer", "continuity_act_1_keeper"):
+            limiter = ratelimit.get_rate_limiter(create_llm(model_for(name)).model)
+            assert limiter.shared is budget, f"{name} ({limiter.model}) is not on the batch budget"
+        used = {model: stats["requests"] - before.get(model, 0)
+                for model, stats in ratelimit.get_rate_limiter_stats().items()
+                if model != ratelimit.PROCESS_BUDGET_NAME}
+        assert len([model for model, requests in used.items() if requests]) >= 2, used
+        assert budget.stats["requests"] == sum(used.values()) > 0, (budget.stats, used)
+        assert peak["in_flight"] == 2, f"at most 2 model calls across all jobs, saw {peak['in_flight']}"
+    finally:
+        ratelimit.set_process_rate_budget()
+        set_mock_llm_latency(latency)
+    print(f"{budget.stats['requests']} model calls across {len(used)} models, peak {peak['in_flight']} in flight")
+
+
+def test_cli():
+    """The command line entry point runs a jobs file and reports failures in its exit code."""
+    print("\n=== Testing Command Line ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs_path = Path(tmp) / "jobs.jsonl"
+        write_jobs(jobs_path, JOBS[:1])
+        try:
+            exit_code = batch.main([str(jobs_path), "--output-dir", str(Path(tmp) / "out"), "--workers", "1",
+                                    "--max-llm-concurrency", "4"])
+        finally:
+            # The budget is process-wide; later tests in the same process run without it
+            ratelimit.set_process_rate_budget()
+        assert exit_code == 0
+    print("Command line OK")
+
+
+def main():
+    """Run all tests"""
+    print("Batch Runner Test Suite")
+    print("=======================")
+
+    test_load_jobs()
+    test_batch_run_and_resume()
+    test_rate_budget_covers_every_model()
+    test_cli()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-chapter fan-out of the Novel Fix act stages
+"""
+
+import asyncio
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the pipeline on the offline mock model
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "0")
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from novel_fix import chapters
+from novel_fix.agent import call_agent_async, create_root_agent
+from novel_fix.chapters import (ChapterFanOutAgent, build_chapter_prompt, parse_outline_chapters,
+                                plan_chapters, target_length_from_parameters)
+
+OUTLINE = """# The Lighthouse Keeper
+
+## Act 1: Setup
+**Chapter 1: The Storm** - Mara arrives at the lighthouse during a storm.
+**Chapter 2: The Logbook** - She finds the previous keeper's logbook.
+
+## Act 2: Development
+Chapter 3: Signals
+Strange lights appear out at sea and Mara starts decoding them.
+Chapter 4: The Visitor - Voss comes ashore asking about the logbook.
+Chapter 5: Betrayal - The village turns on Mara.
+
+## Act 3: Resolution
+Chapter 6: The Last Light - Mara confronts Voss at the harbor.
+"""
+
+
+def test_plan_from_outline():
+    """Chapters are read per act from the outline, with their titles and beats."""
+    print("=== Testing Chapter Planning ===")
+
+    parsed = parse_outline_chapters(OUTLINE)
+    assert [len(parsed[act]) for act in (1, 2, 3)] == [2, 3, 1]
+    assert parsed[2][0]["title"] == "Signals"
+    assert "decoding them" in parsed[2][0]["beat"]
+
+    plan = plan_chapters(OUTLINE, "short")
+    assert [chapter["number"] for chapter in plan] == [1, 2, 3, 4, 5, 6]
+    assert [chapter["act"] for chapter in plan] == [1, 1, 2, 2, 2, 3]
+    assert plan[3]["act_chapter"] == 2 and plan[3]["act_chapters"] == 3
+
+    # Acts the outline does not list chapters for get the default chapter count
+    plan = plan_chapters("## Act 1\nChapter 1: Arrival - Mara arrives.", "short")
+    assert [sum(1 for chapter in plan if chapter["act"] == act) for act in (1, 2, 3)] == [1, 6, 4]
+
+    # Outlines without act headings are split by the chapter counts
+    flat = "\n".join(f"Chapter {n}: Title {n} - Beat {n}." for n in range(1, 15))
+    plan = plan_chapters(flat, "short")
+    assert [chapter["act"] for chapter in plan].count(2) == 6 and plan[13]["title"] == "Title 14"
+
+    assert target_length_from_parameters("Genre: mystery\nTheme: trust\nLength: **Long**") == "long"
+    assert target_length_from_parameters("") == "medium"
+    print("Planning OK")
+
+
+def test_prompt_has_neighbour_beats():
+    """Each chapter prompt carries its own beat and its neighbours' beats, across act boundaries."""
+    print("\n=== Testing Chapter Prompts ===")
+
+    plan = plan_chapters(OUTLINE, "short")
+    prompt = build_chapter_prompt(plan, 2, "Genre: mystery", "Mara, Voss")
+    assert 'Chapter 3 "Signals"' in prompt and "chapter 1 of 3 in Act 2" in prompt
+    assert "previous keeper's logbook" in prompt and "Voss comes ashore" in prompt
+    assert "Mara confronts Voss" not in prompt
+    assert "first chapter of the novel" in build_chapter_prompt(plan, 0, "", "")
+    print("Prompts OK")
+
+
+def test_bounded_concurrency_keeps_order():
+    """No more than max_concurrency chapters are written at once and the act is assembled in order."""
+    print("\n=== Testing Bounded Concurrency ===")
+
+    running = {"now": 0, "peak": 0}
+
+    async def fake_llm(prompt: str, model_name=None) -> tuple:
+        number = int(prompt.split("Chapter ", 1)[1].split()[0])
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.01 * (10 - number))  # later chapters finish first
+        running["now"] -= 1
+        return f"Text of chapter {number}", "STOP"
+
+    original = chapters.call_llm_with_finish_reason
+    chapters.call_llm_with_finish_reason = fake_llm
+    try:
+        agent = ChapterFanOutAgent(name="act_2_writer", act=2, output_key="act_2_content", max_concurrency=2)
+        flat = "\n".join(f"Chapter {n}: Title {n}" for n in range(1, 21))
+        act_text = asyncio.run(agent.write_act({"novel_outline": flat, "extracted_parameters": "Length: medium"}))
+    finally:
+        chapters.call_llm_with_finish_reason = original
+
+    assert running["peak"] == 2, f"expected at most 2 chapters at once, saw {running['peak']}"
+    positions = [act_text.index(f"## Chapter {n}\n\nText of chapter {n}") for n in range(7, 15)]
+    assert positions == sorted(positions)
+    print(f"Peak concurrency {running['peak']}, chapters 7-14 in order")
+
+
+def test_failed_chapter_fails_the_act():
+    """A chapter the model failed to write fails its act instead of being stitched in or recorded."""
+    print("\n=== Testing Failed Chapter ===")
+
+    saved = []
+
+    class Records:
+        async def reuse(self, number, dependencies):
+            return None
+
+        async def save(self, number, dependencies, text):
+            saved.append(number)
+
+    async def failing_llm(prompt: str, model_name=None) -> tuple:
+        number = int(prompt.split("Chapter ", 1)[1].split()[0])
+        if number == 8:
+            return "[LLM Error: Could not generate content. timeout]", None
+        await asyncio.sleep(0.05)
+        return f"Text of chapter {number}", "STOP"
+
+    original = chapters.call_llm_with_finish_reason
+    chapters.call_llm_with_finish_reason = failing_llm
+    try:
+        agent = ChapterFanOutAgent(name="act_2_writer", act=2, output_key="act_2_content", max_concurrency=8)
+        flat = "\n".join(f"Chapter {n}: Title {n}" for n in range(1, 21))
+        try:
+            asyncio.run(agent.write_act({"novel_outline": flat, "extracted_parameters": "Length: medium"},
+                                        records=Records()))
+            raise AssertionError("the act should fail with its chapter")
+        except RuntimeError as e:
+            assert "chapter 8 failed" in str(e), e
+    finally:
+        chapters.call_llm_with_finish_reason = original
+
+    # The other chapters were cancelled before they finished, and nothing was recorded
+    assert saved == [], saved
+    print("Failed chapter fails the act")
+
+
+def test_pipeline_fills_act_outputs():
+    """The pipeline writes every act into its output key, chapter by chapter."""
+    print("\n=== Testing Pipeline Run ===")
+
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=create_root_agent(), app_name="chapters_test", session_service=session_service)
+        await session_service.create_session(app_name="chapters_test", user_id="u", session_id="s")
+        message = types.Content(role="user", parts=[types.Part(text="Write a short mystery novel about trust")])
+        authors = [event.author async for event in
+                   runner.run_async(user_id="u", session_id="s", new_message=message)]
+        session = await session_service.get_session(app_name="chapters_test", user_id="u", session_id="s")
+        return authors, session.state
+
+    authors, state = asyncio.run(run())
+    assert {"act_1_writer", "act_2_writer", "act_3_writer"} <= set(authors)
+    total = 0
+    for act in (1, 2, 3):
+        content = state[f"act_{act}_content"]
+        assert content.startswith("## Chapter ")
+        total += content.count("## Chapter ")
+    print(f"Pipeline wrote {total} chapters across 3 acts")
+
+
+def test_chapters_stream_before_their_act_ends():
+    """The client sees every stage start and finish, and each chapter as soon as it is written."""
+    print("\n=== Testing Streamed Chapters ===")
+
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=create_root_agent(), app_name="chapters_test", session_service=session_service)
+        await session_service.create_session(app_name="chapters_test", user_id="u", session_id="s")
+        events = []
+        final = await call_agent_async("Write a short mystery novel about trust", runner, "u", "s",
+                                       on_event=events.append)
+        session = await session_service.get_session(app_name="chapters_test", user_id="u", session_id="s")
+        return events, final, session
+
+    events, final, session = asyncio.run(run())
+    ends = {event.stage: i for i, event in enumerate(events) if event.kind == "stage_end"}
+    assert {"parameter_extractor", "outline_creator", "character_developer", "act_1_writer",
+            "act_2_writer", "act_3_writer"} <= set(ends)
+    chapters_seen = [(i, event) for i, event in enumerate(events) if event.kind == "progress"]
+    for i, event in chapters_seen:
+        assert i < ends[event.stage] and event.text.startswith(f"## Chapter {event.metadata['chapter']}")
+    assert len(chapters_seen) == sum(session.state[f"act_{act}_content"].count("## Chapter ") for act in (1, 2, 3))
+    # The acts run concurrently, but the final response is always Act 3, whichever act finished last
+    assert final == session.state["act_3_content"], "the final response is the last act in stage order"
+    assert session.events[-1].author == "novel_fix_sequential_pipeline"
+    # Streamed chapters are not added to the session history
+    assert not any(event.partial for event in session.events)
+    print(f"{len(chapters_seen)} chapters streamed, {len(events)} events")
+
+
+def main():
+    """Run all tests"""
+    print("Chapter Fan-Out Test Suite")
+    print("==========================")
+
+    test_plan_from_outline()
+    test_prompt_has_neighbour_beats()
+    test_bounded_concurrency_keeps_order()
+    test_failed_chapter_fails_the_act()
+    test_pipeline_fills_act_outputs()
+    test_chapters_stream_before_their_act_ends()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test script for checkpoint and resume of the Novel Fix pipeline
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the pipeline on the offline mock model
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "0")
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from common.llm import get_llm_client
+from novel_fix import chapters, checkpoint
+from novel_fix.agent import create_root_agent
+from novel_fix.checkpoint import ChapterRecords, CheckpointStore, input_hash, is_valid_output
+
+REQUEST = "Write a short mystery novel about trust"
+STAGE_KEYS = ["extracted_parameters", "novel_outline", "character_profiles",
+              "act_1_content", "act_2_content", "act_3_content"]
+
+
+def run_pipeline(request: str = REQUEST) -> dict:
+    """Runs the pipeline in a fresh session and returns its final state."""
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=create_root_agent(), app_name="checkpoint_test", session_service=session_service)
+        await session_service.create_session(app_name="checkpoint_test", user_id="u", session_id="s")
+        message = types.Content(role="user", parts=[types.Part(text=request)])
+        async for _ in runner.run_async(user_id="u", session_id="s", new_message=message):
+            pass
+        session = await session_service.get_session(app_name="checkpoint_test", user_id="u", session_id="s")
+        return session.state
+
+    return asyncio.run(run())
+
+
+def test_store():
+    """Checkpoints are keyed on the normalized request and only valid outputs are reused."""
+    print("=== Testing Checkpoint Store ===")
+
+    assert input_hash("Write  a novel\n") == input_hash("Write a novel")
+    assert input_hash("Write a novel") != input_hash("Write a poem")
+    assert not is_valid_output("") and not is_valid_output("[LLM Error: Could not generate content. boom]")
+
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        store = CheckpointStore(checkpoint_dir)
+        key = input_hash(REQUEST)
+        store.save(key, "novel_outline", "outline_creator", "Act 1 ...", REQUEST)
+        store.save(key, "act_1_content", "act_1_writer", "[LLM Error: timeout]", REQUEST)
+        assert store.get(key, "novel_outline") == "Act 1 ..."
+        assert store.get(key, "act_1_content") is None
+        assert store.get(input_hash("another request"), "novel_outline") is None
+        store.clear(key)
+        assert store.get(key, "novel_outline") is None
+    print("Store OK")
+
+
+def test_chapter_records():
+    """Every chapter is saved to a file of its own, on a worker thread, and cleared with its request."""
+    print("\n=== Testing Chapter Records ===")
+
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        store = CheckpointStore(checkpoint_dir)
+        key = input_hash(REQUEST)
+        store.save(key, "novel_outline", "outline_creator", "Act 1 ...", REQUEST)
+        records = ChapterRecords(store, key)
+        threads = []
+        save_chapter = store.save_chapter
+
+        def tracking_save_chapter(*args):
+            threads.append(threading.current_thread())
+            save_chapter(*args)
+
+        store.save_chapter = tracking_save_chapter
+
+        async def run():
+            await asyncio.gather(*(records.save(number, {"beat": str(number)}, f"Chapter {number} text")
+                                   for number in range(1, 9)))
+            return await records.reuse(3, {"beat": "3"}), await records.reuse(4, {"beat": "changed"})
+
+        reused, changed = asyncio.run(run())
+        assert reused == "Chapter 3 text" and changed is None
+        assert len(threads) == 8 and threading.main_thread() not in threads
+        assert list(store.load_chapters(key)) == list(range(1, 9))
+        assert "chapters" not in store.load(key), "chapters are not rewritten with the stage outputs"
+        store.clear(key)
+        assert store.load_chapters(key) == {} and store.get_chapter(key, 3) is None
+    print("Chapter records OK")
+
+
+def test_resume_after_failure():
+    """A run that fails in act_3_writer resumes with only Act 3 left to generate."""
+    print("\n=== Testing Resume After Failure ===")
+
+    llm = get_llm_client()
+    original_call_llm = chapters.call_llm_with_finish_reason
+
+    async def failing_act_3(prompt: str, model_name=None) -> str:
+        if "in Act 3 (Resolution)" in prompt:
+            raise RuntimeError("provider outage")
+        return await original_call_llm(prompt, model_name=model_name)
+
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        checkpoint.NOVEL_FIX_CHECKPOINT, checkpoint.NOVEL_FIX_CHECKPOINT_DIR = True, checkpoint_dir
+        try:
+            chapters.call_llm_with_finish_reason = failing_act_3
+            try:
+                run_pipeline()
+                raise AssertionError("the first run should fail in act_3_writer")
+            except RuntimeError as e:
+                assert "provider outage" in str(e)
+            finally:
+                chapters.call_llm_with_finish_reason = original_call_llm
+
+            saved = CheckpointStore(checkpoint_dir).load(input_hash(REQUEST))["stages"]
+            assert sorted(saved) == sorted(STAGE_KEYS[:-1]), sorted(saved)
+
+            calls_before = llm.calls
+            state = run_pipeline()
+            resumed_calls = llm.calls - calls_before
+            assert resumed_calls == 4, f"only the 4 Act 3 chapters should be generated, got {resumed_calls} calls"
+            assert all(is_valid_output(state[key]) for key in STAGE_KEYS)
+            assert state["novel_outline"] == saved["novel_outline"]["value"]
+
+            # A finished run is restored completely, a different request starts from scratch
+            calls_before = llm.calls
+            run_pipeline()
+            assert llm.calls == calls_before
+            run_pipeline("Write a short romance novel about second chances")
+            assert llm.calls > calls_before
+        finally:
+            checkpoint.NOVEL_FIX_CHECKPOINT = False
+    print(f"Resumed run made {resumed_calls} model calls; stats: {checkpoint.get_checkpoint_stats()}")
+
+
+def main():
+    """Run all tests"""
+    print("Pipeline Checkpoint Test Suite")
+    print("==============================")
+
+    test_store()
+    test_chapter_records()
+    test_resume_after_failure()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
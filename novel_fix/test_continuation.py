@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for truncation detection and continuation of Novel Fix chapters
+"""
+
+import asyncio
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the chapters on the offline mock model
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "0")
+
+from common.llm import get_llm_client
+from novel_fix import continuation
+from novel_fix.chapters import ChapterFanOutAgent
+from novel_fix.continuation import (
+    CONTINUATION_TAIL_CHARS,
+    build_continuation_prompt,
+    complete_text,
+    is_truncated,
+    stitch,
+    text_tail,
+)
+
+CHAPTER = " ".join(f"Sentence {i} of the chapter goes on for a while." for i in range(300))
+
+
+def test_detection():
+    """Cut-off text is recognised from the finish reason, or from a mid-sentence ending without one."""
+    print("=== Testing Truncation Detection ===")
+
+    assert is_truncated("She opened the door.", "MAX_TOKENS")
+    assert not is_truncated("She opened the door and", "STOP")
+    assert is_truncated("She opened the door and", None)
+    for ending in ["She opened the door.", '"Run!"', "他打开了门。", "She waited…", "***"]:
+        assert not is_truncated(ending, None), ending
+    assert not is_truncated("[LLM Error: Could not generate content. timeout]", None)
+    assert not is_truncated("", "MAX_TOKENS")
+    print("Detection OK")
+
+
+def test_stitch():
+    """Continuations are joined at the cut, dropping any text they repeat."""
+    print("\n=== Testing Stitching ===")
+
+    text = "The storm had passed, and the harbor lights came back one by one along the"
+    assert stitch(text, "quay.") == text + " quay."
+    assert stitch(text, "lights came back one by one along the quay.") == text + " quay."
+    assert stitch(text + " ", "quay.") == text + " quay."
+    assert stitch(text, ", slowly.") == text + ", slowly."
+    assert stitch(text, "the quay.") == text + " the quay.", "a short shared word is not an overlap"
+
+    tail = text_tail(CHAPTER)
+    assert len(tail) <= CONTINUATION_TAIL_CHARS and CHAPTER.endswith(tail)
+    assert CHAPTER[-len(tail) - 1] == " ", "the tail starts on a word boundary"
+    prompt = build_continuation_prompt(tail, "You are writing Chapter 4")
+    assert "Sentence 0 " not in prompt and tail in prompt and prompt.startswith("You are writing Chapter 4")
+    print("Stitching OK")
+
+
+def test_complete_text():
+    """A cut-off chapter is continued from its tail only, up to the continuation limit."""
+    print("\n=== Testing Continuation ===")
+
+    prompts = []
+    cut = CHAPTER.index("Sentence 200") + len("Sentence 200 of the")
+
+    async def generate(prompt: str) -> tuple:
+        prompts.append(prompt)
+        if len(prompts) == 1:
+            return CHAPTER[:cut], "MAX_TOKENS"
+        return CHAPTER[cut - 40:], "STOP"  # repeats the last few words of the tail
+
+    text = asyncio.run(complete_text("Write chapter 4", generate, label="chapter 4"))
+    assert text == CHAPTER, "the stitched chapter should read as one text"
+    assert len(prompts) == 2 and len(prompts[1]) < CONTINUATION_TAIL_CHARS + 500
+    assert "Sentence 0 " not in prompts[1], "only the tail is sent back"
+
+    calls = []
+
+    async def always_cut(prompt: str) -> tuple:
+        calls.append(prompt)
+        return f"Part {len(calls)} stops in the middle of", "MAX_TOKENS"
+
+    text = asyncio.run(complete_text("Write chapter 5", always_cut, max_continuations=2))
+    assert len(calls) == 3 and text.startswith("Part 1") and "Part 3" in text
+    print(f"Stats: {continuation.get_continuation_stats()}")
+
+
+def test_capped_model():
+    """Chapters cut by the model's output cap get continuation calls instead of being stored as cut."""
+    print("\n=== Testing Chapters on a Capped Model ===")
+
+    llm = get_llm_client()
+    llm.max_output_tokens = 120  # the mock writes 200 words for every prompt, continuations included
+    continuation.NOVEL_FIX_MAX_CONTINUATIONS = 1
+    calls_before = llm.calls
+    try:
+        agent = ChapterFanOutAgent(name="act_1_writer", act=1, output_key="act_1_content")
+        outline = "## Act 1\n### Chapter 1: The Letter\n### Chapter 2: The Harbor\n## Act 2\n### Chapter 3: The Storm"
+        act_text = asyncio.run(agent.write_act({"novel_outline": outline, "extracted_parameters": "Length: short"}))
+    finally:
+        llm.max_output_tokens = 0
+        continuation.NOVEL_FIX_MAX_CONTINUATIONS = 3
+    calls = llm.calls - calls_before
+    chapter_words = [len(part.split()) - 1 for part in act_text.split("## Chapter ")[1:]]
+    assert calls == 4, f"2 chapters and 1 continuation each, got {calls} calls"
+    assert chapter_words == [240, 240], chapter_words
+    print(f"{calls} model calls, chapter lengths {chapter_words} words")
+
+
+def main():
+    """Run all tests"""
+    print("Chapter Continuation Test Suite")
+    print("===============================")
+
+    test_detection()
+    test_stitch()
+    test_complete_text()
+    test_capped_model()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test script for the rolling continuity digests of the Novel Fix pipeline
+"""
+
+import asyncio
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the pipeline on the offline mock model
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "5")
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+import novel_fix.agent as novel_fix_agent
+from novel_fix import chapters, continuity
+from novel_fix.chapters import ChapterFanOutAgent
+from novel_fix.continuity import MAX_DIGEST_CHARS, build_digest_prompt, clip_digest, continuity_key
+from novel_fix.scheduler import SCHEDULE_STATE_KEY
+
+OUTLINE = """## Act 1: Setup
+### Chapter 1: The Letter
+### Chapter 2: The Harbor
+## Act 2: Development
+### Chapter 3: The Storm
+## Act 3: Resolution
+### Chapter 4: The Return
+"""
+
+
+def create_root_agent():
+    """Builds the pipeline with continuity digests, which are opt-in."""
+    enabled, novel_fix_agent.NOVEL_FIX_CONTINUITY = novel_fix_agent.NOVEL_FIX_CONTINUITY, True
+    try:
+        return novel_fix_agent.create_root_agent()
+    finally:
+        novel_fix_agent.NOVEL_FIX_CONTINUITY = enabled
+
+
+def test_digest_prompt():
+    """The digest prompt rolls the previous digest and the new act together; digests stay bounded."""
+    print("=== Testing Digest Prompt ===")
+
+    prompt = build_digest_prompt(2, "Mara sails into the storm.", "## PLOT STATE\nMara found the letter.")
+    assert "Mara sails into the storm." in prompt and "Mara found the letter." in prompt
+    for section in continuity.DIGEST_SECTIONS:
+        assert f"## {section}" in prompt
+    assert "first act" in build_digest_prompt(1, "text")
+
+    long_digest = "\n".join(f"- fact {i}: " + "detail " * 20 for i in range(200))
+    clipped = clip_digest(long_digest)
+    assert len(clipped) <= MAX_DIGEST_CHARS + 4 and clipped.endswith("...")
+    assert clip_digest("  short digest \n") == "short digest"
+    print("Digest prompt OK")
+
+
+def act_3_prompt_size(earlier_act_words: int) -> int:
+    """Runs the Act 1 digest, the Act 2 digest and Act 3 on fake acts; returns the largest Act 3 prompt."""
+    prompts = []
+
+    async def fake_digest(prompt: str, model_name=None) -> str:
+        return "## PLOT STATE\nThe story so far, condensed."
+
+    async def fake_chapter(prompt: str, model_name=None) -> tuple:
+        prompts.append(prompt)
+        return "Chapter text.", "STOP"
+
+    original = chapters.call_llm_with_finish_reason, continuity.call_llm_async
+    chapters.call_llm_with_finish_reason, continuity.call_llm_async = fake_chapter, fake_digest
+    try:
+        state = {"novel_outline": OUTLINE, "extracted_parameters": "Genre: mystery\nLength: short",
+                 "character_profiles": "Mara - a sailor",
+                 "act_1_content": "word " * earlier_act_words, "act_2_content": "word " * earlier_act_words}
+        keeper_1 = continuity.ContinuityAgent(name="k1", act=1, output_key=continuity_key(1))
+        keeper_2 = continuity.ContinuityAgent(name="k2", act=2, output_key=continuity_key(2),
+                                              previous_key=continuity_key(1))
+        act_3 = ChapterFanOutAgent(name="a3", act=3, output_key="act_3_content", continuity_key=continuity_key(2))
+
+        async def run():
+            state[continuity_key(1)] = await keeper_1.write_digest(state)
+            state[continuity_key(2)] = await keeper_2.write_digest(state)
+            await act_3.write_act(state)
+
+        asyncio.run(run())
+    finally:
+        chapters.call_llm_with_finish_reason, continuity.call_llm_async = original
+    assert prompts and all("STORY SO FAR" in prompt for prompt in prompts)
+    return max(len(prompt) for prompt in prompts)
+
+
+def test_prompt_size_is_bounded():
+    """Act 3 chapter prompts do not grow with the length of the earlier acts."""
+    print("\n=== Testing Act 3 Prompt Size ===")
+
+    short, long = act_3_prompt_size(1000), act_3_prompt_size(10000)
+    assert short == long, f"Act 3 prompt grew from {short} to {long} characters"
+    print(f"Act 3 chapter prompt: {short} characters with 1k-word acts, {long} with 10k-word acts")
+
+
+def test_failed_digest_stops_the_run():
+    """A digest the model failed to write fails its stage; the next act never sees it."""
+    print("\n=== Testing Failed Digest ===")
+
+    async def failing_digest(prompt: str, model_name=None) -> str:
+        return "[LLM Error: Could not generate content. timeout]"
+
+    async def run(state: dict):
+        session_service = InMemorySessionService()
+        runner = Runner(agent=create_root_agent(), app_name="continuity_test", session_service=session_service)
+        await session_service.create_session(app_name="continuity_test", user_id="u", session_id="s")
+        message = types.Content(role="user", parts=[types.Part(text="Write a short mystery novel about loss")])
+        try:
+            async for _ in runner.run_async(user_id="u", session_id="s", new_message=message):
+                pass
+        finally:
+            session = await session_service.get_session(app_name="continuity_test", user_id="u", session_id="s")
+            state.update(session.state)
+
+    original = continuity.call_llm_async
+    continuity.call_llm_async = failing_digest
+    state = {}
+    try:
+        keeper = continuity.ContinuityAgent(name="k1", act=1, output_key=continuity_key(1))
+        try:
+            asyncio.run(keeper.write_digest({"act_1_content": "Mara found the letter."}))
+            raise AssertionError("the digest should fail")
+        except RuntimeError as e:
+            assert "Act 1 failed" in str(e), e
+
+        try:
+            asyncio.run(run(state))
+            raise AssertionError("the run should fail with the digest")
+        except RuntimeError as e:
+            assert "Continuity digest of Act 1 failed" in str(e), e
+    finally:
+        continuity.call_llm_async = original
+    assert state["act_1_content"] and continuity_key(1) not in state and "act_2_content" not in state
+    print("Failed digest stopped the run after Act 1")
+
+
+def test_pipeline_order():
+    """Each digest is written after its act and before the next act starts."""
+    print("\n=== Testing Pipeline Order ===")
+
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=create_root_agent(), app_name="continuity_test", session_service=session_service)
+        await session_service.create_session(app_name="continuity_test", user_id="u", session_id="s")
+        message = types.Content(role="user", parts=[types.Part(text="Write a short mystery novel about trust")])
+        async for _ in runner.run_async(user_id="u", session_id="s", new_message=message):
+            pass
+        session = await session_service.get_session(app_name="continuity_test", user_id="u", session_id="s")
+        return session.state
+
+    state = asyncio.run(run())
+    stages = state[SCHEDULE_STATE_KEY]["stages"]
+    for act in (1, 2):
+        keeper = stages[f"{continuity_key(act)}_keeper"]
+        assert keeper["start"] >= stages[f"act_{act}_writer"]["end"]
+        assert stages[f"act_{act + 1}_writer"]["start"] >= keeper["end"]
+        assert state[continuity_key(act)]
+    assert all(state[f"act_{act}_content"] for act in (1, 2, 3))
+    print(f"Critical path: {' → '.join(state[SCHEDULE_STATE_KEY]['critical_path'])}")
+
+
+def main():
+    """Run all tests"""
+    print("Continuity Digest Test Suite")
+    print("============================")
+
+    test_digest_prompt()
+    test_prompt_size_is_bounded()
+    test_failed_digest_stops_the_run()
+    test_pipeline_order()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
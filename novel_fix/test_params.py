@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the local parameter extraction fast path of the Novel Fix pipeline
+"""
+
+import asyncio
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the pipeline stage on the offline mock model
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "0")
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from common.llm import get_llm_client
+from common.models import model_for
+from novel_fix import params
+from novel_fix.agent import create_parameter_extraction_agent
+from novel_fix.params import format_params, match_params
+
+
+def test_match_params():
+    """English and Chinese requests are matched in one pass; unclear ones are low confidence."""
+    print("=== Testing Parameter Matching ===")
+
+    confident = {
+        "Write a short romance novel about finding love": ("romance", "finding love", "short"),
+        "Create a science fiction story about space exploration with medium length":
+            ("science fiction", "space exploration", "medium"),
+        "I need a long fantasy adventure about dragons and magic": ("fantasy", "dragons and magic", "long"),
+        "Write a historical drama about the fall of Rome": ("historical", "the fall of Rome", "medium"),
+        "写一部关于友谊的短篇奇幻小说": ("fantasy", "友谊", "short"),
+        "帮我写一个长篇科幻故事，主题是人工智能的伦理": ("science fiction", "人工智能的伦理", "long"),
+    }
+    for text, (genre, theme, length) in confident.items():
+        match = match_params(text)
+        assert match.confident, f"{text!r} should be confident: {match}"
+        assert match.params == {"genre": genre, "theme": theme, "target_length": length}, f"{text!r}: {match}"
+
+    for text in ["Just write a novel", "写一个悬疑小说", "A thriller or maybe horror about a cabin in the woods",
+                 "Write a novel about dragons"]:
+        assert not match_params(text).confident, f"{text!r} should go to the model"
+    assert match_params("Just write a novel").params == params.DEFAULT_PARAMS
+    assert format_params(match_params("Write a short romance novel about finding love").params) == \
+        "Genre: romance\nTheme: finding love\nLength: short"
+    print(f"{len(confident)} confident requests matched")
+
+
+def run_stage(text: str) -> tuple:
+    """Runs the parameter_extractor stage alone; returns (model calls, extracted_parameters)."""
+    llm = get_llm_client(model_for("parameter_extractor"))
+    calls_before = llm.calls
+
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=create_parameter_extraction_agent(), app_name="params_test",
+                        session_service=session_service)
+        await session_service.create_session(app_name="params_test", user_id="u", session_id="s")
+        message = types.Content(role="user", parts=[types.Part(text=text)])
+        async for _ in runner.run_async(user_id="u", session_id="s", new_message=message):
+            pass
+        session = await session_service.get_session(app_name="params_test", user_id="u", session_id="s")
+        return session.state["extracted_parameters"]
+
+    extracted = asyncio.run(run())
+    return llm.calls - calls_before, extracted
+
+
+def test_hybrid_stage():
+    """Confident requests skip the model call; the rest still reach the model."""
+    print("\n=== Testing Hybrid Stage ===")
+
+    calls, extracted = run_stage("写一部关于友谊的短篇奇幻小说")
+    assert calls == 0 and extracted == "Genre: fantasy\nTheme: 友谊\nLength: short", (calls, extracted)
+
+    calls, extracted = run_stage("Just write a novel")
+    assert calls == 1 and extracted
+
+    params.NOVEL_FIX_FAST_PARAMS = False
+    try:
+        calls, _ = run_stage("写一部关于友谊的短篇奇幻小说")
+    finally:
+        params.NOVEL_FIX_FAST_PARAMS = True
+    assert calls == 1
+    print(f"Stats: {params.get_param_stats()}")
+
+
+def main():
+    """Run all tests"""
+    print("Parameter Extraction Test Suite")
+    print("===============================")
+
+    test_match_params()
+    test_hybrid_stage()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental rebuild of Novel Fix chapters after an edit
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the pipeline on the offline mock model
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "0")
+
+import novel_fix.agent as novel_fix_agent
+from common import llm as shared_llm
+from novel_fix import checkpoint
+from novel_fix.chapters import (
+    character_entries,
+    chapter_dependencies,
+    plan_chapters,
+    select_characters,
+)
+from novel_fix.checkpoint import CheckpointStore, changed_dependencies, input_hash
+from novel_fix.rebuild import edit_stage, rebuild
+
+REQUEST = "Write a short mystery novel about trust"
+
+PROFILES = """Profiles for the novel.
+
+1. **PROTAGONIST**: Mara Voss
+- Age 34, a harbor pilot who trusts no one
+
+2. **ANTAGONIST**
+- Name: Silas Crane, the harbor master
+
+### Jonah Reed (supporting)
+- Mara's estranged brother, a fisherman
+
+**Character Relationships**
+- Mara and Jonah have not spoken in years
+"""
+
+BEATS = {
+    1: "Mara finds a letter in the fog.", 2: "Mara meets Jonah at the docks.", 3: "A ship goes missing.",
+    4: "Mara takes the case.", 5: "Silas closes the harbor.", 6: "The storm arrives.", 7: "Mara dives the wreck.",
+    8: "A second letter appears.", 9: "Silas makes an offer.", 10: "Mara refuses.", 11: "The truth surfaces.",
+    12: "Mara confronts Silas on the pier.", 13: "The harbor burns.", 14: "Dawn over the water.",
+}
+
+
+def model_calls() -> int:
+    """Counts the calls of every pooled model - chapters and digests run on different tiers."""
+    return sum(client.calls for client in shared_llm._llm_clients.values())
+
+
+def outline(beats: dict) -> str:
+    acts = {1: range(1, 5), 2: range(5, 11), 3: range(11, 15)}
+    return "\n".join(f"## Act {act}\n" + "\n".join(f"### Chapter {n}: Part {n} - {beats[n]}" for n in numbers)
+                     for act, numbers in acts.items())
+
+
+def test_character_entries():
+    """Profiles split into named entries; a chapter reads the ones its beats name, the lead and shared notes."""
+    print("=== Testing Character Entries ===")
+
+    entries = character_entries(PROFILES)
+    assert [entry["label"] for entry in entries] == ["shared", "Mara Voss", "Silas Crane", "Jonah Reed",
+                                                     "Character Relationships"], entries
+    assert entries[1]["lead"] and entries[2]["names"] == ["Silas", "Crane"]
+
+    selected = [entry["label"] for entry in select_characters(entries, "A ship goes missing.")]
+    assert selected == ["shared", "Mara Voss", "Character Relationships"], selected
+    selected = [entry["label"] for entry in select_characters(entries, "Jonah hides from Silas.")]
+    assert "Jonah Reed" in selected and "Silas Crane" in selected
+    assert character_entries("Plain prose about the cast.")[0]["label"] == "shared"
+    print("Entries OK")
+
+
+def test_dependencies():
+    """Editing one beat changes the outline slice of that chapter and its two neighbours only."""
+    print("\n=== Testing Chapter Dependencies ===")
+
+    def dependencies(beats: dict) -> list:
+        plan = plan_chapters(outline(beats), "short")
+        return [chapter_dependencies(plan, i, "Length: short", [], "digest") for i in range(len(plan))]
+
+    before, after = dependencies(BEATS), dependencies({**BEATS, 8: "Two letters appear."})
+    changed = [i + 1 for i in range(len(before)) if changed_dependencies(before[i], after[i])]
+    assert changed == [7, 8, 9], changed
+    assert changed_dependencies({"continuity": "a"}, {"continuity": "b"}) == [], "digest changes are soft"
+    print(f"Chapters invalidated by a chapter 8 edit: {changed}")
+
+
+def test_rebuild_after_edit():
+    """After an outline or character edit only the chapters reading the edited slices are regenerated."""
+    print("\n=== Testing Incremental Rebuild ===")
+
+    # The digests after Acts 1 and 2 are part of what a rebuild reuses; they are opt-in
+    enabled, novel_fix_agent.NOVEL_FIX_CONTINUITY = novel_fix_agent.NOVEL_FIX_CONTINUITY, True
+    try:
+        _test_rebuild_after_edit()
+    finally:
+        novel_fix_agent.NOVEL_FIX_CONTINUITY = enabled
+
+
+def _test_rebuild_after_edit():
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        edit_stage(REQUEST, "novel_outline", outline(BEATS), checkpoint_dir)
+        edit_stage(REQUEST, "character_profiles", PROFILES, checkpoint_dir)
+        first = asyncio.run(rebuild(REQUEST, checkpoint_dir))
+        records = CheckpointStore(checkpoint_dir).load_chapters(input_hash(REQUEST))
+        assert list(records) == list(range(1, 15))
+
+        def rebuild_calls() -> tuple:
+            calls, reused = model_calls(), checkpoint.get_checkpoint_stats()["chapters_reused"]
+            state = asyncio.run(rebuild(REQUEST, checkpoint_dir))
+            return state, model_calls() - calls, checkpoint.get_checkpoint_stats()["chapters_reused"] - reused
+
+        # Act 3 outline edit: chapters 11-13 read chapter 12's beat; no continuity digest follows Act 3
+        edit_stage(REQUEST, "novel_outline", outline({**BEATS, 12: "Mara confronts Silas in the lighthouse."}),
+                   checkpoint_dir)
+        state, calls, reused = rebuild_calls()
+        assert calls == 3 and reused == 4 + 6 + 1, (calls, reused)
+        assert state["act_1_content"] == first["act_1_content"] and state["act_2_content"] == first["act_2_content"]
+        assert state["act_3_content"] != first["act_3_content"]
+
+        # Jonah is only named around chapter 2: chapters 1-3, then both digests (Act 1 changed), nothing else
+        edit_stage(REQUEST, "character_profiles", PROFILES.replace("a fisherman", "a smuggler"), checkpoint_dir)
+        state, calls, reused = rebuild_calls()
+        assert calls == 3 + 2 and reused == 1 + 6 + 4, (calls, reused)
+        assert state["act_2_content"] == first["act_2_content"]
+
+        # Nothing edited: everything is restored
+        state, calls, reused = rebuild_calls()
+        assert calls == 0, calls
+    print(f"Stats: {checkpoint.get_checkpoint_stats()}")
+
+
+def main():
+    """Run all tests"""
+    print("Incremental Rebuild Test Suite")
+    print("==============================")
+
+    test_character_entries()
+    test_dependencies()
+    test_rebuild_after_edit()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for the dependency-graph stage scheduler of the Novel Fix pipeline
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the pipeline on the offline mock model; the concurrency test slows it down for the schedule to show
+os.environ["LLM_BACKEND"] = "mock"
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "0")
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+import novel_fix.agent as novel_fix_agent
+from common.llm import set_mock_llm_latency
+from novel_fix.scheduler import (SCHEDULE_STATE_KEY, concurrent_stages, critical_path_report, stage_dependencies,
+                                 topological_order)
+
+
+def test_dependencies():
+    """Stages depend on the writers of the keys they read; cycles and duplicate writers are rejected."""
+    print("=== Testing Stage Dependencies ===")
+
+    reads = {"outline": ["params"], "cast": ["params", "outline"], "act_1": ["outline", "cast"],
+             "act_2": ["outline", "cast"], "params": ["user_request"]}
+    writes = {"params": ["params"], "outline": ["outline"], "cast": ["cast"], "act_1": ["act_1"], "act_2": ["act_2"]}
+    dependencies = stage_dependencies(reads, writes)
+    assert dependencies == {"params": [], "outline": ["params"], "cast": ["outline", "params"],
+                            "act_1": ["cast", "outline"], "act_2": ["cast", "outline"]}
+    order = topological_order(dependencies)
+    assert order.index("params") < order.index("outline") < order.index("cast") < order.index("act_1")
+
+    for bad_reads, bad_writes, message in [
+        ({"a": ["b"], "b": ["a"]}, {"a": ["a"], "b": ["b"]}, "cycle"),
+        ({}, {"a": ["x"], "b": ["x"]}, "written by both"),
+    ]:
+        try:
+            topological_order(stage_dependencies(bad_reads, bad_writes))
+            raise AssertionError(f"expected a '{message}' error")
+        except ValueError as e:
+            assert message in str(e)
+    # Only stages with neither a path to nor from another stage can overlap
+    assert concurrent_stages(dependencies) == {"act_1", "act_2"}
+    assert concurrent_stages({"a": [], "b": ["a"], "c": ["a"], "d": ["b", "c"]}) == {"b", "c"}
+    print("Dependencies OK")
+
+
+def test_critical_path_report():
+    """The critical path follows the dependencies that finished last; off-path stages have slack."""
+    print("\n=== Testing Critical Path Report ===")
+
+    dependencies = {"params": [], "outline": ["params"], "cast": ["params"], "act": ["outline", "cast"]}
+    timings = {"params": (0.0, 1.0), "outline": (1.0, 4.0), "cast": (1.0, 2.0), "act": (4.0, 9.0)}
+    report = critical_path_report(timings, dependencies)
+    assert report["critical_path"] == ["params", "outline", "act"]
+    assert report["wall_time"] == 9.0
+    assert report["stages"]["cast"]["slack"] == 2.0 and report["stages"]["outline"]["slack"] == 0.0
+    print(f"Critical path: {' → '.join(report['critical_path'])}")
+
+
+def run_pipeline(events: list = None) -> tuple:
+    """Runs the pipeline once; returns (wall time, final state). Session events are appended to events."""
+    async def run():
+        session_service = InMemorySessionService()
+        runner = Runner(agent=novel_fix_agent.create_root_agent(), app_name="dag_test",
+                        session_service=session_service)
+        await session_service.create_session(app_name="dag_test", user_id="u", session_id="s")
+        message = types.Content(role="user", parts=[types.Part(text="Write a short mystery novel about trust")])
+        started = time.perf_counter()
+        async for _ in runner.run_async(user_id="u", session_id="s", new_message=message):
+            pass
+        elapsed = time.perf_counter() - started
+        session = await session_service.get_session(app_name="dag_test", user_id="u", session_id="s")
+        if events is not None:
+            events.extend(session.events)
+        return elapsed, session.state
+
+    return asyncio.run(run())
+
+
+def test_acts_run_concurrently():
+    """Without continuity digests the three acts start together once the characters exist, and beat the sequential pipeline."""
+    print("\n=== Testing Concurrent Stages ===")
+
+    continuity = novel_fix_agent.NOVEL_FIX_CONTINUITY
+    novel_fix_agent.NOVEL_FIX_CONTINUITY = False
+    latency = set_mock_llm_latency(30)
+    try:
+        _test_acts_run_concurrently()
+    finally:
+        novel_fix_agent.NOVEL_FIX_CONTINUITY = continuity
+        set_mock_llm_latency(latency)
+
+
+def _test_acts_run_concurrently():
+    run_pipeline()  # warm-up: the first run pays for lazy imports
+    events = []
+    dag_time, state = run_pipeline(events)
+    stages = state[SCHEDULE_STATE_KEY]["stages"]
+    act_starts = [stages[f"act_{act}_writer"]["start"] for act in (1, 2, 3)]
+    assert max(act_starts) < min(stages[f"act_{act}_writer"]["end"] for act in (1, 2, 3)), "acts should overlap"
+    assert min(act_starts) >= stages["character_developer"]["end"]
+    assert state[SCHEDULE_STATE_KEY]["critical_path"][:3] == ["parameter_extractor", "outline_creator",
+                                                              "character_developer"]
+    # The overlapping acts run on branches of their own, the stages before them on the pipeline's
+    branches = {event.author: event.branch for event in events}
+    assert branches["character_developer"] is None
+    assert {branches[f"act_{act}_writer"] for act in (1, 2, 3)} == {
+        f"novel_fix_sequential_pipeline.act_{act}_writer" for act in (1, 2, 3)}
+
+    novel_fix_agent.NOVEL_FIX_DAG_SCHEDULER = False
+    try:
+        sequential_time, sequential_state = run_pipeline()
+    finally:
+        novel_fix_agent.NOVEL_FIX_DAG_SCHEDULER = True
+    assert SCHEDULE_STATE_KEY not in sequential_state
+    assert all(sequential_state[f"act_{act}_content"] for act in (1, 2, 3))
+    assert dag_time < sequential_time, f"DAG {dag_time:.2f}s should beat sequential {sequential_time:.2f}s"
+    print(f"Wall time: {sequential_time:.2f}s sequential, {dag_time:.2f}s with the DAG scheduler")
+
+
+def main():
+    """Run all tests"""
+    print("Stage Scheduler Test Suite")
+    print("==========================")
+
+    test_dependencies()
+    test_critical_path_report()
+    test_acts_run_concurrently()
+
+    print("\n=== All tests completed successfully ===")
+
+
+if __name__ == "__main__":
+    main()